@@ -26,14 +26,14 @@ CREATE TABLE EMPLOYEE_PHONE (
 );
 
 CREATE TABLE NOTIFICATION (
-    NID varchar(5) PRIMARY KEY,
+    NID VARCHAR(12) PRIMARY KEY,
     Type VARCHAR(20),
     Message VARCHAR(255)
 );
 
 CREATE TABLE IS_NOTIFIED (
     EmpID varchar(5),
-    NID varchar(5),
+    NID VARCHAR(12),
     PRIMARY KEY (EmpID, NID),
     FOREIGN KEY (EmpID) REFERENCES EMPLOYEE(EmpID),
     FOREIGN KEY (NID) REFERENCES NOTIFICATION(NID)
@@ -70,7 +70,11 @@ CREATE TABLE MEDICINE (
     Price DECIMAL(10,2),
     SupID varchar(5),
     Type VARCHAR(30),
+    UpdatedAt TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
     PRIMARY KEY (BatchNo, DrugName),
+    INDEX idx_medicine_expiry (ExpiryDate),
+    INDEX idx_medicine_drug (DrugName, ExpiryDate),
+    INDEX idx_medicine_updated (UpdatedAt),
     FOREIGN KEY (SupID) REFERENCES SUPPLIER(SupID)
 );
 
@@ -119,7 +123,7 @@ CREATE TABLE CUSTOMER_PHONE (
 -- ORDER & PRESCRIPTIONS
 -- =======================
 CREATE TABLE `ORDER` (
-    OrderID varchar(5) PRIMARY KEY,
+    OrderID VARCHAR(12) PRIMARY KEY,
     Cid VARCHAR(5),
     EmpID VARCHAR(5),
     OrderDate DATE,
@@ -128,18 +132,18 @@ CREATE TABLE `ORDER` (
 );
 
 CREATE TABLE PRESCRIPTION (
-    PresID VARCHAR(5) PRIMARY KEY,
+    PresID VARCHAR(12) PRIMARY KEY,
     Cid VARCHAR(5),
     DocID INT,
     PresDate DATE,
-    OrderID VARCHAR(5),
+    OrderID VARCHAR(12),
     FOREIGN KEY (Cid) REFERENCES CUSTOMER(Cid),
     FOREIGN KEY (OrderID) REFERENCES `ORDER`(OrderID)
 );
 
 CREATE TABLE PRESCRIBED_DRUG (
     DrugID VARCHAR(5),
-    PresID VARCHAR(5),
+    PresID VARCHAR(12),
     Quantity INT,
     PRIMARY KEY (DrugID, PresID),
     FOREIGN KEY (PresID) REFERENCES PRESCRIPTION(PresID)
@@ -147,7 +151,7 @@ CREATE TABLE PRESCRIBED_DRUG (
 
 CREATE TABLE ORDERED_DRUG (
     DrugName VARCHAR(50),
-    OrderID VARCHAR(5),
+    OrderID VARCHAR(12),
     BatchNo VARCHAR(20),
     Ordered_quantity INT,
     Price DECIMAL(10,2),
@@ -162,7 +166,7 @@ CREATE TABLE ORDERED_DRUG (
 CREATE TABLE BILL (
     BillID INT PRIMARY KEY,
     Cid VARCHAR(5),
-    OrderID VARCHAR(5),
+    OrderID VARCHAR(12),
     Total_amt DECIMAL(10,2),
     Custpay DECIMAL(10,2),
     Inspay DECIMAL(10,2),
@@ -185,6 +189,69 @@ CREATE TABLE DISPOSAL (
     FOREIGN KEY (Emp_ID) REFERENCES EMPLOYEE(EmpID)
 );
 
+-- =======================
+-- ID SEQUENCES
+-- =======================
+-- Next unused number per generated ID. Clients lease a block of numbers in
+-- one UPDATE ... LAST_INSERT_ID() round trip, so IDs never collide between
+-- tills and inserts do not need to read the table first.
+CREATE TABLE ID_SEQUENCE (
+    SeqName VARCHAR(30) PRIMARY KEY,
+    NextValue BIGINT UNSIGNED NOT NULL
+);
+
+-- =======================
+-- STOCK VALUATION SUMMARY
+-- =======================
+-- Running SUM(Stock_quantity * Price) per supplier and type, kept current by
+-- the trg_stock_value_* triggers so reading the stock value is O(1).
+-- NULL SupID / Type are stored as '' because they are part of the key.
+CREATE TABLE STOCK_VALUE_SUMMARY (
+    SupID VARCHAR(5) NOT NULL,
+    Type VARCHAR(30) NOT NULL,
+    TotalValue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    TotalQty BIGINT NOT NULL DEFAULT 0,
+    Batches INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (SupID, Type)
+);
+
+-- =======================
+-- CHANGE TRACKING
+-- =======================
+-- Change counters per table, bumped by the trg_ver_* triggers below.
+-- The app compares these to skip reloading tables that did not change.
+-- Each table has 16 shard rows and a writer bumps the shard picked by its
+-- CONNECTION_ID(), so tills selling at the same time lock different rows
+-- (a single counter row would stay X-locked until each sale commits and
+-- serialize every checkout). A table's version is the SUM over its shards.
+CREATE TABLE TABLE_VERSION (
+    TableName VARCHAR(30) NOT NULL,
+    Shard TINYINT UNSIGNED NOT NULL,
+    Version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    PRIMARY KEY (TableName, Shard)
+);
+
+INSERT INTO TABLE_VERSION (TableName, Shard)
+SELECT t.TableName, s.Shard
+FROM (SELECT 'EMPLOYEE' AS TableName
+      UNION ALL SELECT 'SUPPLIER'
+      UNION ALL SELECT 'MEDICINE'
+      UNION ALL SELECT 'CUSTOMER'
+      UNION ALL SELECT 'ORDER'
+      UNION ALL SELECT 'ORDERED_DRUG'
+      UNION ALL SELECT 'BILL'
+      UNION ALL SELECT 'DISPOSAL'
+      UNION ALL SELECT 'PRESCRIPTION'
+      UNION ALL SELECT 'PRESCRIBED_DRUG'
+      UNION ALL SELECT 'NOTIFICATION'
+      UNION ALL SELECT 'IS_NOTIFIED'
+      UNION ALL SELECT 'INSURANCE'
+      UNION ALL SELECT 'CUSTOMER_PHONE') t
+CROSS JOIN (SELECT 0 AS Shard UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3
+            UNION ALL SELECT 4 UNION ALL SELECT 5 UNION ALL SELECT 6 UNION ALL SELECT 7
+            UNION ALL SELECT 8 UNION ALL SELECT 9 UNION ALL SELECT 10 UNION ALL SELECT 11
+            UNION ALL SELECT 12 UNION ALL SELECT 13 UNION ALL SELECT 14 UNION ALL SELECT 15) s;
+
 -- =======================
 -- SAMPLE DATA
 -- =======================
@@ -202,17 +269,17 @@ INSERT INTO SUPPLIER VALUES
 ('S1', 'MediSupplies', 'LIC123', 'medisup@gmail.com', '8888888888', 'MG Road', 'Bangalore'),
 ('S2', 'PharmaCare', 'LIC456', 'phcare@gmail.com', '9999999999', 'BTM Layout', 'Bangalore');
 
-INSERT INTO MEDICINE VALUES 
+INSERT INTO MEDICINE (BatchNo, DrugName, ExpiryDate, Stock_quantity, Price, SupID, Type) VALUES 
 ('B001', 'Paracetamol', '2026-05-01', 200, 2.50, 'S1', 'Tablet'),
 ('B002', 'Amoxicillin', '2025-12-01', 150, 5.00, 'S2', 'Capsule'),
 ('B003', 'DOLO', '2027-12-31', 200, 2.50, 'S1', 'Tablet');
 INSERT INTO MEDICINE (BatchNo, DrugName, Stock_quantity, Expirydate, Price)
 VALUES ('B004', 'Aspirin', 100, '2026-12-31', 7.00);
-INSERT INTO MEDICINE VALUES 
+INSERT INTO MEDICINE (BatchNo, DrugName, ExpiryDate, Stock_quantity, Price, SupID, Type) VALUES 
 ('B006', 'Calamine', '2026-05-01', 100, 2.50, 'S1', 'Syrup');
-INSERT INTO MEDICINE VALUES 
+INSERT INTO MEDICINE (BatchNo, DrugName, ExpiryDate, Stock_quantity, Price, SupID, Type) VALUES 
 ('B009', 'C-33', '2024-05-01', 100, 2.50, 'S1', 'Tablet');
-INSERT INTO MEDICINE VALUES 
+INSERT INTO MEDICINE (BatchNo, DrugName, ExpiryDate, Stock_quantity, Price, SupID, Type) VALUES 
 ('B010', 'cofsil', '2024-05-01', 100, 2.50, 'S1', 'Tablet');
 
 
@@ -277,54 +344,240 @@ INSERT INTO DISPOSAL VALUES
 ('B001', 'Paracetamol', 50, 'WasteCo', 'E1', TRUE, FALSE, FALSE, TRUE),
 ('B002', 'Amoxicillin', 30, 'BioDispose', 'E2', FALSE, TRUE, TRUE, FALSE);
 
+-- Seed the sequences above the sample data. Generated IDs start at 1000 at
+-- the earliest, leaving room for the hand-keyed IDs used in the demo section.
+INSERT INTO ID_SEQUENCE (SeqName, NextValue)
+SELECT 'NOTIFICATION', GREATEST(1000, IFNULL(MAX(CAST(SUBSTRING(NID, 2) AS UNSIGNED)), 0) + 1)
+FROM NOTIFICATION WHERE NID REGEXP '^N[0-9]+$'
+UNION ALL
+SELECT 'ORDER', GREATEST(1000, IFNULL(MAX(CAST(SUBSTRING(OrderID, 2) AS UNSIGNED)), 0) + 1)
+FROM `ORDER` WHERE OrderID REGEXP '^O[0-9]+$'
+UNION ALL
+SELECT 'PRESCRIPTION', GREATEST(1000, IFNULL(MAX(CAST(SUBSTRING(PresID, 2) AS UNSIGNED)), 0) + 1)
+FROM PRESCRIPTION WHERE PresID REGEXP '^P[0-9]+$'
+UNION ALL
+SELECT 'BILL', GREATEST(1000, IFNULL(MAX(BillID), 0) + 1)
+FROM BILL;
+
 -- =======================
 -- TRIGGERS
 -- =======================
 DELIMITER $$
 
--- 1. Reduce stock after sale
-CREATE TRIGGER trg_reduce_stock
-AFTER INSERT ON ORDERED_DRUG
+-- 1. Sell stock: one conditional decrement replaces the old
+--    check-stock / block-expired / reduce-stock trigger trio. The stock and
+--    expiry checks and the decrement happen in a single UPDATE on the row, so
+--    two tills selling the same batch cannot both pass the check. If the
+--    INSERT itself then fails, the decrement is rolled back with it.
+CREATE TRIGGER trg_sell_stock
+BEFORE INSERT ON ORDERED_DRUG
 FOR EACH ROW
 BEGIN
+    IF NEW.Ordered_quantity IS NULL OR NEW.Ordered_quantity <= 0 THEN
+        SIGNAL SQLSTATE '45000'
+        SET MESSAGE_TEXT = 'Ordered quantity must be positive.';
+    END IF;
+
     UPDATE MEDICINE
     SET Stock_quantity = Stock_quantity - NEW.Ordered_quantity
-    WHERE BatchNo = NEW.BatchNo AND DrugName = NEW.DrugName;
+    WHERE BatchNo = NEW.BatchNo AND DrugName = NEW.DrugName
+      AND Stock_quantity >= NEW.Ordered_quantity
+      AND (ExpiryDate IS NULL OR ExpiryDate >= CURDATE());
+
+    IF ROW_COUNT() = 0 THEN
+        -- Only the failure path looks the row up again, to explain why
+        IF EXISTS (SELECT 1 FROM MEDICINE
+                   WHERE BatchNo = NEW.BatchNo AND DrugName = NEW.DrugName
+                     AND ExpiryDate < CURDATE()) THEN
+            SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Cannot sell expired medicine.';
+        ELSEIF NOT EXISTS (SELECT 1 FROM MEDICINE
+                           WHERE BatchNo = NEW.BatchNo AND DrugName = NEW.DrugName) THEN
+            SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Medicine batch not found.';
+        ELSE
+            SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Not enough stock to process the order.';
+        END IF;
+    END IF;
 END $$
 
--- INSERT INTO ORDERED_DRUG VALUES ('Amoxicillin', 'O5', 'B002', 5, 25.00);
--- SELECT * FROM ORDERED_DRUG;
+DELIMITER ;
 
--- 2. Prevent sale if stock insufficient
-CREATE TRIGGER trg_check_stock_before_order
-BEFORE INSERT ON ORDERED_DRUG
+-- =======================
+-- CHANGE TRACKING TRIGGERS
+-- =======================
+DELIMITER $$
+
+CREATE TRIGGER trg_ver_employee_ins AFTER INSERT ON EMPLOYEE
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'EMPLOYEE' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_employee_upd AFTER UPDATE ON EMPLOYEE
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'EMPLOYEE' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_employee_del AFTER DELETE ON EMPLOYEE
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'EMPLOYEE' AND Shard = CONNECTION_ID() % 16 $$
+
+CREATE TRIGGER trg_ver_supplier_ins AFTER INSERT ON SUPPLIER
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'SUPPLIER' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_supplier_upd AFTER UPDATE ON SUPPLIER
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'SUPPLIER' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_supplier_del AFTER DELETE ON SUPPLIER
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'SUPPLIER' AND Shard = CONNECTION_ID() % 16 $$
+
+CREATE TRIGGER trg_ver_medicine_ins AFTER INSERT ON MEDICINE
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'MEDICINE' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_medicine_upd AFTER UPDATE ON MEDICINE
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'MEDICINE' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_medicine_del AFTER DELETE ON MEDICINE
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'MEDICINE' AND Shard = CONNECTION_ID() % 16 $$
+
+CREATE TRIGGER trg_ver_customer_ins AFTER INSERT ON CUSTOMER
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'CUSTOMER' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_customer_upd AFTER UPDATE ON CUSTOMER
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'CUSTOMER' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_customer_del AFTER DELETE ON CUSTOMER
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'CUSTOMER' AND Shard = CONNECTION_ID() % 16 $$
+
+CREATE TRIGGER trg_ver_order_ins AFTER INSERT ON `ORDER`
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'ORDER' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_order_upd AFTER UPDATE ON `ORDER`
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'ORDER' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_order_del AFTER DELETE ON `ORDER`
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'ORDER' AND Shard = CONNECTION_ID() % 16 $$
+
+CREATE TRIGGER trg_ver_ordered_drug_ins AFTER INSERT ON ORDERED_DRUG
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'ORDERED_DRUG' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_ordered_drug_upd AFTER UPDATE ON ORDERED_DRUG
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'ORDERED_DRUG' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_ordered_drug_del AFTER DELETE ON ORDERED_DRUG
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'ORDERED_DRUG' AND Shard = CONNECTION_ID() % 16 $$
+
+CREATE TRIGGER trg_ver_bill_ins AFTER INSERT ON BILL
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'BILL' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_bill_upd AFTER UPDATE ON BILL
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'BILL' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_bill_del AFTER DELETE ON BILL
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'BILL' AND Shard = CONNECTION_ID() % 16 $$
+
+CREATE TRIGGER trg_ver_disposal_ins AFTER INSERT ON DISPOSAL
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'DISPOSAL' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_disposal_upd AFTER UPDATE ON DISPOSAL
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'DISPOSAL' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_disposal_del AFTER DELETE ON DISPOSAL
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'DISPOSAL' AND Shard = CONNECTION_ID() % 16 $$
+
+CREATE TRIGGER trg_ver_prescription_ins AFTER INSERT ON PRESCRIPTION
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'PRESCRIPTION' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_prescription_upd AFTER UPDATE ON PRESCRIPTION
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'PRESCRIPTION' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_prescription_del AFTER DELETE ON PRESCRIPTION
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'PRESCRIPTION' AND Shard = CONNECTION_ID() % 16 $$
+
+CREATE TRIGGER trg_ver_prescribed_drug_ins AFTER INSERT ON PRESCRIBED_DRUG
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'PRESCRIBED_DRUG' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_prescribed_drug_upd AFTER UPDATE ON PRESCRIBED_DRUG
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'PRESCRIBED_DRUG' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_prescribed_drug_del AFTER DELETE ON PRESCRIBED_DRUG
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'PRESCRIBED_DRUG' AND Shard = CONNECTION_ID() % 16 $$
+
+CREATE TRIGGER trg_ver_notification_ins AFTER INSERT ON NOTIFICATION
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'NOTIFICATION' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_notification_upd AFTER UPDATE ON NOTIFICATION
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'NOTIFICATION' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_notification_del AFTER DELETE ON NOTIFICATION
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'NOTIFICATION' AND Shard = CONNECTION_ID() % 16 $$
+
+CREATE TRIGGER trg_ver_is_notified_ins AFTER INSERT ON IS_NOTIFIED
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'IS_NOTIFIED' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_is_notified_upd AFTER UPDATE ON IS_NOTIFIED
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'IS_NOTIFIED' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_is_notified_del AFTER DELETE ON IS_NOTIFIED
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'IS_NOTIFIED' AND Shard = CONNECTION_ID() % 16 $$
+
+CREATE TRIGGER trg_ver_insurance_ins AFTER INSERT ON INSURANCE
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'INSURANCE' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_insurance_upd AFTER UPDATE ON INSURANCE
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'INSURANCE' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_insurance_del AFTER DELETE ON INSURANCE
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'INSURANCE' AND Shard = CONNECTION_ID() % 16 $$
+
+CREATE TRIGGER trg_ver_customer_phone_ins AFTER INSERT ON CUSTOMER_PHONE
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'CUSTOMER_PHONE' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_customer_phone_upd AFTER UPDATE ON CUSTOMER_PHONE
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'CUSTOMER_PHONE' AND Shard = CONNECTION_ID() % 16 $$
+CREATE TRIGGER trg_ver_customer_phone_del AFTER DELETE ON CUSTOMER_PHONE
+FOR EACH ROW UPDATE TABLE_VERSION SET Version = Version + 1 WHERE TableName = 'CUSTOMER_PHONE' AND Shard = CONNECTION_ID() % 16 $$
+
+DELIMITER ;
+
+-- =======================
+-- STOCK VALUATION TRIGGERS
+-- =======================
+-- Seed the summary from the sample data loaded above, then keep it current.
+-- trg_sell_stock decrements stock with an UPDATE on MEDICINE, so sales are
+-- picked up by trg_stock_value_upd as well.
+INSERT INTO STOCK_VALUE_SUMMARY (SupID, Type, TotalValue, TotalQty, Batches)
+SELECT IFNULL(SupID, ''), IFNULL(Type, ''),
+       SUM(IFNULL(Stock_quantity, 0) * IFNULL(Price, 0)), SUM(IFNULL(Stock_quantity, 0)), COUNT(*)
+FROM MEDICINE
+GROUP BY IFNULL(SupID, ''), IFNULL(Type, '');
+
+DELIMITER $$
+
+CREATE TRIGGER trg_stock_value_ins
+AFTER INSERT ON MEDICINE
 FOR EACH ROW
 BEGIN
-    DECLARE current_stock INT;
-    SELECT Stock_quantity INTO current_stock
-    FROM MEDICINE
-    WHERE BatchNo = NEW.BatchNo AND DrugName = NEW.DrugName;
-    IF current_stock < NEW.Ordered_quantity THEN
-        SIGNAL SQLSTATE '45000'
-        SET MESSAGE_TEXT = 'Not enough stock to process the order.';
-    END IF;
+    INSERT INTO STOCK_VALUE_SUMMARY (SupID, Type, TotalValue, TotalQty, Batches)
+    VALUES (IFNULL(NEW.SupID, ''), IFNULL(NEW.Type, ''),
+            IFNULL(NEW.Stock_quantity, 0) * IFNULL(NEW.Price, 0), IFNULL(NEW.Stock_quantity, 0), 1)
+    ON DUPLICATE KEY UPDATE
+        TotalValue = TotalValue + IFNULL(NEW.Stock_quantity, 0) * IFNULL(NEW.Price, 0),
+        TotalQty = TotalQty + IFNULL(NEW.Stock_quantity, 0),
+        Batches = Batches + 1;
 END $$
 
--- 3. Block expired medicines from sale
-CREATE TRIGGER trg_block_expired
-BEFORE INSERT ON ORDERED_DRUG
+CREATE TRIGGER trg_stock_value_upd
+AFTER UPDATE ON MEDICINE
 FOR EACH ROW
 BEGIN
-    DECLARE exp DATE;
-    SELECT ExpiryDate INTO exp
-    FROM MEDICINE
-    WHERE BatchNo = NEW.BatchNo AND DrugName = NEW.DrugName;
-    IF exp < CURDATE() THEN
-        SIGNAL SQLSTATE '45000'
-        SET MESSAGE_TEXT = 'Cannot sell expired medicine.';
+    IF IFNULL(OLD.SupID, '') = IFNULL(NEW.SupID, '') AND IFNULL(OLD.Type, '') = IFNULL(NEW.Type, '') THEN
+        -- Same bucket (e.g. a sale): apply the delta in place
+        UPDATE STOCK_VALUE_SUMMARY
+        SET TotalValue = TotalValue + IFNULL(NEW.Stock_quantity, 0) * IFNULL(NEW.Price, 0)
+                                    - IFNULL(OLD.Stock_quantity, 0) * IFNULL(OLD.Price, 0),
+            TotalQty = TotalQty + IFNULL(NEW.Stock_quantity, 0) - IFNULL(OLD.Stock_quantity, 0)
+        WHERE SupID = IFNULL(NEW.SupID, '') AND Type = IFNULL(NEW.Type, '');
+    ELSE
+        UPDATE STOCK_VALUE_SUMMARY
+        SET TotalValue = TotalValue - IFNULL(OLD.Stock_quantity, 0) * IFNULL(OLD.Price, 0),
+            TotalQty = TotalQty - IFNULL(OLD.Stock_quantity, 0),
+            Batches = Batches - 1
+        WHERE SupID = IFNULL(OLD.SupID, '') AND Type = IFNULL(OLD.Type, '');
+        DELETE FROM STOCK_VALUE_SUMMARY
+        WHERE SupID = IFNULL(OLD.SupID, '') AND Type = IFNULL(OLD.Type, '') AND Batches = 0;
+        INSERT INTO STOCK_VALUE_SUMMARY (SupID, Type, TotalValue, TotalQty, Batches)
+        VALUES (IFNULL(NEW.SupID, ''), IFNULL(NEW.Type, ''),
+                IFNULL(NEW.Stock_quantity, 0) * IFNULL(NEW.Price, 0), IFNULL(NEW.Stock_quantity, 0), 1)
+        ON DUPLICATE KEY UPDATE
+            TotalValue = TotalValue + IFNULL(NEW.Stock_quantity, 0) * IFNULL(NEW.Price, 0),
+            TotalQty = TotalQty + IFNULL(NEW.Stock_quantity, 0),
+            Batches = Batches + 1;
     END IF;
 END $$
 
+CREATE TRIGGER trg_stock_value_del
+AFTER DELETE ON MEDICINE
+FOR EACH ROW
+BEGIN
+    UPDATE STOCK_VALUE_SUMMARY
+    SET TotalValue = TotalValue - IFNULL(OLD.Stock_quantity, 0) * IFNULL(OLD.Price, 0),
+        TotalQty = TotalQty - IFNULL(OLD.Stock_quantity, 0),
+        Batches = Batches - 1
+    WHERE SupID = IFNULL(OLD.SupID, '') AND Type = IFNULL(OLD.Type, '');
+    DELETE FROM STOCK_VALUE_SUMMARY
+    WHERE SupID = IFNULL(OLD.SupID, '') AND Type = IFNULL(OLD.Type, '') AND Batches = 0;
+END $$
+
 DELIMITER ;
 
 -- =======================
@@ -332,13 +585,13 @@ DELIMITER ;
 -- =======================
 DELIMITER $$
 
--- Function 1: Total stock value
+-- Function 1: Total stock value (reads the trigger-maintained summary)
 CREATE FUNCTION TotalStockValue() 
-RETURNS DECIMAL(10,2)
-DETERMINISTIC
+RETURNS DECIMAL(14,2)
+READS SQL DATA
 BEGIN
-    DECLARE total DECIMAL(10,2);
-    SELECT SUM(Stock_quantity * Price) INTO total FROM MEDICINE;
+    DECLARE total DECIMAL(14,2);
+    SELECT SUM(TotalValue) INTO total FROM STOCK_VALUE_SUMMARY;
     RETURN total;
 END $$
 
@@ -369,14 +622,15 @@ CREATE PROCEDURE AddMedicine(
     IN p_price DECIMAL(10,2), IN p_supID VARCHAR(5), IN p_type VARCHAR(30)
 )
 BEGIN
-    INSERT INTO MEDICINE VALUES (p_batch, p_name, p_exp, p_stock, p_price, p_supID, p_type);
+    INSERT INTO MEDICINE (BatchNo, DrugName, ExpiryDate, Stock_quantity, Price, SupID, Type)
+    VALUES (p_batch, p_name, p_exp, p_stock, p_price, p_supID, p_type);
 END $$
 
 
 -- Procedure 2: Create new order
 
 CREATE PROCEDURE CreateOrder(
-    IN p_orderID varchar(5), IN p_cid varchar(5), IN p_empID varchar(5), IN p_date DATE
+    IN p_orderID VARCHAR(12), IN p_cid varchar(5), IN p_empID varchar(5), IN p_date DATE
 )
 BEGIN
     INSERT INTO `ORDER` VALUES (p_orderID, p_cid, p_empID, p_date);
@@ -391,7 +645,7 @@ DROP PROCEDURE IF EXISTS GenerateBill;
 CREATE PROCEDURE GenerateBill(
     IN p_billID INT,
     IN p_cid VARCHAR(5),
-    IN p_orderID VARCHAR(5)
+    IN p_orderID VARCHAR(12)
 )
 BEGIN
     DECLARE total DECIMAL(10,2);
@@ -405,8 +659,170 @@ BEGIN
     VALUES (p_billID, p_cid, p_orderID, total, total, 0);
 END $$
 
+-- Procedure 4: End-of-day bulk billing
+-- Bills every order that has ORDERED_DRUG lines but no BILL row, in one
+-- set-based INSERT ... SELECT. BillIDs are reserved as one block from the
+-- BILL sequence. Same amounts as GenerateBill.
+
+DROP PROCEDURE IF EXISTS BillUnbilledOrders;
+
+CREATE PROCEDURE BillUnbilledOrders(
+    OUT p_bills INT,
+    OUT p_total DECIMAL(14,2)
+)
+BEGIN
+    DECLARE base BIGINT;
+    DECLARE n INT;
+
+    -- Serialises concurrent bulk runs; the snapshot below is taken after it
+    SELECT NextValue INTO base FROM ID_SEQUENCE WHERE SeqName = 'BILL' FOR UPDATE;
+
+    DROP TEMPORARY TABLE IF EXISTS tmp_unbilled;
+    CREATE TEMPORARY TABLE tmp_unbilled AS
+    SELECT o.OrderID, o.Cid, t.total, ROW_NUMBER() OVER (ORDER BY o.OrderID) AS rn
+    FROM `ORDER` o
+    JOIN (SELECT OrderID, SUM(Ordered_quantity * Price) AS total
+          FROM ORDERED_DRUG
+          GROUP BY OrderID) t ON t.OrderID = o.OrderID
+    WHERE NOT EXISTS (SELECT 1 FROM BILL b WHERE b.OrderID = o.OrderID);
+
+    SELECT COUNT(*), IFNULL(SUM(total), 0) INTO n, p_total FROM tmp_unbilled;
+
+    IF n > 0 THEN
+        -- Reserve n BillIDs from the sequence: base .. base + n - 1
+        UPDATE ID_SEQUENCE SET NextValue = LAST_INSERT_ID(NextValue + n) WHERE SeqName = 'BILL';
+        SET base = LAST_INSERT_ID() - n - 1;
+        INSERT INTO BILL (BillID, Cid, OrderID, Total_amt, Custpay, Inspay)
+        SELECT base + rn, Cid, OrderID, total, total, 0 FROM tmp_unbilled;
+    END IF;
+
+    SET p_bills = n;
+    DROP TEMPORARY TABLE tmp_unbilled;
+END $$
+
+DELIMITER ;
+
+
+-- =========================================
+-- SCHEMA MIGRATIONS
+-- =========================================
+-- A fresh install is already at the latest migration: the indexes from
+-- migrations/0001..0002, the MEDICINE row version from 0003, the
+-- notification counters from 0004, the NOTIFICATION feed sequence from 0005
+-- and CUSTOMER.UpdatedAt from 0007 are created here and recorded as applied,
+-- so `python migrations/migrate.py` only runs files added after this script.
+-- 0006 upgrades a database made by the script as it was before migrations;
+-- everything in it is created above.
+CREATE TABLE SCHEMA_VERSION (
+    Version INT PRIMARY KEY,
+    Name VARCHAR(100) NOT NULL,
+    Checksum CHAR(64) NULL,
+    AppliedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_order_date ON `ORDER` (OrderDate);
+CREATE INDEX idx_order_customer ON `ORDER` (Cid, OrderDate);
+CREATE INDEX idx_ordered_drug_order ON ORDERED_DRUG (OrderID, Ordered_quantity, Price);
+CREATE INDEX idx_bill_order ON BILL (OrderID);
+CREATE INDEX idx_medicine_supplier ON MEDICINE (SupID);
+CREATE INDEX idx_prescription_customer ON PRESCRIPTION (Cid, PresDate);
+CREATE INDEX idx_is_notified_nid ON IS_NOTIFIED (NID, EmpID);
+
+-- RowVersion counts edits to ExpiryDate / Price / SupID / Type; the Medicines
+-- update dialog checks it, while stock is written as a delta (see 0003)
+ALTER TABLE MEDICINE ADD COLUMN RowVersion INT NOT NULL DEFAULT 0;
+
+DELIMITER $$
+
+CREATE TRIGGER trg_medicine_row_version
+BEFORE UPDATE ON MEDICINE
+FOR EACH ROW
+BEGIN
+    IF NOT (NEW.ExpiryDate <=> OLD.ExpiryDate AND NEW.Price <=> OLD.Price
+            AND NEW.SupID <=> OLD.SupID AND NEW.Type <=> OLD.Type) THEN
+        SET NEW.RowVersion = OLD.RowVersion + 1;
+    END IF;
+END $$
+
+DELIMITER ;
+
+-- Per-employee seen counts and the '*' total; unread = '*' - own row (see 0004)
+CREATE TABLE NOTIFICATION_COUNTER (
+    EmpID VARCHAR(5) PRIMARY KEY,      -- '*' = all notifications
+    Notifications INT NOT NULL DEFAULT 0
+);
+
+DELIMITER $$
+
+CREATE TRIGGER trg_notif_count_ins AFTER INSERT ON NOTIFICATION
+FOR EACH ROW
+    INSERT INTO NOTIFICATION_COUNTER (EmpID, Notifications) VALUES ('*', 1)
+    ON DUPLICATE KEY UPDATE Notifications = Notifications + 1 $$
+
+CREATE TRIGGER trg_notif_count_del AFTER DELETE ON NOTIFICATION
+FOR EACH ROW
+    UPDATE NOTIFICATION_COUNTER SET Notifications = Notifications - 1 WHERE EmpID = '*' $$
+
+CREATE TRIGGER trg_seen_count_ins AFTER INSERT ON IS_NOTIFIED
+FOR EACH ROW
+    INSERT INTO NOTIFICATION_COUNTER (EmpID, Notifications) VALUES (NEW.EmpID, 1)
+    ON DUPLICATE KEY UPDATE Notifications = Notifications + 1 $$
+
+CREATE TRIGGER trg_seen_count_upd AFTER UPDATE ON IS_NOTIFIED
+FOR EACH ROW
+BEGIN
+    IF NOT (OLD.EmpID <=> NEW.EmpID) THEN
+        UPDATE NOTIFICATION_COUNTER SET Notifications = Notifications - 1 WHERE EmpID = OLD.EmpID;
+        INSERT INTO NOTIFICATION_COUNTER (EmpID, Notifications) VALUES (NEW.EmpID, 1)
+        ON DUPLICATE KEY UPDATE Notifications = Notifications + 1;
+    END IF;
+END $$
+
+CREATE TRIGGER trg_seen_count_del AFTER DELETE ON IS_NOTIFIED
+FOR EACH ROW
+    UPDATE NOTIFICATION_COUNTER SET Notifications = Notifications - 1 WHERE EmpID = OLD.EmpID $$
+
+DELIMITER ;
+
+-- Count what is already there (after the triggers exist, so nothing is missed;
+-- re-running recounts)
+INSERT INTO NOTIFICATION_COUNTER (EmpID, Notifications)
+SELECT '*', COUNT(*) FROM NOTIFICATION
+ON DUPLICATE KEY UPDATE Notifications = VALUES(Notifications);
+
+INSERT INTO NOTIFICATION_COUNTER (EmpID, Notifications)
+SELECT EmpID, COUNT(*) FROM IS_NOTIFIED GROUP BY EmpID
+ON DUPLICATE KEY UPDATE Notifications = VALUES(Notifications);
+
+-- Insert-order sequence the tills poll for new notifications (see 0005)
+ALTER TABLE NOTIFICATION
+    ADD COLUMN Seq BIGINT NOT NULL AUTO_INCREMENT,
+    ADD UNIQUE KEY uq_notification_seq (Seq);
+
+-- Change stamp the customer search index refreshes from; phone changes touch it (see 0007)
+ALTER TABLE CUSTOMER
+    ADD COLUMN UpdatedAt TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+CREATE INDEX idx_customer_updated ON CUSTOMER (UpdatedAt);
+
+DELIMITER $$
+
+CREATE TRIGGER trg_customer_phone_touch_ins AFTER INSERT ON CUSTOMER_PHONE
+FOR EACH ROW UPDATE CUSTOMER SET UpdatedAt = CURRENT_TIMESTAMP(6) WHERE Cid = NEW.Cid $$
+CREATE TRIGGER trg_customer_phone_touch_upd AFTER UPDATE ON CUSTOMER_PHONE
+FOR EACH ROW UPDATE CUSTOMER SET UpdatedAt = CURRENT_TIMESTAMP(6) WHERE Cid IN (OLD.Cid, NEW.Cid) $$
+CREATE TRIGGER trg_customer_phone_touch_del AFTER DELETE ON CUSTOMER_PHONE
+FOR EACH ROW UPDATE CUSTOMER SET UpdatedAt = CURRENT_TIMESTAMP(6) WHERE Cid = OLD.Cid $$
+
 DELIMITER ;
 
+INSERT INTO SCHEMA_VERSION (Version, Name) VALUES
+(1, 'sales_indexes'),
+(2, 'lookup_indexes'),
+(3, 'medicine_row_version'),
+(4, 'notification_counters'),
+(5, 'notification_seq'),
+(6, 'pre_migration_schema'),
+(7, 'customer_updated_at');
 
 -- Demonstration / Presentation Queries
 -- 1. Show all databases
@@ -445,11 +861,10 @@ SELECT * FROM INSURANCE;
 
 -- Show triggers, procedures & functions 
 
-SHOW CREATE TRIGGER trg_reduce_stock;
-SHOW CREATE TRIGGER trg_check_stock_before_order;
-SHOW CREATE TRIGGER trg_block_expired;
+SHOW CREATE TRIGGER trg_sell_stock;
 
 SHOW CREATE PROCEDURE GenerateBill;
+SHOW CREATE PROCEDURE BillUnbilledOrders;
 SHOW CREATE PROCEDURE AddMedicine;
 SHOW CREATE PROCEDURE CreateOrder;
 
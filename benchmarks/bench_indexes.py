@@ -0,0 +1,173 @@
+# bench_indexes.py
+# Times the app's read paths, the sale trigger, billing and every pre-built
+# report on a large dataset, first on the schema as it was before
+# migrations/0001..0002, then again after applying them with migrate.py.
+#
+# Builds PharmacyBench from PHARMACY_DATABASE.sql (everything above the
+# SCHEMA MIGRATIONS block, i.e. without the secondary indexes), fills it with
+# benchmarks/datagen.py, and drops it afterwards. Write paths run inside a
+# transaction that is rolled back, so every repetition and both passes see
+# the same data.
+#
+#   python benchmarks/bench_indexes.py --scale 1m --repeat 5
+#   python benchmarks/bench_indexes.py --lines 200000 --json indexes.json
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datagen import BENCH_DB, SCALES, connect, create_database, generate
+from frontend_pharmacy import PREBUILT_REPORTS, TABLE_PAGE_SIZE
+from migrate import migrate
+
+
+def page(table, cols, keys, where=""):
+    order_by = ", ".join(f"{k} ASC" for k in keys)
+    return f"SELECT {cols} FROM `{table}` {where} ORDER BY {order_by} LIMIT {TABLE_PAGE_SIZE}"
+
+
+def read_cases(ids):
+    today = date.today()
+    cases = [
+        ("load_medicines page", page("MEDICINE", "BatchNo, DrugName, ExpiryDate, Stock_quantity, Price, SupID, Type",
+                                     ("BatchNo", "DrugName")), ()),
+        ("load_orders page", page("ORDER", "OrderID, Cid, EmpID, OrderDate", ("OrderID",)), ()),
+        ("load_orders count", "SELECT COUNT(*) FROM `ORDER`", ()),
+        ("load_ordered_drugs page", page("ORDERED_DRUG", "DrugName, OrderID, BatchNo, Ordered_quantity, Price",
+                                         ("DrugName", "OrderID", "BatchNo")), ()),
+        ("load_bills page", page("BILL", "BillID, Cid, OrderID, Total_amt, Custpay, Inspay", ("BillID",)), ()),
+        ("load_prescriptions page", page("PRESCRIPTION", "PresID, Cid, DocID, PresDate, OrderID", ("PresID",)), ()),
+        ("load_notifications", "SELECT NID, Type, Message FROM NOTIFICATION ORDER BY NID DESC", ()),
+        ("expiry check", "SELECT COUNT(*), IFNULL(SUM(ExpiryDate < %s), 0) FROM MEDICINE WHERE ExpiryDate <= %s",
+         (today, today + timedelta(days=30))),
+        ("unseen notifications",
+         "SELECT COUNT(*) FROM NOTIFICATION n WHERE NOT EXISTS (SELECT 1 FROM IS_NOTIFIED i WHERE i.NID = n.NID)", ()),
+        ("orders in date range", page("ORDER", "OrderID, Cid, EmpID, OrderDate", ("OrderID",),
+                                      "WHERE OrderDate BETWEEN %s AND %s"), (today - timedelta(days=30), today)),
+        ("customer's orders", "SELECT OrderID, OrderDate FROM `ORDER` WHERE Cid = %s ORDER BY OrderDate DESC",
+         (ids["cid"],)),
+        ("order total", "SELECT SUM(Ordered_quantity * Price) FROM ORDERED_DRUG WHERE OrderID = %s", (ids["order"],)),
+        ("bill for order", "SELECT BillID FROM BILL WHERE OrderID = %s", (ids["order"],)),
+        ("customer's prescriptions", "SELECT PresID, PresDate FROM PRESCRIPTION WHERE Cid = %s ORDER BY PresDate",
+         (ids["cid"],)),
+        ("supplier's batches", "SELECT BatchNo, DrugName, Stock_quantity FROM MEDICINE WHERE SupID = %s",
+         (ids["sup"],)),
+        ("who saw notification", "SELECT EmpID FROM IS_NOTIFIED WHERE NID = %s", (ids["nid"],)),
+    ]
+    for name, (sql, _tables) in PREBUILT_REPORTS.items():
+        if "%s" not in sql:
+            params = ()
+        elif "IsExpired" in sql:
+            params = ("B002", "Amoxicillin")
+        else:
+            params = (today + timedelta(days=30),)
+        cases.append((f"report: {name}", sql, params))
+    return cases
+
+
+def write_cases(ids):
+    """Write paths, each run inside a transaction the harness rolls back."""
+    def sale(cur):
+        cur.execute("INSERT INTO `ORDER` VALUES ('OBENCH', %s, %s, CURDATE())", (ids["cid"], ids["emp"]))
+        cur.execute("INSERT INTO ORDERED_DRUG VALUES (%s,'OBENCH',%s,1,2.50)", (ids["drug"], ids["batch"]))
+
+    def generate_bill(cur):
+        cur.callproc("GenerateBill", (999999, ids["cid"], ids["order"]))
+
+    def bill_unbilled(cur):
+        cur.callproc("BillUnbilledOrders", (0, 0))
+
+    def mark_seen(cur):
+        cur.execute("DELETE FROM IS_NOTIFIED WHERE NID = %s", (ids["nid"],))
+        cur.execute("INSERT INTO IS_NOTIFIED VALUES (%s,%s)", (ids["emp"], ids["nid"]))
+
+    return [("trigger: sale (trg_sell_stock)", sale), ("GenerateBill", generate_bill),
+            ("BillUnbilledOrders", bill_unbilled), ("mark notification seen", mark_seen)]
+
+
+def plan_keys(cur, sql, params):
+    cur.execute("EXPLAIN " + sql, params)
+    cols = [d[0] for d in cur.description]
+    rows = [dict(zip(cols, r)) for r in cur.fetchall()]
+    return ", ".join(f"{r['table']}:{r['key'] or r['type']}" for r in rows)
+
+
+def time_reads(conn, cases, repeat):
+    cur = conn.cursor()
+    out = {}
+    for name, sql, params in cases:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            cur.execute(sql, params)
+            cur.fetchall()
+            samples.append((time.perf_counter() - start) * 1000)
+        out[name] = {"ms": round(statistics.median(samples), 3), "plan": plan_keys(cur, sql, params)}
+    cur.close()
+    return out
+
+
+def time_writes(conn, cases, repeat):
+    cur = conn.cursor()
+    out = {}
+    for name, fn in cases:
+        samples = []
+        for _ in range(repeat):
+            conn.start_transaction()
+            start = time.perf_counter()
+            fn(cur)
+            samples.append((time.perf_counter() - start) * 1000)
+            conn.rollback()
+        out[name] = {"ms": round(statistics.median(samples), 3), "plan": ""}
+    cur.close()
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Pharmacy query timings before and after the index migrations")
+    ap.add_argument("--scale", choices=list(SCALES), default="1m", help="ORDERED_DRUG rows: 10k, 1m or 10m")
+    ap.add_argument("--lines", type=int, help="exact ORDERED_DRUG row count (overrides --scale)")
+    ap.add_argument("--repeat", type=int, default=5, help="timed runs per query (median reported)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--json", help="also write results to this file")
+    args = ap.parse_args()
+
+    conn = connect()
+    create_database(conn, BENCH_DB, with_migrations=False)
+    conn.database = BENCH_DB
+    ids = generate(conn, args.lines or SCALES[args.scale], args.seed)["probe"]
+
+    reads, writes = read_cases(ids), write_cases(ids)
+    before = time_reads(conn, reads, args.repeat)
+    before.update(time_writes(conn, writes, args.repeat))
+    migrate(conn, target=2)
+    after = time_reads(conn, reads, args.repeat)
+    after.update(time_writes(conn, writes, args.repeat))
+
+    cur = conn.cursor()
+    cur.execute(f"DROP DATABASE IF EXISTS {BENCH_DB}")
+    cur.close(); conn.close()
+
+    results = []
+    for name in before:
+        b, a = before[name]["ms"], after[name]["ms"]
+        results.append({"query": name, "before_ms": b, "after_ms": a,
+                        "speedup": round(b / a, 2) if a else None,
+                        "plan_before": before[name]["plan"], "plan_after": after[name]["plan"]})
+
+    width = max(len(r["query"]) for r in results)
+    print(f"{'query':<{width}}{'before ms':>12}{'after ms':>11}{'speedup':>9}  index used after")
+    for r in results:
+        print(f"{r['query']:<{width}}{r['before_ms']:>12}{r['after_ms']:>11}{r['speedup'] or '-':>9}  {r['plan_after']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"params": vars(args), "results": results}, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
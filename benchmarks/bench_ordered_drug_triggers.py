@@ -0,0 +1,233 @@
+# bench_ordered_drug_triggers.py
+# Compares the legacy three-trigger ORDERED_DRUG path (check stock, block expired,
+# reduce stock) with the consolidated trg_sell_stock conditional decrement.
+#
+# Runs in a scratch database (dropped and recreated per variant) so it never
+# touches PharmacyDB. Several threads sell from the same batches at once; demand
+# deliberately exceeds stock so the check-then-act race in the legacy triggers
+# shows up as oversold (negative) stock.
+#
+#   python benchmarks/bench_ordered_drug_triggers.py --threads 8 --sales 500
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+import mysql.connector
+from mysql.connector import Error
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frontend_pharmacy import DB_CONFIG
+
+BENCH_DB = "PharmacyBench"
+
+SCHEMA = [
+    """CREATE TABLE MEDICINE (
+        BatchNo VARCHAR(20), DrugName VARCHAR(50), ExpiryDate DATE,
+        Stock_quantity INT, Price DECIMAL(10,2),
+        PRIMARY KEY (BatchNo, DrugName))""",
+    """CREATE TABLE `ORDER` (OrderID VARCHAR(20) PRIMARY KEY)""",
+    """CREATE TABLE ORDERED_DRUG (
+        DrugName VARCHAR(50), OrderID VARCHAR(20), BatchNo VARCHAR(20),
+        Ordered_quantity INT, Price DECIMAL(10,2),
+        PRIMARY KEY (DrugName, OrderID, BatchNo),
+        FOREIGN KEY (OrderID) REFERENCES `ORDER`(OrderID),
+        FOREIGN KEY (BatchNo, DrugName) REFERENCES MEDICINE(BatchNo, DrugName))""",
+]
+
+# The trigger set PHARMACY_DATABASE.sql shipped before trg_sell_stock
+LEGACY_TRIGGERS = [
+    """CREATE TRIGGER trg_reduce_stock
+    AFTER INSERT ON ORDERED_DRUG
+    FOR EACH ROW
+    BEGIN
+        UPDATE MEDICINE
+        SET Stock_quantity = Stock_quantity - NEW.Ordered_quantity
+        WHERE BatchNo = NEW.BatchNo AND DrugName = NEW.DrugName;
+    END""",
+    """CREATE TRIGGER trg_check_stock_before_order
+    BEFORE INSERT ON ORDERED_DRUG
+    FOR EACH ROW
+    BEGIN
+        DECLARE current_stock INT;
+        SELECT Stock_quantity INTO current_stock
+        FROM MEDICINE
+        WHERE BatchNo = NEW.BatchNo AND DrugName = NEW.DrugName;
+        IF current_stock < NEW.Ordered_quantity THEN
+            SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Not enough stock to process the order.';
+        END IF;
+    END""",
+    """CREATE TRIGGER trg_block_expired
+    BEFORE INSERT ON ORDERED_DRUG
+    FOR EACH ROW
+    BEGIN
+        DECLARE exp DATE;
+        SELECT ExpiryDate INTO exp
+        FROM MEDICINE
+        WHERE BatchNo = NEW.BatchNo AND DrugName = NEW.DrugName;
+        IF exp < CURDATE() THEN
+            SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Cannot sell expired medicine.';
+        END IF;
+    END""",
+]
+
+# Same body as trg_sell_stock in PHARMACY_DATABASE.sql
+CONSOLIDATED_TRIGGERS = [
+    """CREATE TRIGGER trg_sell_stock
+    BEFORE INSERT ON ORDERED_DRUG
+    FOR EACH ROW
+    BEGIN
+        IF NEW.Ordered_quantity IS NULL OR NEW.Ordered_quantity <= 0 THEN
+            SIGNAL SQLSTATE '45000'
+            SET MESSAGE_TEXT = 'Ordered quantity must be positive.';
+        END IF;
+        UPDATE MEDICINE
+        SET Stock_quantity = Stock_quantity - NEW.Ordered_quantity
+        WHERE BatchNo = NEW.BatchNo AND DrugName = NEW.DrugName
+          AND Stock_quantity >= NEW.Ordered_quantity
+          AND (ExpiryDate IS NULL OR ExpiryDate >= CURDATE());
+        IF ROW_COUNT() = 0 THEN
+            IF EXISTS (SELECT 1 FROM MEDICINE
+                       WHERE BatchNo = NEW.BatchNo AND DrugName = NEW.DrugName
+                         AND ExpiryDate < CURDATE()) THEN
+                SIGNAL SQLSTATE '45000'
+                SET MESSAGE_TEXT = 'Cannot sell expired medicine.';
+            ELSEIF NOT EXISTS (SELECT 1 FROM MEDICINE
+                               WHERE BatchNo = NEW.BatchNo AND DrugName = NEW.DrugName) THEN
+                SIGNAL SQLSTATE '45000'
+                SET MESSAGE_TEXT = 'Medicine batch not found.';
+            ELSE
+                SIGNAL SQLSTATE '45000'
+                SET MESSAGE_TEXT = 'Not enough stock to process the order.';
+            END IF;
+        END IF;
+    END""",
+]
+
+VARIANTS = {"legacy": LEGACY_TRIGGERS, "consolidated": CONSOLIDATED_TRIGGERS}
+
+
+def connect(db=None):
+    cfg = dict(DB_CONFIG)
+    cfg.pop("database", None)
+    if db:
+        cfg["database"] = db
+    return mysql.connector.connect(**cfg)
+
+
+def setup(triggers, batches, expired, stock, orders):
+    conn = connect()
+    cur = conn.cursor()
+    cur.execute(f"DROP DATABASE IF EXISTS {BENCH_DB}")
+    cur.execute(f"CREATE DATABASE {BENCH_DB}")
+    cur.execute(f"USE {BENCH_DB}")
+    for stmt in SCHEMA + triggers:
+        cur.execute(stmt)
+    good = date.today() + timedelta(days=365)
+    bad = date.today() - timedelta(days=1)
+    meds = [(f"B{i:04d}", "BenchDrug", bad if i < expired else good, stock, 2.50) for i in range(batches)]
+    cur.executemany("INSERT INTO MEDICINE VALUES (%s,%s,%s,%s,%s)", meds)
+    cur.executemany("INSERT INTO `ORDER` VALUES (%s)", [(f"O{i}",) for i in range(orders)])
+    conn.commit()
+    cur.close(); conn.close()
+    return {m[0]: m[3] for m in meds}, {m[0] for m in meds[:expired]}
+
+
+def worker(tid, sales, batches, seed, counters, lock):
+    rnd = random.Random(seed + tid)
+    conn = connect(BENCH_DB)
+    conn.autocommit = True
+    cur = conn.cursor()
+    ok = rejected = errors = 0
+    for i in range(sales):
+        batch = f"B{rnd.randrange(batches):04d}"
+        qty = rnd.randint(1, 5)
+        try:
+            cur.execute("INSERT INTO ORDERED_DRUG VALUES (%s,%s,%s,%s,%s)",
+                        ("BenchDrug", f"O{tid * sales + i}", batch, qty, 2.50))
+            ok += 1
+        except Error as e:
+            if e.sqlstate == "45000":
+                rejected += 1
+            else:
+                errors += 1
+    cur.close(); conn.close()
+    with lock:
+        counters["ok"] += ok
+        counters["rejected"] += rejected
+        counters["errors"] += errors
+
+
+def verify(initial, expired):
+    conn = connect(BENCH_DB)
+    cur = conn.cursor()
+    cur.execute("SELECT BatchNo, Stock_quantity FROM MEDICINE")
+    final = dict(cur.fetchall())
+    cur.execute("SELECT BatchNo, SUM(Ordered_quantity) FROM ORDERED_DRUG GROUP BY BatchNo")
+    sold = {b: int(q) for b, q in cur.fetchall()}
+    cur.close(); conn.close()
+    oversold = sum(1 for b in final if final[b] < 0)
+    drift = sum(1 for b in final if initial[b] - sold.get(b, 0) != final[b])
+    expired_sold = sum(1 for b in expired if sold.get(b))
+    return {"oversold_batches": oversold, "drifted_batches": drift,
+            "expired_batches_sold": expired_sold, "units_sold": sum(sold.values())}
+
+
+def run_variant(name, args):
+    orders = args.threads * args.sales
+    initial, expired = setup(VARIANTS[name], args.batches, args.expired, args.stock, orders)
+    counters = {"ok": 0, "rejected": 0, "errors": 0}
+    lock = threading.Lock()
+    threads = [threading.Thread(target=worker, args=(t, args.sales, args.batches, args.seed, counters, lock))
+               for t in range(args.threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    result = {"variant": name, "elapsed_s": round(elapsed, 3),
+              "attempts_per_s": round(orders / elapsed, 1),
+              "inserts_per_s": round(counters["ok"] / elapsed, 1)}
+    result.update(counters)
+    result.update(verify(initial, expired))
+    result["correct"] = (result["oversold_batches"] == 0 and result["drifted_batches"] == 0
+                         and result["expired_batches_sold"] == 0)
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Legacy vs consolidated ORDERED_DRUG triggers under concurrent sales")
+    ap.add_argument("--threads", type=int, default=8, help="concurrent tills")
+    ap.add_argument("--sales", type=int, default=500, help="sale attempts per till")
+    ap.add_argument("--batches", type=int, default=20, help="batches sold from")
+    ap.add_argument("--expired", type=int, default=2, help="how many of those batches are expired")
+    ap.add_argument("--stock", type=int, default=200, help="starting stock per batch")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=list(VARIANTS))
+    ap.add_argument("--json", help="also write results to this file")
+    args = ap.parse_args()
+
+    results = [run_variant(v, args) for v in args.variants]
+    conn = connect(); cur = conn.cursor()
+    cur.execute(f"DROP DATABASE IF EXISTS {BENCH_DB}")
+    cur.close(); conn.close()
+
+    print(f"{'variant':<14}{'inserts/s':>11}{'ok':>8}{'rejected':>10}{'oversold':>10}{'drift':>7}{'expired sold':>14}  correct")
+    for r in results:
+        print(f"{r['variant']:<14}{r['inserts_per_s']:>11}{r['ok']:>8}{r['rejected']:>10}"
+              f"{r['oversold_batches']:>10}{r['drifted_batches']:>7}{r['expired_batches_sold']:>14}  {r['correct']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"params": vars(args), "results": results}, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# bench_service.py
+# Load test for pharmacy_service.py without a GUI: N simulated tills, each a
+# thread with its own keep-alive ServiceClient, run a mix of checkouts (FEFO,
+# one to three lines), add-to-order sales, expiry checks and pre-built reports
+# for a fixed time. Prints throughput and p50 / p95 / p99 per operation, and
+# the service's DB pool counters, i.e. how many connections the tills shared.
+#
+# Start the service first (against a datagen.py database, say) and point this
+# at it; the sales it makes are real and stay in the database. Every till logs
+# in with --emp-id / --auth-key (admin by default), as the login window does.
+#
+#   python pharmacy_service.py --database PharmacyBench --pool 8
+#   python benchmarks/bench_service.py --tills 20 --seconds 30
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import frontend_pharmacy as fp
+
+# operation -> relative weight in the mix
+MIX = {"checkout": 6, "add_ordered_drug": 2, "expiry": 2, "report": 1}
+REPORT = "Aggregate: Stock per Supplier"
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Till(threading.Thread):
+    def __init__(self, n, url, credentials, customers, drugs, stop_at, seed):
+        super().__init__(daemon=True)
+        self.client = fp.ServiceClient(url)
+        self.credentials = credentials
+        self.customers = customers
+        self.drugs = drugs
+        self.stop_at = stop_at
+        self.rng = random.Random(seed + n)
+        self.samples = {op: [] for op in MIX}
+        self.failed = {op: 0 for op in MIX}
+        self.last_order = None
+
+    def run(self):
+        ops, weights = list(MIX), list(MIX.values())
+        if not self.client.login(*self.credentials):
+            return
+        while time.monotonic() < self.stop_at:
+            op = self.rng.choices(ops, weights)[0]
+            if op == "add_ordered_drug" and self.last_order is None:
+                op = "checkout"
+            start = time.perf_counter()
+            ok = getattr(self, op)()
+            ms = (time.perf_counter() - start) * 1000
+            if ok:
+                self.samples[op].append(ms)
+            else:
+                self.failed[op] += 1
+
+    def checkout(self):
+        oid = self.client.next_id("ORDER")
+        bid = self.client.next_id("BILL")
+        if not oid or not bid:
+            return False
+        drugs = self.rng.sample(self.drugs, min(len(self.drugs), self.rng.randint(1, 3)))
+        lines = [(drug, None, 1, None) for drug in drugs]
+        total = self.client.checkout_order(oid, self.rng.choice(self.customers), None, None, lines, bid)
+        if total is None:
+            return False
+        self.last_order = oid
+        return True
+
+    def add_ordered_drug(self):
+        return self.client.add_ordered_drug(self.rng.choice(self.drugs), self.last_order, None, 1) is not None
+
+    def expiry(self):
+        return self.client.expiry_counts(7) is not None
+
+    def report(self):
+        return self.client.fetch_report(REPORT, 7) is not None
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Simulated tills against pharmacy_service.py")
+    ap.add_argument("--url", default="http://127.0.0.1:8765")
+    ap.add_argument("--tills", type=int, default=20)
+    ap.add_argument("--seconds", type=float, default=30)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--emp-id", default=fp.ADMIN_CREDENTIALS["username"], help="login every till uses")
+    ap.add_argument("--auth-key", default=fp.ADMIN_CREDENTIALS["password"])
+    ap.add_argument("--json", help="also write results to this file")
+    args = ap.parse_args()
+
+    errors = []
+    lock = threading.Lock()
+
+    def record_error(title, msg):
+        with lock:
+            errors.append(f"{title}: {msg}")
+    fp.show_db_error = record_error
+
+    credentials = (args.emp_id, args.auth_key)
+    setup = fp.ServiceClient(args.url)
+    if not setup.login(*credentials):
+        raise SystemExit(f"login to {args.url} as {args.emp_id} failed: {errors[:1]}")
+    customers = [r[0] for r in (setup._call("GET", "/lookup/customers") or {}).get("rows", [])]
+    drugs = [r[0] for r in (setup._call("GET", "/lookup/medicines") or {}).get("rows", [])]
+    if not customers or not drugs:
+        raise SystemExit(f"service at {args.url} returned no customers or medicines: {errors[:1]}")
+    before = setup._call("GET", "/health")
+
+    stop_at = time.monotonic() + args.seconds
+    tills = [Till(n, args.url, credentials, customers, drugs, stop_at, args.seed) for n in range(args.tills)]
+    started = time.perf_counter()
+    for t in tills:
+        t.start()
+    for t in tills:
+        t.join()
+    elapsed = time.perf_counter() - started
+    after = setup._call("GET", "/health") or {}
+
+    results = []
+    for op in MIX:
+        samples = [ms for t in tills for ms in t.samples[op]]
+        failed = sum(t.failed[op] for t in tills)
+        row = {"op": op, "ok": len(samples), "failed": failed, "per_s": round(len(samples) / elapsed, 1)}
+        if samples:
+            row.update(p50_ms=round(statistics.median(samples), 2), p95_ms=round(percentile(samples, 0.95), 2),
+                       p99_ms=round(percentile(samples, 0.99), 2))
+        results.append(row)
+
+    print(f"{args.tills} tills for {elapsed:.1f}s against {args.url}")
+    print(f"{'operation':<18}{'ok':>8}{'failed':>8}{'per s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for r in results:
+        print(f"{r['op']:<18}{r['ok']:>8}{r['failed']:>8}{r['per_s']:>8}"
+              f"{r.get('p50_ms', '-'):>9}{r.get('p95_ms', '-'):>9}{r.get('p99_ms', '-'):>9}")
+    pool = after.get("pool", {})
+    print(f"DB pool: size {pool.get('size')}, open {pool.get('open')}, waits {pool.get('waits')}, "
+          f"avg wait {pool.get('avg_wait_ms', 0):.1f} ms, timeouts {pool.get('timeouts')}")
+    for e in errors[:10]:
+        print("  " + e)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"params": dict(vars(args), auth_key="***"), "results": results, "health_before": before, "health_after": after,
+                       "errors": errors[:200]}, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+# bench_suite.py
+# Times every DB call path the app takes (tab loads through run_select, the
+# reference cache and search index builds, ID allocation, checkout, bulk
+# billing, CSV import, streaming export) and every pre-built report, using
+# the real helpers from frontend_pharmacy against a datagen.py dataset.
+#
+# Results go to a JSON file with the dataset plan, server version and git
+# commit alongside per-case min / median / p95, so runs from different
+# commits or machines can be compared with --compare.
+#
+# The dataset is kept after the run (generating 10m lines takes a while);
+# pass --reuse to time it again without regenerating, --drop to remove it.
+#
+#   python benchmarks/bench_suite.py --scale 10k
+#   python benchmarks/bench_suite.py --scale 1m --reuse --compare bench-1000000-42.json
+
+import argparse
+import csv
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datagen import BENCH_DB, ROOT, SCALES, connect, create_database, generate
+import frontend_pharmacy as fp
+
+# PagedTable first page + row count for each paged tab, as the app issues them
+PAGED_TABS = {
+    "Medicines": ("MEDICINE", ("BatchNo", "DrugName", "ExpiryDate", "Stock_quantity", "Price", "SupID", "Type"),
+                  ("BatchNo", "DrugName")),
+    "Customers": ("CUSTOMER", ("Cid", "Cname", "DOB", "InsuranceID", "Street", "DNO", "City", "Phone"), ("Cid",)),
+    "Orders": ("ORDER", ("OrderID", "Cid", "EmpID", "OrderDate"), ("OrderID",)),
+    "Ordered Drugs": ("ORDERED_DRUG", ("DrugName", "OrderID", "BatchNo", "Ordered_quantity", "Price"),
+                      ("DrugName", "OrderID", "BatchNo")),
+    "Bills": ("BILL", ("BillID", "Cid", "OrderID", "Total_amt", "Custpay", "Inspay"), ("BillID",)),
+    "Disposal": ("DISPOSAL", ("BatchNo", "DrugName", "Dis_Qty", "Company", "Emp_ID", "Expired", "Damaged",
+                              "Trial_Batch", "Contaminated"), ("BatchNo", "DrugName")),
+    "Prescriptions": ("PRESCRIPTION", ("PresID", "Cid", "DocID", "PresDate", "OrderID"), ("PresID",)),
+}
+
+IMPORT_ROWS = 2000      # customers upserted by the import_csv case
+
+ERRORS = []
+
+
+def record_error(title, msg):
+    """Stands in for the app's error popup: failed cases are flagged in the results."""
+    ERRORS.append(f"{title}: {msg}")
+
+
+def rows_of(result):
+    return len(result) if isinstance(result, (list, tuple, range, dict)) else None
+
+
+def read_cases(probe):
+    today = date.today()
+    feed = fp.NotificationFeed(fp.NOTIFICATION_FEED_CONFIG["batch"])
+    cases = []
+    for tab, (table, cols, keys) in PAGED_TABS.items():
+        order_by = ", ".join(f"{k} ASC" for k in keys)
+        page = f"SELECT {', '.join(cols)} FROM `{table}` ORDER BY {order_by} LIMIT {fp.TABLE_PAGE_SIZE}"
+        cases.append(("tab", f"{tab}: first page", lambda q=page: fp.run_select(q)))
+        cases.append(("tab", f"{tab}: row count", lambda t=table: fp.run_select(f"SELECT COUNT(*) FROM `{t}`")))
+    cases += [
+        ("tab", "Employees: full load", lambda: fp.run_select(
+            "SELECT EmpID, Ename, DOB, Role, Salary, Phone, AuthKey FROM EMPLOYEE")),
+        ("tab", "Suppliers: full load", lambda: fp.run_select(fp.PharmacyApp.SUPPLIER_QUERY)),
+        ("tab", "Notifications: full load", lambda: fp.run_select(fp.PharmacyApp.NOTIFICATION_QUERY)),
+        ("tab", "Prescribed drugs of a prescription", lambda: fp.run_select(
+            "SELECT DrugID, PresID, Quantity FROM PRESCRIBED_DRUG WHERE PresID=%s", (probe["pres"],))),
+        ("dashboard", "fetch_table_versions", fp.fetch_table_versions),
+        ("dashboard", "expiry check", lambda: fp.run_select(
+            "SELECT COUNT(*), IFNULL(SUM(ExpiryDate < %s), 0) FROM MEDICINE WHERE ExpiryDate <= %s",
+            (today, today + timedelta(days=fp.PharmacyApp.WARN_DAYS)))),
+        ("dashboard", "unseen notifications", lambda: fp.run_select(
+            "SELECT COUNT(*) FROM NOTIFICATION n WHERE NOT EXISTS (SELECT 1 FROM IS_NOTIFIED i WHERE i.NID = n.NID)")),
+        ("dashboard", "unread notifications: one employee (counter)", lambda: [fp.unread_count(probe["emp"])]),
+        ("dashboard", "notification feed: start + poll (nothing new)", lambda: feed.fetch(feed.start() or 0)),
+    ]
+    for name, (table, _query) in fp.REF_DATASETS.items():
+        def cold(name=name, table=table):
+            fp.REF_CACHE.invalidate(table)
+            return fp.REF_CACHE.get(name)
+        cases.append(("ref cache", f"cold load: {name}", cold))
+
+    built = {}
+
+    def build(index):
+        built[index] = fp.TextIndex(index.query, index.keys, index.changed)
+        built[index].refresh()
+
+    cases += [
+        ("search", "drug index build", lambda: build(fp.DRUG_INDEX)),
+        ("search", "drug index refresh (no changes)", lambda: built[fp.DRUG_INDEX].refresh()),
+        ("search", "drug search 'para'", lambda: built[fp.DRUG_INDEX].search("para")),
+        ("search", "customer index build", lambda: build(fp.CUSTOMER_INDEX)),
+        ("search", "customer search 'shar'", lambda: built[fp.CUSTOMER_INDEX].search("shar")),
+        ("ids", "lease_id_block(ORDER, 20)", lambda: fp.lease_id_block("ORDER", fp.ID_BLOCK_SIZE)),
+        ("queries", "explain orders report", lambda: fp.explain_query(
+            fp.PREBUILT_REPORTS["Join: Orders with Customer & Total"][0])),
+        ("queries", "run_select_with_cols custom SQL", lambda: fp.run_select_with_cols(
+            "SELECT Cid, COUNT(*) FROM `ORDER` GROUP BY Cid ORDER BY COUNT(*) DESC LIMIT 20")[1]),
+    ]
+    for name, (sql, _tables) in fp.PREBUILT_REPORTS.items():
+        if "%s" not in sql:
+            params = ()
+        elif "IsExpired" in sql:
+            params = (probe["batch"], probe["drug"])
+        else:
+            params = (today + timedelta(days=fp.PharmacyApp.WARN_DAYS),)
+        cases.append(("report", name, lambda q=sql, p=params: stream(q, p)))
+    cases.append(("export", "ORDERED_DRUG to CSV", export_lines))
+    return cases
+
+
+def stream(query, params):
+    """The Queries-tab path: QueryStream with no row cap or time limit, rows discarded."""
+    qs = fp.QueryStream(None, query, params, on_columns=lambda cols: None, on_rows=lambda rows: None,
+                        max_rows=None, timeout_ms=0, in_worker=True)
+    qs.run()
+    return range(qs.rows)
+
+
+def export_lines():
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    try:
+        qs = fp.QueryStream(None, "SELECT DrugName, OrderID, BatchNo, Ordered_quantity, Price FROM ORDERED_DRUG",
+                            max_rows=None, timeout_ms=0, in_worker=True)
+        rows, _ = fp.export_query(qs, path, "CSV")
+        return range(rows)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def write_cases(probe, csv_path):
+    """Write paths; each run adds rows, so they go after the reads."""
+    run_tag = int(time.time())          # keeps AddMedicine batch numbers unique across --reuse runs
+    counter = iter(range(10 ** 6))
+
+    def checkout():
+        oid = fp.ID_ALLOCATOR.next_id("ORDER")
+        bill = fp.ID_ALLOCATOR.next_id("BILL")
+        lines = [(probe["drug"], "", 1, None)]
+        return [fp.checkout_order(oid, probe["cid"], probe["emp"], date.today(), lines, bill)]
+
+    def add_medicine():
+        n = next(counter)
+        return fp.call_procedure("AddMedicine", (f"BENCH{run_tag}-{n}", probe["drug"], date.today() + timedelta(days=400),
+                                                 100, 9.5, probe["sup"], "Tablet")) and [1]
+
+    def notify():
+        nid = fp.ID_ALLOCATOR.next_id("NOTIFICATION")
+        return fp.run_query("INSERT INTO NOTIFICATION (NID, Type, Message) VALUES (%s,%s,%s)",
+                            (nid, "Stock Alert", "bench")) and [1]
+
+    def import_customers():
+        summary = fp.import_csv(csv_path, "CUSTOMER", upsert=True)
+        return range(summary["loaded"]) if summary else None
+
+    return [
+        ("ids", "ID_ALLOCATOR.next_id(ORDER)", lambda: [fp.ID_ALLOCATOR.next_id("ORDER")], None),
+        ("write", "run_query: add notification", notify, None),
+        # The first run marks the employee's whole backlog; later runs only what notify() added
+        ("write", "mark_all_seen: one employee", lambda: range(fp.mark_all_seen(probe["emp"]) or 0), None),
+        ("write", "call_procedure: AddMedicine", add_medicine, None),
+        ("write", "checkout_order: one FEFO line", checkout, None),
+        ("write", f"import_csv: {IMPORT_ROWS} customers (upsert)", import_customers, None),
+        # The first run bills the whole unbilled backlog; later runs find nothing
+        ("write", "bill_unbilled_orders: backlog", lambda: [fp.bill_unbilled_orders()], 1),
+    ]
+
+
+def customers_csv():
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(fd, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["Cid", "Cname", "DOB", "InsuranceID", "Street", "DNO", "City", "Phone"])
+        for i in range(IMPORT_ROWS):
+            w.writerow([f"Z{i:04d}", f"Imported {i}", "1990-01-01", "", "MG Road", str(i), "Bangalore", ""])
+    return path
+
+
+def run_case(group, name, fn, repeat):
+    samples, rows, errors = [], None, []
+    for _ in range(repeat):
+        del ERRORS[:]
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+        rows = rows_of(result)
+        errors += ERRORS
+    samples.sort()
+    return {"group": group, "case": name, "n": len(samples), "rows": rows,
+            "min_ms": round(samples[0], 3), "median_ms": round(statistics.median(samples), 3),
+            "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+            "max_ms": round(samples[-1], 3), "errors": errors[:3]}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_plan(conn, meta):
+    cur = conn.cursor()
+    cur.execute("CREATE TABLE IF NOT EXISTS BENCH_META (Name VARCHAR(30) PRIMARY KEY, Value TEXT)")
+    cur.execute("REPLACE INTO BENCH_META VALUES ('plan', %s)", (json.dumps(meta, default=str),))
+    conn.commit()
+    cur.close()
+
+
+def load_plan(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT Value FROM BENCH_META WHERE Name = 'plan'")
+    row = cur.fetchone()
+    cur.close()
+    if not row:
+        raise SystemExit("no BENCH_META plan in this database; run once without --reuse")
+    return json.loads(row[0])
+
+
+def compare(results, old_path):
+    with open(old_path) as f:
+        old = {(r["group"], r["case"]): r for r in json.load(f)["results"]}
+    width = max(len(r["case"]) for r in results) + 12
+    print(f"\n{'case':<{width}}{'old ms':>11}{'new ms':>11}{'change':>9}")
+    for r in results:
+        o = old.get((r["group"], r["case"]))
+        if not o:
+            continue
+        change = f"{r['median_ms'] / o['median_ms']:.2f}x" if o["median_ms"] else "-"
+        print(f"{r['group'] + ': ' + r['case']:<{width}}{o['median_ms']:>11}{r['median_ms']:>11}{change:>9}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Time the pharmacy app's DB call paths and reports at scale")
+    ap.add_argument("--scale", choices=list(SCALES), default="10k", help="ORDERED_DRUG rows: 10k, 1m or 10m")
+    ap.add_argument("--lines", type=int, help="exact ORDERED_DRUG row count (overrides --scale)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--database", default=BENCH_DB)
+    ap.add_argument("--reuse", action="store_true", help="time the existing dataset instead of regenerating it")
+    ap.add_argument("--drop", action="store_true", help="drop the database when done")
+    ap.add_argument("--repeat", type=int, default=5, help="timed runs per case")
+    ap.add_argument("--out", help="results file (default bench-<lines>-<seed>.json)")
+    ap.add_argument("--compare", help="earlier results file to compare medians with")
+    args = ap.parse_args()
+    if args.database == "PharmacyDB":
+        raise SystemExit("refusing to generate into PharmacyDB; use a scratch database")
+
+    conn = connect()
+    if args.reuse:
+        conn.database = args.database
+        meta = load_plan(conn)
+    else:
+        create_database(conn, args.database)
+        conn.database = args.database
+        meta = generate(conn, args.lines or SCALES[args.scale], args.seed)
+        save_plan(conn, meta)
+    cur = conn.cursor()
+    cur.execute("SELECT VERSION()")
+    server = cur.fetchone()[0]
+    cur.close()
+
+    # The app's helpers run unchanged against the benchmark database
+    fp.DB_CONFIG["database"] = args.database
+    fp.show_db_error = record_error
+    probe = meta["probe"]
+    csv_path = customers_csv()
+    results = []
+    try:
+        for group, name, fn in read_cases(probe):
+            results.append(run_case(group, name, fn, args.repeat))
+            print(f"{group:<10} {name:<60} {results[-1]['median_ms']:>10} ms")
+        for group, name, fn, repeat in write_cases(probe, csv_path):
+            results.append(run_case(group, name, fn, repeat or args.repeat))
+            print(f"{group:<10} {name:<60} {results[-1]['median_ms']:>10} ms")
+    finally:
+        os.remove(csv_path)
+        fp.DB_POOL.close_all()
+        if args.drop:
+            cur = conn.cursor()
+            cur.execute(f"DROP DATABASE IF EXISTS {args.database}")
+            cur.close()
+        conn.close()
+
+    failed = [r for r in results if r["errors"]]
+    for r in failed:
+        print(f"FAILED {r['group']}: {r['case']}: {r['errors'][0]}")
+    out = args.out or f"bench-{meta['lines']}-{meta['seed']}.json"
+    with open(out, "w") as f:
+        json.dump({"meta": {"plan": meta, "server": server, "commit": git_commit(),
+                            "python": platform.python_version(), "platform": platform.platform(),
+                            "repeat": args.repeat, "run_at": datetime.now().isoformat(timespec="seconds")},
+                   "results": results}, f, indent=2, default=str)
+    print(f"\n{len(results)} cases, {len(failed)} failed; results written to {out}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
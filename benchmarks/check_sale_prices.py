@@ -0,0 +1,115 @@
+# check_sale_prices.py
+# Price check for sales that name their batch: a checkout line or an
+# add-to-order line with an explicit BatchNo and no price must be stored at
+# that batch's MEDICINE.Price, never at 0.00, while a line that gives a price
+# keeps it. The lines are posted through pharmacy_service.py (run in-process
+# on a scratch database built from PHARMACY_DATABASE.sql), so the service's
+# JSON handling and the helpers behind it are both covered. Exits non-zero
+# if any stored price is wrong.
+#
+#   python benchmarks/check_sale_prices.py --port 8799
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from datagen import BENCH_DB, connect, create_database
+import frontend_pharmacy as fp
+import pharmacy_service as svc
+
+DRUG = "PriceCheck"
+BATCHES = {"PC1": Decimal("3.75"), "PC2": Decimal("4.10"), "PC3": Decimal("5.20")}
+GIVEN_PRICE = Decimal("9.99")    # the one line that names its own price
+
+
+def setup():
+    conn = connect()
+    create_database(conn, BENCH_DB, with_migrations=True, log=lambda msg: None)
+    conn.database = BENCH_DB
+    cur = conn.cursor()
+    expiry = date.today() + timedelta(days=365)
+    cur.executemany("INSERT INTO MEDICINE (BatchNo, DrugName, ExpiryDate, Stock_quantity, Price, SupID, Type) "
+                    "VALUES (%s,%s,%s,100,%s,NULL,'Tablet')",
+                    [(batch, DRUG, expiry, price) for batch, price in BATCHES.items()])
+    cur.execute("SELECT Cid FROM CUSTOMER ORDER BY Cid LIMIT 1")
+    cid = cur.fetchone()[0]
+    conn.commit()
+    cur.close(); conn.close()
+    return cid
+
+
+def start_service(port, pool):
+    svc.configure(pool, BENCH_DB)
+    service = svc.PharmacyService(pool)
+    threading.Thread(target=lambda: asyncio.run(svc.serve("127.0.0.1", port, service)), daemon=True).start()
+    return service
+
+
+def stored_prices(order_id):
+    conn = connect(BENCH_DB)
+    cur = conn.cursor()
+    cur.execute("SELECT BatchNo, Price FROM ORDERED_DRUG WHERE OrderID = %s AND DrugName = %s", (order_id, DRUG))
+    rows = {b: Decimal(p) if p is not None else None for b, p in cur.fetchall()}
+    cur.close(); conn.close()
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Explicit-batch sales without a price must use the batch price")
+    ap.add_argument("--port", type=int, default=8799, help="port for the in-process service")
+    ap.add_argument("--pool", type=int, default=4)
+    ap.add_argument("--keep", action="store_true", help="keep the scratch database afterwards")
+    args = ap.parse_args()
+
+    errors = []
+    fp.show_db_error = lambda title, msg: errors.append(f"{title}: {msg}")
+    cid = setup()
+    service = start_service(args.port, args.pool)
+
+    client = fp.ServiceClient(f"http://127.0.0.1:{args.port}", timeout=10)
+    for _ in range(50):
+        if client.login(fp.ADMIN_CREDENTIALS["username"], fp.ADMIN_CREDENTIALS["password"]):
+            break
+        time.sleep(0.1)
+    else:
+        raise SystemExit(f"could not log in to the service: {errors[:1]}")
+    errors.clear()
+
+    oid, bid = client.next_id("ORDER"), client.next_id("BILL")
+    total = client.checkout_order(oid, cid, None, None,
+                                  [(DRUG, "PC1", 2, None), (DRUG, "PC3", 1, float(GIVEN_PRICE))], bid)
+    added = client.add_ordered_drug(DRUG, oid, "PC2", 1)
+
+    expected = {"PC1": BATCHES["PC1"], "PC2": BATCHES["PC2"], "PC3": GIVEN_PRICE}
+    stored = stored_prices(oid)
+    expected_total = 2 * BATCHES["PC1"] + GIVEN_PRICE
+    ok = (total is not None and added is not None and stored == expected
+          and abs(Decimal(str(total)) - expected_total) < Decimal("0.005"))
+
+    print(f"{'batch':<8}{'MEDICINE':>10}{'expected':>10}{'stored':>10}")
+    for batch in sorted(expected):
+        print(f"{batch:<8}{BATCHES[batch]:>10}{expected[batch]:>10}{str(stored.get(batch)):>10}")
+    print(f"checkout total {total} (expected {expected_total})")
+    for e in errors:
+        print("  " + e)
+
+    client.logout()
+    service.close()
+    if not args.keep:
+        conn = connect(); cur = conn.cursor()
+        cur.execute(f"DROP DATABASE IF EXISTS {BENCH_DB}")
+        cur.close(); conn.close()
+    print("correct" if ok else "WRONG PRICES")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+# check_stock_edits.py
+# Concurrency check for MEDICINE edits: seller threads sell from a few batches
+# (trg_sell_stock decrements stock) while editor threads run the Medicines
+# "Update Selected" flow on the same batches: read the row, think for a
+# moment, then restock / correct the count and change the price.
+#
+#   delta   the app's path: update_medicine() with RowVersion check and a stock
+#           delta, re-reading and retrying on conflict as the dialog offers
+#   legacy  the old dialog: write back an absolute Stock_quantity computed from
+#           the value read before the pause
+#
+# Afterwards every batch must satisfy  final = initial + adjustments - sold
+# (no drift), no stock may be negative, STOCK_VALUE_SUMMARY must still agree
+# with MEDICINE, and each batch's RowVersion must equal the number of price
+# edits that went through. Runs in its own scratch database built from
+# PHARMACY_DATABASE.sql and exits non-zero if the delta mode fails a check.
+#
+#   python benchmarks/check_stock_edits.py --sellers 8 --editors 4 --seconds 20
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from datagen import BENCH_DB, connect, create_database
+import frontend_pharmacy as fp
+
+DRUG = "EditCheck"
+ERRORS = []
+ERRORS_LOCK = threading.Lock()
+
+
+def record_error(title, msg):
+    with ERRORS_LOCK:
+        ERRORS.append(f"{title}: {msg}")
+
+
+def setup(batches, stock):
+    conn = connect()
+    create_database(conn, BENCH_DB, with_migrations=True, log=lambda msg: None)
+    conn.database = BENCH_DB
+    cur = conn.cursor()
+    expiry = date.today() + timedelta(days=365)
+    cur.executemany("INSERT INTO MEDICINE (BatchNo, DrugName, ExpiryDate, Stock_quantity, Price, SupID, Type) "
+                    "VALUES (%s,%s,%s,%s,%s,NULL,'Tablet')",
+                    [(f"E{i:03d}", DRUG, expiry, stock, Decimal("2.50")) for i in range(batches)])
+    cur.execute("SELECT Cid FROM CUSTOMER ORDER BY Cid LIMIT 1")
+    cid = cur.fetchone()[0]
+    conn.commit()
+    cur.close(); conn.close()
+    return {f"E{i:03d}": stock for i in range(batches)}, cid
+
+
+class Seller(threading.Thread):
+    def __init__(self, n, batches, cid, stop_at, seed):
+        super().__init__(daemon=True)
+        self.n, self.batches, self.cid, self.stop_at = n, batches, cid, stop_at
+        self.rng = random.Random(seed * 1000 + n)
+        self.ok = self.rejected = 0
+
+    def run(self):
+        i = 0
+        while time.monotonic() < self.stop_at:
+            oid = f"CS{self.n}-{i}"
+            i += 1
+            if not fp.run_query("INSERT INTO `ORDER` (OrderID, Cid, EmpID, OrderDate) VALUES (%s,%s,NULL,CURDATE())",
+                                (oid, self.cid)):
+                continue
+            row = (DRUG, oid, self.rng.choice(self.batches), self.rng.randint(1, 4), 2.50)
+            if fp.run_query(fp.ORDERED_DRUG_INSERT, row):
+                self.ok += 1
+            else:
+                self.rejected += 1
+
+
+class Editor(threading.Thread):
+    def __init__(self, n, batches, mode, stop_at, seed, think_s):
+        super().__init__(daemon=True)
+        self.batches, self.mode, self.stop_at, self.think_s = batches, mode, stop_at, think_s
+        self.rng = random.Random(seed * 1000 + 500 + n)
+        self.adjusted = {b: 0 for b in batches}    # stock deltas that were applied
+        self.price_edits = {b: 0 for b in batches}
+        self.edits = self.conflicts = self.short = 0
+
+    def run(self):
+        while time.monotonic() < self.stop_at:
+            batch = self.rng.choice(self.batches)
+            base = fp.fetch_medicine(batch, DRUG)
+            if base is None:
+                continue
+            time.sleep(self.rng.uniform(0, self.think_s))    # the user typing in the dialog
+            # A restock, or a count correction after a stock take
+            delta = self.rng.choice([self.rng.randint(5, 30), -self.rng.randint(1, 5)])
+            price = base["Price"] + Decimal("0.01")
+            if self.mode == "legacy":
+                self.legacy_edit(batch, base, delta, price)
+            else:
+                self.delta_edit(batch, base, delta, price)
+
+    def legacy_edit(self, batch, base, delta, price):
+        stock = (base["Stock_quantity"] or 0) + delta
+        if stock < 0:
+            return
+        if fp.run_query("UPDATE MEDICINE SET Stock_quantity=%s, Price=%s WHERE BatchNo=%s AND DrugName=%s",
+                        (stock, price, batch, DRUG)):
+            self.adjusted[batch] += delta
+            self.price_edits[batch] += 1
+            self.edits += 1
+
+    def delta_edit(self, batch, base, delta, price):
+        changes = {"Price": price}
+        version = base["RowVersion"]
+        while True:
+            res = fp.update_medicine(batch, DRUG, version, changes, delta)
+            if res is None:
+                return
+            status, current = res
+            if status == "ok":
+                self.adjusted[batch] += delta
+                self.price_edits[batch] += 1
+                self.edits += 1
+                return
+            if status == "conflict":
+                # "Apply your changes on top of theirs": same edit, newer version
+                self.conflicts += 1
+                version = current["RowVersion"]
+                changes = {"Price": current["Price"] + Decimal("0.01")}
+                continue
+            if status == "negative":
+                self.short += 1
+            return
+
+
+def verify(initial, sellers, editors):
+    conn = connect(BENCH_DB)
+    cur = conn.cursor()
+    cur.execute("SELECT BatchNo, Stock_quantity, RowVersion FROM MEDICINE WHERE DrugName = %s", (DRUG,))
+    final = {b: (int(s), int(v)) for b, s, v in cur.fetchall()}
+    cur.execute("SELECT BatchNo, SUM(Ordered_quantity) FROM ORDERED_DRUG WHERE DrugName = %s GROUP BY BatchNo",
+                (DRUG,))
+    sold = {b: int(q) for b, q in cur.fetchall()}
+    cur.execute("SELECT (SELECT IFNULL(SUM(TotalQty), 0) FROM STOCK_VALUE_SUMMARY), "
+                "(SELECT IFNULL(SUM(Stock_quantity), 0) FROM MEDICINE)")
+    summary_qty, medicine_qty = (int(v) for v in cur.fetchone())
+    cur.close(); conn.close()
+
+    adjusted = {b: sum(e.adjusted[b] for e in editors) for b in initial}
+    price_edits = {b: sum(e.price_edits[b] for e in editors) for b in initial}
+    drifted = {b: {"final": final[b][0], "expected": initial[b] + adjusted[b] - sold.get(b, 0)}
+               for b in initial if final[b][0] != initial[b] + adjusted[b] - sold.get(b, 0)}
+    return {
+        "sales": sum(s.ok for s in sellers), "sales_rejected": sum(s.rejected for s in sellers),
+        "units_sold": sum(sold.values()), "edits": sum(e.edits for e in editors),
+        "conflicts_retried": sum(e.conflicts for e in editors),
+        "edits_refused_short": sum(e.short for e in editors),
+        "drifted_batches": len(drifted), "drift_units": sum(abs(d["final"] - d["expected"]) for d in drifted.values()),
+        "negative_batches": sum(1 for s, _ in final.values() if s < 0),
+        "summary_mismatch": summary_qty - medicine_qty,
+        "version_mismatches": sum(1 for b in initial if final[b][1] != price_edits[b]),
+        "drifted": drifted,
+    }
+
+
+def run_mode(mode, args):
+    ERRORS.clear()
+    initial, cid = setup(args.batches, args.stock)
+    fp.REF_CACHE.invalidate("MEDICINE")
+    batches = sorted(initial)
+    stop_at = time.monotonic() + args.seconds
+    sellers = [Seller(n, batches, cid, stop_at, args.seed) for n in range(args.sellers)]
+    editors = [Editor(n, batches, mode, stop_at, args.seed, args.think_ms / 1000) for n in range(args.editors)]
+    for t in sellers + editors:
+        t.start()
+    for t in sellers + editors:
+        t.join()
+    result = {"mode": mode}
+    result.update(verify(initial, sellers, editors))
+    # Only the trigger's stock / expiry refusals are expected
+    result["unexpected_errors"] = [e for e in ERRORS if "45000" not in e and "stock" not in e.lower()][:20]
+    checks = ["drifted_batches", "negative_batches", "summary_mismatch"]
+    if mode == "delta":
+        checks.append("version_mismatches")
+    result["correct"] = all(result[c] == 0 for c in checks) and not result["unexpected_errors"]
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Concurrent sales and stock edits must never make stock drift")
+    ap.add_argument("--sellers", type=int, default=8, help="threads selling from the batches")
+    ap.add_argument("--editors", type=int, default=4, help="threads editing the same batches")
+    ap.add_argument("--batches", type=int, default=3, help="batches everyone works on (few = more contention)")
+    ap.add_argument("--stock", type=int, default=500, help="starting stock per batch")
+    ap.add_argument("--seconds", type=float, default=20)
+    ap.add_argument("--think-ms", type=float, default=50, help="max pause between reading a row and saving the edit")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--modes", nargs="+", default=["delta", "legacy"], choices=["delta", "legacy"])
+    ap.add_argument("--keep", action="store_true", help="keep the scratch database afterwards")
+    ap.add_argument("--json", help="also write results to this file")
+    args = ap.parse_args()
+
+    fp.DB_CONFIG["database"] = BENCH_DB
+    fp.DB_POOL = fp.ConnectionPool(**dict(fp.POOL_CONFIG, size=args.sellers + args.editors + 2))
+    fp.show_db_error = record_error
+
+    results = [run_mode(mode, args) for mode in args.modes]
+    fp.DB_POOL.close_all()
+    if not args.keep:
+        conn = connect(); cur = conn.cursor()
+        cur.execute(f"DROP DATABASE IF EXISTS {BENCH_DB}")
+        cur.close(); conn.close()
+
+    print(f"{'mode':<8}{'sales':>8}{'edits':>7}{'conflicts':>11}{'drift':>7}{'units':>7}{'negative':>10}"
+          f"{'summary':>9}{'versions':>10}  correct")
+    for r in results:
+        print(f"{r['mode']:<8}{r['sales']:>8}{r['edits']:>7}{r['conflicts_retried']:>11}{r['drifted_batches']:>7}"
+              f"{r['drift_units']:>7}{r['negative_batches']:>10}{r['summary_mismatch']:>9}"
+              f"{r['version_mismatches']:>10}  {r['correct']}")
+        for e in r["unexpected_errors"]:
+            print("  " + e)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"params": vars(args), "results": results}, f, indent=2, default=str)
+    if not all(r["correct"] for r in results if r["mode"] == "delta"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
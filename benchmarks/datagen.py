@@ -0,0 +1,375 @@
+# datagen.py
+# Deterministic synthetic data for PharmacyDB at benchmark scale.
+#
+# The scale is the number of ORDERED_DRUG rows; every other table is sized
+# from it (orders average ~2.3 lines, a customer places ~12 orders, ...).
+# Popularity is skewed the way pharmacy sales are: a few drugs and regular
+# customers account for most lines, baskets are mostly one or two items,
+# volume dips at weekends and grows over the two-year history, and most
+# orders are billed, the newest ones not yet. Every foreign key resolves.
+#
+# Sales go through trg_sell_stock like real ones, which only accepts batches
+# that are not expired today, so sold batches are generated with future
+# expiry dates and the already-expired batches (about 5%) have no sales and
+# are mostly disposed of. Stock is then set to a realistic remainder.
+#
+# The same --seed and --today always produce the same rows.
+#
+#   python benchmarks/datagen.py --scale 1m --database PharmacyBench --fresh
+#   python benchmarks/datagen.py --lines 250000 --seed 7 --fresh
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from itertools import accumulate
+
+import mysql.connector
+from mysql.connector import Error
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "migrations"))
+from frontend_pharmacy import DB_CONFIG
+from migrate import split_statements
+
+BENCH_DB = "PharmacyBench"
+SCALES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}   # ORDERED_DRUG rows
+CHUNK_ORDERS = 5000          # orders generated, inserted and committed per round
+HISTORY_DAYS = 730
+FIRST_NUMBER = 1_000_000     # generated Order/Pres/Bill/NIDs start here, clear of the sample rows
+
+MIGRATIONS_MARKER = "-- SCHEMA MIGRATIONS"
+DEMO_MARKER = "-- Demonstration / Presentation Queries"
+
+GENERICS = ["Paracetamol", "Amoxicillin", "Ibuprofen", "Cetirizine", "Metformin", "Atorvastatin",
+            "Amlodipine", "Omeprazole", "Pantoprazole", "Azithromycin", "Ciprofloxacin", "Losartan",
+            "Levothyroxine", "Montelukast", "Diclofenac", "Aspirin", "Clopidogrel", "Telmisartan",
+            "Glimepiride", "Ranitidine", "Domperidone", "Ondansetron", "Doxycycline", "Fluconazole",
+            "Prednisolone", "Salbutamol", "Loratadine", "Rosuvastatin", "Metoprolol", "Sertraline",
+            "Escitalopram", "Gabapentin", "Tramadol", "Vitamin D3", "Folic Acid", "Calcium Carbonate",
+            "Ferrous Sulfate", "Zinc Sulfate", "ORS", "Calamine"]
+STRENGTHS = [5, 10, 20, 25, 40, 50, 100, 125, 250, 500, 650, 1000]
+FORMS = [("Tablet", 55), ("Capsule", 20), ("Syrup", 10), ("Injection", 5), ("Ointment", 5), ("Drops", 5)]
+FIRST_NAMES = ["Aarav", "Vivaan", "Aditya", "Ananya", "Diya", "Isha", "Kabir", "Meera", "Neha", "Rahul",
+               "Riya", "Rohan", "Saanvi", "Sneha", "Arjun", "Kavya", "Nikhil", "Pooja", "Siddharth", "Tara"]
+LAST_NAMES = ["Sharma", "Iyer", "Reddy", "Nair", "Gowda", "Rao", "Patel", "Menon", "Das", "Kumar",
+              "Hegde", "Shetty", "Pillai", "Joshi", "Bhat"]
+AREAS = ["Jayanagar", "Indiranagar", "Koramangala", "BTM Layout", "MG Road", "Whitefield",
+         "Malleshwaram", "HSR Layout", "Banashankari", "Hebbal"]
+INSURERS = ["HealthFirst", "MediSecure", "HappyHealth", "CareShield", "LifeLine", "SafeCover"]
+BASKET_SIZES = [(1, 40), (2, 25), (3, 15), (4, 10), (5, 5), (6, 3), (7, 2)]    # mean ~2.3 lines
+QUANTITIES = [(1, 45), (2, 25), (3, 10), (5, 8), (10, 10), (30, 2)]
+NOTIFICATION_TYPES = ["Expiry Alert", "Stock Alert", "Order Alert"]
+B36 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def connect(db=None):
+    cfg = dict(DB_CONFIG)
+    cfg.pop("database", None)
+    if db:
+        cfg["database"] = db
+    return mysql.connector.connect(**cfg)
+
+
+def schema_statements(db=BENCH_DB, with_migrations=True):
+    """PHARMACY_DATABASE.sql retargeted at `db`, without the demo queries.
+
+    Without migrations it stops above the SCHEMA MIGRATIONS block, i.e. the
+    schema as it was before migrations/0001.
+    """
+    with open(os.path.join(ROOT, "PHARMACY_DATABASE.sql"), encoding="utf-8") as f:
+        sql = f.read()
+    sql = sql[:sql.index(DEMO_MARKER if with_migrations else MIGRATIONS_MARKER)]
+    return split_statements(sql.replace("PharmacyDB", db))
+
+
+def create_database(conn, db=BENCH_DB, with_migrations=True, log=print):
+    """Drop and recreate `db` from the schema script, sample rows included."""
+    cur = conn.cursor()
+    for stmt in schema_statements(db, with_migrations):
+        try:
+            cur.execute(stmt)
+            if cur.with_rows:
+                cur.fetchall()
+        except Error as e:
+            if e.sqlstate != "45000":
+                raise
+            # Sample sales of batches that have since expired are refused by trg_sell_stock
+            log(f"skipped sample row: {e.msg}")
+    conn.commit()
+    cur.close()
+
+
+def plan(lines):
+    """Row counts per table for a dataset of `lines` ORDERED_DRUG rows."""
+    orders = max(1, round(lines / 2.3))
+    drugs = min(len(GENERICS) * len(STRENGTHS), max(60, lines // 2000))
+    return {
+        "lines": lines,
+        "orders": orders,
+        "customers": min(36 ** 4 - 1, max(50, orders // 12)),
+        "employees": min(400, max(5, orders // 25000)),
+        "drugs": drugs,
+        "suppliers": min(1000, max(5, drugs // 8)),
+        "insurers": 12,
+        "notifications": min(500_000, max(50, orders // 40)),
+    }
+
+
+def _b36(prefix, n):
+    """prefix + 4 base-36 digits: fits the VARCHAR(5) ids, 1.6M values, never clashes with 'C1'-style samples."""
+    digits = ""
+    for _ in range(4):
+        n, r = divmod(n, 36)
+        digits = B36[r] + digits
+    return prefix + digits
+
+
+def _cum(weights):
+    return list(accumulate(weights))
+
+
+def _zipf(n, s):
+    return _cum([1 / (rank ** s) for rank in range(1, n + 1)])
+
+
+def _phone(rnd):
+    return str(rnd.choice("6789")) + "".join(rnd.choice("0123456789") for _ in range(9))
+
+
+def _pick(rnd, table):
+    values, weights = zip(*table)
+    return rnd.choices(values, weights=weights)[0]
+
+
+def _insert(cur, sql, rows, batch=5000):
+    for i in range(0, len(rows), batch):
+        cur.executemany(sql, rows[i:i + batch])
+
+
+def _order_days(orders, today):
+    """Yield the date of every order, oldest first: weekend dip and steady growth."""
+    start = today - timedelta(days=HISTORY_DAYS - 1)
+    calendar = [start + timedelta(days=d) for d in range(HISTORY_DAYS)]
+    cum = _cum([(0.5 if day.weekday() == 6 else 0.8 if day.weekday() == 5 else 1.0) * (1 + d / HISTORY_DAYS)
+                for d, day in enumerate(calendar)])
+    d = 0
+    for i in range(orders):
+        target = (i + 0.5) / orders * cum[-1]
+        while cum[d] < target:
+            d += 1
+        yield calendar[d]
+
+
+def _basket_sizes(rnd, orders, lines, max_size):
+    """Lines per order, drawn from BASKET_SIZES and nudged to sum to exactly `lines`."""
+    values, weights = zip(*BASKET_SIZES)
+    sizes = [min(n, max_size) for n in rnd.choices(values, weights=weights, k=orders)]
+    diff = lines - sum(sizes)
+    while diff:
+        i = rnd.randrange(orders)
+        if diff > 0 and sizes[i] < max_size:
+            sizes[i] += 1
+            diff -= 1
+        elif diff < 0 and sizes[i] > 1:
+            sizes[i] -= 1
+            diff += 1
+    return sizes
+
+
+def generate(conn, lines, seed=42, today=None, log=print):
+    """Populate the connected database with `lines` ORDERED_DRUG rows and everything they reference.
+
+    Returns the plan() counts plus the ids benchmarks probe.
+    """
+    rnd = random.Random(seed)
+    today = today or date.today()
+    p = plan(lines)
+    cur = conn.cursor()
+    started = time.perf_counter()
+
+    # --- reference data ---
+    insurers = [_b36("I", i + 1) for i in range(p["insurers"])]
+    ins_rows = []
+    for i, iid in enumerate(insurers):
+        start = today - timedelta(days=rnd.randint(30, 900))
+        end = start + timedelta(days=365 * rnd.choice((1, 2, 3)))
+        ins_rows.append((iid, start, end, f"{INSURERS[i % len(INSURERS)]} Plan {i // len(INSURERS) + 1}"))
+    _insert(cur, "INSERT INTO INSURANCE VALUES (%s,%s,%s,%s)", ins_rows)
+
+    emps = [_b36("E", i + 1) for i in range(p["employees"])]
+    _insert(cur, "INSERT INTO EMPLOYEE VALUES (%s,%s,%s,%s,%s,%s,%s)",
+            [(e, f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}",
+              date(rnd.randint(1965, 2002), rnd.randint(1, 12), rnd.randint(1, 28)),
+              "Manager" if i % 10 == 0 else "Pharmacist", rnd.randint(25, 90) * 1000, _phone(rnd), None)
+             for i, e in enumerate(emps)])
+    _insert(cur, "INSERT INTO EMPLOYEE_PHONE VALUES (%s,%s)", [(e, _phone(rnd)) for e in emps])
+
+    sups = [_b36("S", i + 1) for i in range(p["suppliers"])]
+    _insert(cur, "INSERT INTO SUPPLIER VALUES (%s,%s,%s,%s,%s,%s,%s)",
+            [(s, f"{rnd.choice(LAST_NAMES)} Pharma {s}", f"LIC-{s}", f"orders@{s.lower()}.example",
+              _phone(rnd), rnd.choice(AREAS), "Bangalore") for s in sups])
+    _insert(cur, "INSERT INTO SUPPLIER_PHONE VALUES (%s,%s)", [(s, _phone(rnd)) for s in sups])
+
+    # --- medicines: a few batches per drug, staggered expiry ---
+    drug_names = [f"{g} {mg}mg" for g in GENERICS for mg in STRENGTHS]
+    rnd.shuffle(drug_names)                 # popularity rank is independent of the name
+    drug_names = drug_names[:p["drugs"]]
+    sellable = []                           # drug index -> [(BatchNo, price)]
+    med_rows, supplies, disposals = [], [], []
+    batch_no = 0
+    for d, name in enumerate(drug_names):
+        form = _pick(rnd, FORMS)
+        sup = rnd.choice(sups)
+        price = round(rnd.lognormvariate(2.3, 0.8), 2)
+        sellable.append([])
+        for _ in range(rnd.randint(2, 6)):
+            batch_no += 1
+            bno = f"G{batch_no:07d}"
+            if rnd.random() < 0.05:
+                expiry = today - timedelta(days=rnd.randint(1, 365))
+                if rnd.random() < 0.6:
+                    disposals.append((bno, name, rnd.randint(5, 200), rnd.choice(("WasteCo", "BioDispose")),
+                                      rnd.choice(emps), True, False, False, rnd.random() < 0.1))
+            else:
+                expiry = today + timedelta(days=rnd.randint(1, 900))
+                sellable[d].append((bno, round(price * rnd.uniform(0.95, 1.05), 2)))
+            med_rows.append((bno, name, expiry, 10 ** 9, price, sup, form))
+            supplies.append((sup, name, bno))
+        if not sellable[d]:                 # every drug stays sellable
+            med_rows[-1] = med_rows[-1][:2] + (today + timedelta(days=365),) + med_rows[-1][3:]
+            sellable[d].append((med_rows[-1][0], price))
+            disposals = [r for r in disposals if r[0] != med_rows[-1][0]]
+    _insert(cur, "INSERT INTO MEDICINE (BatchNo, DrugName, ExpiryDate, Stock_quantity, Price, SupID, Type) "
+                 "VALUES (%s,%s,%s,%s,%s,%s,%s)", med_rows)
+    _insert(cur, "INSERT INTO SUPPLIES_TO VALUES (%s,%s,%s)", supplies)
+    _insert(cur, "INSERT INTO DISPOSAL VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)", disposals)
+
+    # --- customers: most insured, some with a second phone ---
+    custs = [_b36("C", i + 1) for i in range(p["customers"])]
+    cust_rows, cust_phones, insured = [], [], {}
+    for c in custs:
+        ins = rnd.choice(insurers) if rnd.random() < 0.7 else None
+        insured[c] = ins is not None
+        phone = _phone(rnd)
+        cust_rows.append((c, f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}",
+                          date(rnd.randint(1940, 2010), rnd.randint(1, 12), rnd.randint(1, 28)),
+                          ins, rnd.choice(AREAS), f"{rnd.randint(1, 400)}{rnd.choice('ABCD')}", "Bangalore", phone))
+        cust_phones.append((c, phone))
+        if rnd.random() < 0.3:
+            cust_phones.append((c, _phone(rnd)))
+    _insert(cur, "INSERT INTO CUSTOMER (Cid, Cname, DOB, InsuranceID, Street, DNO, City, Phone) "
+                 "VALUES (%s,%s,%s,%s,%s,%s,%s,%s)", cust_rows)
+    _insert(cur, "INSERT INTO CUSTOMER_PHONE VALUES (%s,%s)", cust_phones)
+    conn.commit()
+    log(f"reference data: {len(custs)} customers, {len(drug_names)} drugs, {len(med_rows)} batches "
+        f"({time.perf_counter() - started:.1f}s)")
+
+    # --- orders, lines, prescriptions, bills ---
+    drug_cum = _zipf(len(drug_names), 1.1)
+    cust_cum = _zipf(len(custs), 0.8)
+    cust_order = custs[:]
+    rnd.shuffle(cust_order)                 # regulars are spread across the id range
+    days = _order_days(p["orders"], today)
+    sizes = _basket_sizes(rnd, p["orders"], lines, min(len(drug_names), 2 * max(v for v, _ in BASKET_SIZES)))
+    billed_until = int(p["orders"] * 0.95)  # the newest 5% are still unbilled
+    written = 0
+    first_pres = None
+    for base in range(0, p["orders"], CHUNK_ORDERS):
+        orders, od_rows, pres, pres_drugs, bills = [], [], [], [], []
+        for i in range(base, min(base + CHUNK_ORDERS, p["orders"])):
+            oid = f"O{FIRST_NUMBER + i}"
+            cid = rnd.choices(cust_order, cum_weights=cust_cum)[0]
+            day = next(days)
+            orders.append((oid, cid, rnd.choice(emps), day))
+            picked = set()
+            while len(picked) < sizes[i]:
+                picked.add(rnd.choices(range(len(drug_names)), cum_weights=drug_cum)[0])
+            total = 0
+            for d in picked:
+                bno, price = rnd.choice(sellable[d])
+                qty = _pick(rnd, QUANTITIES)
+                od_rows.append((drug_names[d], oid, bno, qty, price))
+                total += qty * price
+            written += sizes[i]
+            if rnd.random() < 0.35:
+                pid = f"P{FIRST_NUMBER + i}"
+                first_pres = first_pres or pid
+                pres.append((pid, cid, rnd.randint(100, 400), day - timedelta(days=rnd.randint(0, 3)), oid))
+                for d in picked:
+                    pres_drugs.append((_b36("D", d + 1), pid, rnd.randint(1, 30)))
+            if i < billed_until:
+                inspay = round(total * rnd.choice((0.5, 0.7, 0.8)), 2) if insured[cid] else 0
+                bills.append((FIRST_NUMBER + i, cid, oid, round(total, 2), round(total - inspay, 2), inspay))
+        _insert(cur, "INSERT INTO `ORDER` VALUES (%s,%s,%s,%s)", orders)
+        _insert(cur, "INSERT INTO ORDERED_DRUG VALUES (%s,%s,%s,%s,%s)", od_rows)
+        _insert(cur, "INSERT INTO PRESCRIPTION VALUES (%s,%s,%s,%s,%s)", pres)
+        _insert(cur, "INSERT INTO PRESCRIBED_DRUG VALUES (%s,%s,%s)", pres_drugs)
+        _insert(cur, "INSERT INTO BILL VALUES (%s,%s,%s,%s,%s,%s)", bills)
+        conn.commit()
+        log(f"  {written}/{lines} lines ({time.perf_counter() - started:.1f}s)")
+    del sizes
+
+    # --- notifications: most seen by one to three employees ---
+    nids = [f"N{FIRST_NUMBER + i}" for i in range(p["notifications"])]
+    _insert(cur, "INSERT INTO NOTIFICATION (NID, Type, Message) VALUES (%s,%s,%s)",
+            [(n, rnd.choice(NOTIFICATION_TYPES), f"Batch {rnd.choice(med_rows)[0]} needs attention") for n in nids])
+    seen = set()
+    for n in nids:
+        if rnd.random() < 0.7:
+            for e in rnd.sample(emps, min(len(emps), rnd.randint(1, 3))):
+                seen.add((e, n))
+    _insert(cur, "INSERT INTO IS_NOTIFIED VALUES (%s,%s)", sorted(seen))
+
+    # --- stock left on hand, and sequences past the generated ids ---
+    cur.execute("UPDATE MEDICINE SET Stock_quantity = CRC32(CONCAT(%s, BatchNo)) %% 400 "
+                "WHERE BatchNo LIKE 'G%%'", (seed,))
+    for name, last in (("ORDER", p["orders"]), ("PRESCRIPTION", p["orders"]), ("BILL", p["orders"]),
+                       ("NOTIFICATION", len(nids))):
+        cur.execute("UPDATE ID_SEQUENCE SET NextValue = GREATEST(NextValue, %s) WHERE SeqName = %s",
+                    (FIRST_NUMBER + last, name))
+    conn.commit()
+    cur.execute("ANALYZE TABLE MEDICINE, CUSTOMER, `ORDER`, ORDERED_DRUG, BILL, PRESCRIPTION, "
+                "NOTIFICATION, IS_NOTIFIED")
+    cur.fetchall()
+    cur.close()
+    log(f"generated {written} order lines in {time.perf_counter() - started:.1f}s")
+
+    p.update(seed=seed, today=today.isoformat(), probe={
+        "cid": cust_order[0],               # the most frequent customer
+        "sup": med_rows[0][5],
+        "order": f"O{FIRST_NUMBER + p['orders'] // 2}",
+        "nid": nids[len(nids) // 2],
+        "emp": emps[0],
+        "pres": first_pres,
+        "drug": drug_names[0],              # the best seller
+        "batch": sellable[0][0][0],
+    })
+    return p
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Populate a pharmacy database with deterministic synthetic data")
+    ap.add_argument("--scale", choices=list(SCALES), default="10k", help="ORDERED_DRUG rows: 10k, 1m or 10m")
+    ap.add_argument("--lines", type=int, help="exact ORDERED_DRUG row count (overrides --scale)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--today", type=date.fromisoformat, help="reference date (YYYY-MM-DD) for order and expiry dates")
+    ap.add_argument("--database", default=BENCH_DB, help="target database (never PharmacyDB by default)")
+    ap.add_argument("--fresh", action="store_true", help="drop and recreate the database from PHARMACY_DATABASE.sql first")
+    args = ap.parse_args()
+
+    conn = connect()
+    if args.fresh:
+        create_database(conn, args.database)
+    conn.database = args.database
+    try:
+        generate(conn, args.lines or SCALES[args.scale], args.seed, args.today)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
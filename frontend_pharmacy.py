@@ -3,10 +3,30 @@
 # Integrated login system with privilege management
 
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, FieldType
 from datetime import datetime, date, timedelta
+import threading
+import time
+import queue
+import re
+import bisect
+import heapq
+import json
+import csv
+import os
+import socket
+import http.client
+import urllib.parse
+from decimal import Decimal, InvalidOperation
+from collections import OrderedDict, deque
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:   # Parquet export is optional
+    pa = pq = None
 
 # ---------- DB CONFIG ----------
 DB_CONFIG = {
@@ -73,91 +93,2506 @@ PRIVILEGES = {
     }
 }
 
+# ---------- CONNECTION POOL CONFIG ----------
+POOL_CONFIG = {
+    "size": 5,                # max open connections per terminal
+    "checkout_timeout": 10,   # seconds to wait for a free connection
+    "idle_timeout": 300,      # close connections idle longer than this (seconds)
+    "max_lifetime": 3600,     # recycle connections older than this (seconds)
+    "health_check": True      # ping connections on checkout
+}
+
+# ---------- BACKGROUND EXECUTOR CONFIG ----------
+EXECUTOR_CONFIG = {
+    "workers": 3,     # background DB threads (keep below POOL_CONFIG["size"])
+    "poll_ms": 50     # how often the Tk loop drains finished DB calls
+}
+
+# ---------- PAGED TABLE CONFIG ----------
+TABLE_PAGE_SIZE = 200   # rows fetched per keyset page
+TABLE_MAX_PAGES = 5     # pages kept in a Treeview at once (bounds memory)
+
+# ---------- REFERENCE CACHE CONFIG ----------
+REF_CACHE_CONFIG = {
+    "ttl": 300,          # seconds a cached dataset is trusted without a reload
+    "max_rows": 20000    # total cached rows; least recently used datasets go first
+}
+
+# ---------- QUERY GRID CONFIG ----------
+QUERY_CHUNK_ROWS = 500     # rows per fetchmany() while streaming a Queries-tab result
+QUERY_MAX_ROWS = 10000     # stop streaming (and kill the query) after this many rows
+QUERY_TIMEOUT_MS = 30000   # MAX_EXECUTION_TIME for Queries-tab SELECTs (0 = no limit)
+REPORT_CACHE_ENTRIES = 32  # pre-built report results kept until their tables change
+
+# ---------- BULK IMPORT CONFIG ----------
+IMPORT_BATCH_ROWS = 500     # rows per executemany() / transaction
+IMPORT_ERRORS_SHOWN = 200   # per-row errors listed in the import summary
+
+# ---------- SEARCH CONFIG ----------
+SEARCH_LIMIT = 15       # typeahead matches shown per keystroke
+
+# ---------- QUERY METRICS CONFIG ----------
+QUERY_METRICS_CONFIG = {
+    "slow_ms": 500,                 # statements slower than this are kept with their parameters
+    "slow_kept": 200,               # most recent slow statements shown on the Dashboard
+    "trace_path": "db_trace.jsonl", # one JSON line per DB call (None = no trace file)
+    "trace_max_bytes": 20_000_000   # rotate the trace to <path>.1 beyond this size
+}
+METRICS_REFRESH_MS = 5000   # Dashboard latency panel refresh interval
+
+# ---------- SERVICE CONFIG ----------
+SERVICE_CONFIG = {
+    "url": None,     # e.g. "http://127.0.0.1:8765": send sales, billing, prescriptions,
+                     # expiry and reports through pharmacy_service.py (None = direct to MySQL)
+    "timeout": 30    # seconds per service request
+}
+
+# ---------- NOTIFICATION FEED CONFIG ----------
+NOTIFICATION_FEED_CONFIG = {
+    "poll_ms": 2000,        # poll interval while notifications keep arriving
+    "max_poll_ms": 30000,   # longest interval after backing off while idle
+    "backoff": 2.0,         # interval multiplier after a poll that found nothing
+    "batch": 200,           # most rows fetched per poll
+    "gap_wait_s": 10.0      # how long to wait for a missing Seq before skipping it
+}
+
+# ---------- QUERY METRICS ----------
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+_SQL_COMMENT = re.compile(r"/\*.*?\*/|--[^\n]*", re.S)
+_SQL_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\b\d+(?:\.\d+)?\b")
+_SQL_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SQL_SECRET = re.compile(r"AuthKey|password", re.I)   # never write these parameters out
+_fingerprints = {}
+
+def sql_fingerprint(sql):
+    """Statement shape with comments dropped and literals / %s folded to ?, for grouping timings."""
+    fp = _fingerprints.get(sql)
+    if fp is None:
+        fp = _SQL_COMMENT.sub(" ", sql).replace("%s", "?")
+        fp = _SQL_IN_LIST.sub("(?+)", _SQL_LITERAL.sub("?", fp))
+        fp = " ".join(fp.split())[:300]
+        if len(_fingerprints) < 5000:   # ad-hoc Queries-tab SQL must not grow this forever
+            _fingerprints[sql] = fp
+    return fp
+
+class QueryMetrics:
+    """Per-statement latency histograms, a slow-statement log and a JSON-lines trace.
+
+    Every statement run through a TimedCursor is recorded with its connect
+    (pool checkout), execute and fetch times and row count, grouped by
+    sql_fingerprint(). Each group keeps a fixed-bucket histogram, so
+    p50/p95/p99 cost the same memory however many calls are made.
+    Statements slower than `slow_ms` are kept with their parameters, and
+    every call is appended to `trace_path` tagged with this till's host:pid.
+    """
+    def __init__(self, slow_ms=500, slow_kept=200, trace_path=None, trace_max_bytes=20_000_000):
+        self.slow_ms = slow_ms
+        self.trace_path = trace_path
+        self.trace_max_bytes = trace_max_bytes
+        self.till = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+        self._stats = {}                    # fingerprint -> counters + histogram
+        self.slow = deque(maxlen=slow_kept)
+        self._trace = None
+
+    def record(self, sql, params, connect_s, execute_s, fetch_s, rows, error=None):
+        fp = sql_fingerprint(sql)
+        total_ms = (connect_s + execute_s + fetch_s) * 1000
+        entry = {"ts": round(time.time(), 3), "till": self.till, "sql": fp,
+                 "connect_ms": round(connect_s * 1000, 3), "execute_ms": round(execute_s * 1000, 3),
+                 "fetch_ms": round(fetch_s * 1000, 3), "total_ms": round(total_ms, 3), "rows": rows}
+        if error is not None:
+            entry["error"] = str(error)
+        slow = total_ms >= self.slow_ms
+        if slow:
+            entry["slow"] = True
+            entry["params"] = "<redacted>" if _SQL_SECRET.search(sql) else repr(params)[:500]
+        with self._lock:
+            st = self._stats.get(fp)
+            if st is None:
+                st = self._stats[fp] = {"count": 0, "errors": 0, "rows": 0, "connect": 0.0, "execute": 0.0,
+                                        "fetch": 0.0, "max": 0.0, "hist": [0] * (len(LATENCY_BUCKETS_MS) + 1)}
+            st["count"] += 1
+            st["errors"] += error is not None
+            st["rows"] += rows
+            st["connect"] += connect_s
+            st["execute"] += execute_s
+            st["fetch"] += fetch_s
+            st["max"] = max(st["max"], total_ms)
+            st["hist"][bisect.bisect_left(LATENCY_BUCKETS_MS, total_ms)] += 1
+            if slow:
+                self.slow.append(entry)
+            self._write_trace(entry)
+
+    def _write_trace(self, entry):
+        if not self.trace_path:
+            return
+        try:
+            if self._trace is None:
+                self._trace = open(self.trace_path, "a", buffering=1, encoding="utf-8")
+            elif self._trace.tell() > self.trace_max_bytes:
+                self._trace.close()
+                os.replace(self.trace_path, self.trace_path + ".1")
+                self._trace = open(self.trace_path, "a", buffering=1, encoding="utf-8")
+            self._trace.write(json.dumps(entry) + "\n")
+        except OSError:
+            self.trace_path = None      # unwritable location: keep the in-memory stats only
+            self._trace = None
+
+    def _percentile(self, st, q):
+        """Upper bound of the histogram bucket holding quantile q, capped at the max seen."""
+        target = q * st["count"]
+        seen = 0
+        for i, n in enumerate(st["hist"]):
+            seen += n
+            if n and seen >= target:
+                bound = LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else st["max"]
+                return min(bound, st["max"])
+        return st["max"]
+
+    def snapshot(self):
+        """Per-statement summary rows, most total time first."""
+        with self._lock:
+            stats = {fp: dict(st, hist=list(st["hist"])) for fp, st in self._stats.items()}
+        rows = []
+        for fp, st in stats.items():
+            n = st["count"]
+            rows.append({"sql": fp, "count": n, "errors": st["errors"], "avg_rows": st["rows"] / n,
+                         "p50": self._percentile(st, 0.50), "p95": self._percentile(st, 0.95),
+                         "p99": self._percentile(st, 0.99), "max": st["max"],
+                         "connect_ms": st["connect"] * 1000 / n, "execute_ms": st["execute"] * 1000 / n,
+                         "fetch_ms": st["fetch"] * 1000 / n,
+                         "total_ms": (st["connect"] + st["execute"] + st["fetch"]) * 1000})
+        rows.sort(key=lambda r: r["total_ms"], reverse=True)
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.slow.clear()
+
+    def close(self):
+        with self._lock:
+            if self._trace:
+                self._trace.close()
+                self._trace = None
+
+QUERY_METRICS = QueryMetrics(**QUERY_METRICS_CONFIG)
+
+class TimedCursor:
+    """Cursor wrapper that times each statement into QUERY_METRICS.
+
+    A statement's execute time is taken around execute()/executemany()/
+    callproc(); fetch time and rows accumulate until the next statement or
+    close(), when it is recorded. `connect_s` (time spent getting the
+    connection) is charged to the first statement.
+    """
+    def __init__(self, cur, connect_s=0.0, metrics=None):
+        self._cur = cur
+        self._connect = connect_s
+        self._metrics = metrics or QUERY_METRICS
+        self._pending = None    # [sql, params, connect, execute, fetch, rows, error]
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def _finish(self):
+        if self._pending:
+            self._metrics.record(*self._pending)
+            self._pending = None
+
+    def _run(self, sql, params, fn, *args):
+        self._finish()
+        self._pending = p = [sql, params, self._connect, 0.0, 0.0, 0, None]
+        self._connect = 0.0
+        t = time.perf_counter()
+        try:
+            return fn(*args)
+        except Error as e:
+            p[6] = e.errno or e
+            raise
+        finally:
+            p[3] = time.perf_counter() - t
+            if not getattr(self._cur, "with_rows", False):
+                p[5] = max(self._cur.rowcount or 0, 0)
+            if p[6] is not None:
+                self._finish()
+
+    def execute(self, sql, params=()):
+        return self._run(sql, params, self._cur.execute, sql, params)
+
+    def executemany(self, sql, seq_params):
+        seq_params = list(seq_params)
+        return self._run(sql, f"<{len(seq_params)} rows>", self._cur.executemany, sql, seq_params)
+
+    def callproc(self, name, args=()):
+        return self._run(f"CALL {name}", args, self._cur.callproc, name, args)
+
+    def timed(self, label, fn):
+        """Time a non-statement round trip (e.g. COMMIT) as its own entry."""
+        return self._run(label, (), fn)
+
+    def _fetch(self, fn, *args):
+        t = time.perf_counter()
+        try:
+            result = fn(*args)
+        except Error as e:
+            if self._pending:
+                self._pending[6] = e.errno or e
+            raise
+        finally:
+            if self._pending:
+                self._pending[4] += time.perf_counter() - t
+        if self._pending and result:
+            self._pending[5] += len(result) if isinstance(result, list) else 1
+        return result
+
+    def fetchall(self):
+        return self._fetch(self._cur.fetchall)
+
+    def fetchmany(self, size=1):
+        return self._fetch(self._cur.fetchmany, size)
+
+    def fetchone(self):
+        return self._fetch(self._cur.fetchone)
+
+    def close(self):
+        self._finish()
+        return self._cur.close()
+
 # ---------- DB HELPERS ----------
-def get_connection():
+_ui_dispatch = None   # set by DBExecutor so worker threads can reach the Tk thread
+_error_sink = None    # set by pharmacy_service so headless callers collect errors instead
+
+def show_db_error(title, msg):
+    """Show a DB error popup, marshalled onto the Tk thread when raised from a worker."""
+    if _error_sink is not None:
+        _error_sink(title, msg)
+    elif _ui_dispatch is None or threading.current_thread() is threading.main_thread():
+        messagebox.showerror(title, msg)
+    else:
+        _ui_dispatch(messagebox.showerror, title, msg)
+
+def get_connection(report=True):
     try:
         conn = mysql.connector.connect(**DB_CONFIG)
         return conn
     except Error as e:
-        messagebox.showerror("DB Connection Error", f"Unable to connect to DB:\n{e}")
+        if report:
+            show_db_error("DB Connection Error", f"Unable to connect to DB:\n{e}")
         return None
 
+class ConnectionPool:
+    """Thread-safe pool of reusable MySQL connections.
+
+    Connections are opened lazily up to `size`, pinged on checkout, closed
+    once idle for `idle_timeout` seconds and recycled after `max_lifetime`.
+    """
+    def __init__(self, size=5, checkout_timeout=10, idle_timeout=300, max_lifetime=3600, health_check=True):
+        self.size = size
+        self.checkout_timeout = checkout_timeout
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.health_check = health_check
+        self._cond = threading.Condition()
+        self._idle = []        # [conn, created_at, last_used], most recently used last
+        self._created = {}     # id(conn) -> created_at for checked-out connections
+        self._open = 0
+        self.stats = {"hits": 0, "misses": 0, "waits": 0, "wait_time": 0.0,
+                      "timeouts": 0, "evicted": 0, "failed_checks": 0}
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _evict_expired(self, now):
+        """Drop idle connections past idle_timeout / max_lifetime. Caller holds the lock."""
+        keep, expired = [], []
+        for entry in self._idle:
+            conn, created, last_used = entry
+            if now - last_used > self.idle_timeout or now - created > self.max_lifetime:
+                expired.append(conn)
+            else:
+                keep.append(entry)
+        self._idle = keep
+        self._open -= len(expired)
+        self.stats["evicted"] += len(expired)
+        return expired
+
+    def acquire(self, report=True):
+        """Check out a connection, or None if the DB is unreachable or the pool is exhausted.
+
+        With report=False those failures are not shown, for callers that
+        handle them quietly.
+        """
+        start = time.monotonic()
+        waited = False
+        while True:
+            conn = None
+            create = timed_out = False
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    expired = self._evict_expired(now)
+                    if self._idle:
+                        conn, created, _ = self._idle.pop()
+                        self._created[id(conn)] = created
+                        break
+                    if self._open < self.size:
+                        self._open += 1
+                        create = True
+                        break
+                    remaining = self.checkout_timeout - (now - start)
+                    if remaining <= 0:
+                        self.stats["timeouts"] += 1
+                        self._record_wait(start, waited)
+                        timed_out = True
+                        break
+                    waited = True
+                    self._cond.wait(remaining)
+            for c in expired:
+                self._close_quietly(c)
+            if timed_out:
+                if not report:
+                    return None
+                # Reported outside the lock: the error sink may block or re-enter the pool
+                show_db_error("DB Connection Error",
+                              f"No free DB connection after {self.checkout_timeout}s (pool size {self.size})")
+                return None
+
+            if create:
+                conn = get_connection(report)
+                with self._cond:
+                    self._record_wait(start, waited)
+                    self.stats["misses"] += 1
+                    if conn is None:
+                        self._open -= 1
+                        self._cond.notify()
+                        return None
+                    conn.autocommit = True
+                    self._created[id(conn)] = time.monotonic()
+                return conn
+
+            if self.health_check:
+                try:
+                    conn.ping(reconnect=False)
+                except Error:
+                    with self._cond:
+                        self.stats["failed_checks"] += 1
+                        self._created.pop(id(conn), None)
+                        self._open -= 1
+                    self._close_quietly(conn)
+                    continue
+            with self._cond:
+                self._record_wait(start, waited)
+                self.stats["hits"] += 1
+            return conn
+
+    def _record_wait(self, start, waited):
+        if waited:
+            self.stats["waits"] += 1
+            self.stats["wait_time"] += time.monotonic() - start
+
+    def release(self, conn, discard=False):
+        """Return a connection to the pool; discard it if it is broken."""
+        if conn is None:
+            return
+        if not discard:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except Error:
+                discard = True
+        with self._cond:
+            created = self._created.pop(id(conn), time.monotonic())
+            if discard:
+                self._open -= 1
+            else:
+                self._idle.append([conn, created, time.monotonic()])
+            self._cond.notify()
+        if discard:
+            self._close_quietly(conn)
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for conn, _, _ in idle:
+            self._close_quietly(conn)
+
+    def snapshot(self):
+        with self._cond:
+            stats = dict(self.stats)
+            stats["open"] = self._open
+            stats["idle"] = len(self._idle)
+            stats["size"] = self.size
+        checkouts = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / checkouts if checkouts else 0.0
+        stats["avg_wait_ms"] = stats["wait_time"] * 1000 / stats["waits"] if stats["waits"] else 0.0
+        return stats
+
+DB_POOL = ConnectionPool(**POOL_CONFIG)
+
+def _is_connection_error(e):
+    """True when the error means the connection itself is unusable."""
+    return isinstance(e, (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError))
+
 def run_select(query, params=()):
-    conn = get_connection()
+    started = time.perf_counter()
+    conn = DB_POOL.acquire()
     if not conn:
         return []
-    cur = conn.cursor()
+    cur = TimedCursor(conn.cursor(), time.perf_counter() - started)
+    broken = False
     try:
         cur.execute(query, params)
         rows = cur.fetchall()
         return rows
     except Error as e:
-        messagebox.showerror("Query Error", str(e))
+        broken = _is_connection_error(e)
+        show_db_error("Query Error", str(e))
         return []
     finally:
         cur.close()
-        conn.close()
+        DB_POOL.release(conn, discard=broken)
+
+def fetch_rows(query, params=()):
+    """run_select for background pollers: raises Error instead of showing it,
+    so the caller decides how (and how often) to report a failure."""
+    started = time.perf_counter()
+    conn = DB_POOL.acquire(report=False)
+    if not conn:
+        raise Error("No DB connection available")
+    cur = TimedCursor(conn.cursor(), time.perf_counter() - started)
+    broken = False
+    try:
+        cur.execute(query, params)
+        return cur.fetchall()
+    except Error as e:
+        broken = _is_connection_error(e)
+        raise
+    finally:
+        cur.close()
+        DB_POOL.release(conn, discard=broken)
 
 def run_select_with_cols(query, params=()):
     """Return (columns, rows) for arbitrary SELECTs."""
-    conn = get_connection()
+    started = time.perf_counter()
+    conn = DB_POOL.acquire()
     if not conn:
         return [], []
-    cur = conn.cursor()
+    cur = TimedCursor(conn.cursor(), time.perf_counter() - started)
+    broken = False
     try:
         cur.execute(query, params)
         rows = cur.fetchall()
         cols = cur.column_names
         return cols, rows
     except Error as e:
-        messagebox.showerror("Query Error", str(e))
+        broken = _is_connection_error(e)
+        show_db_error("Query Error", str(e))
         return [], []
     finally:
         cur.close()
-        conn.close()
+        DB_POOL.release(conn, discard=broken)
 
 def run_query(query, params=()):
-    conn = get_connection()
+    started = time.perf_counter()
+    conn = DB_POOL.acquire()
     if not conn:
         return False
-    cur = conn.cursor()
+    cur = TimedCursor(conn.cursor(), time.perf_counter() - started)
+    broken = False
     try:
         cur.execute(query, params)
-        conn.commit()
+        cur.timed("COMMIT", conn.commit)
+        REF_CACHE.invalidate_for_sql(query)
+        return True
+    except Error as e:
+        broken = _is_connection_error(e)
+        show_db_error("Query Error", str(e))
+        return False
+    finally:
+        cur.close()
+        DB_POOL.release(conn, discard=broken)
+
+def call_procedure(procname, params=()):
+    started = time.perf_counter()
+    conn = DB_POOL.acquire()
+    if not conn:
+        return False
+    cur = TimedCursor(conn.cursor(), time.perf_counter() - started)
+    broken = False
+    try:
+        cur.callproc(procname, params)
+        cur.timed("COMMIT", conn.commit)
+        REF_CACHE.invalidate(*PROCEDURE_TABLES.get(procname, ()))
         return True
     except Error as e:
-        messagebox.showerror("Query Error", str(e))
+        broken = _is_connection_error(e)
+        show_db_error("Procedure Error", f"{procname}: {e}")
         return False
     finally:
         cur.close()
-        conn.close()
+        DB_POOL.release(conn, discard=broken)
+
+def run_transaction(work, error_title="Transaction Error"):
+    """Run work(cursor) inside one transaction on a pooled connection.
+
+    Commits and returns work's result, or rolls back, reports the error and
+    returns None if any statement fails.
+    """
+    started = time.perf_counter()
+    conn = DB_POOL.acquire()
+    if not conn:
+        return None
+    cur = TimedCursor(conn.cursor(), time.perf_counter() - started)
+    broken = False
+    try:
+        conn.start_transaction()
+        result = work(cur)
+        cur.timed("COMMIT", conn.commit)
+        return result
+    except Error as e:
+        broken = _is_connection_error(e)
+        if not broken:
+            try:
+                conn.rollback()
+            except Error:
+                broken = True
+        show_db_error(error_title, str(e))
+        return None
+    finally:
+        cur.close()
+        DB_POOL.release(conn, discard=broken)
+
+def fetch_table_versions():
+    """Return {table name: change counter} from TABLE_VERSION (bumped by triggers).
+
+    Writers bump one of several shard rows per table, so the counter is their sum.
+    """
+    rows = run_select("SELECT TableName, SUM(Version) FROM TABLE_VERSION GROUP BY TableName")
+    return {name: int(version) for name, version in rows}
+
+# ---------- REFERENCE DATA CACHE ----------
+REF_DATASETS = {   # name -> (source table, query); the first column is the lookup key
+    "customers": ("CUSTOMER", "SELECT Cid, Cname FROM CUSTOMER ORDER BY Cid"),
+    "suppliers": ("SUPPLIER", "SELECT SupID, SupName FROM SUPPLIER ORDER BY SupID"),
+    "employees": ("EMPLOYEE", "SELECT EmpID, Ename, Role FROM EMPLOYEE ORDER BY EmpID"),
+    "medicines": ("MEDICINE", "SELECT DrugName, MIN(Type) FROM MEDICINE GROUP BY DrugName ORDER BY DrugName"),
+    "insurance": ("INSURANCE", "SELECT InsuranceID, CompName FROM INSURANCE ORDER BY InsuranceID")
+}
+
+# name -> one-key primary-key probe returning the same columns. Used on a cache
+# miss instead of reloading the dataset, and for orders, which grow with every
+# sale and are never cached.
+REF_KEY_PROBES = {
+    "customers": "SELECT Cid, Cname FROM CUSTOMER WHERE Cid=%s",
+    "suppliers": "SELECT SupID, SupName FROM SUPPLIER WHERE SupID=%s",
+    "employees": "SELECT EmpID, Ename, Role FROM EMPLOYEE WHERE EmpID=%s",
+    "medicines": "SELECT DrugName, MIN(Type) FROM MEDICINE WHERE DrugName=%s GROUP BY DrugName",
+    "insurance": "SELECT InsuranceID, CompName FROM INSURANCE WHERE InsuranceID=%s",
+    "orders": "SELECT OrderID, Cid FROM `ORDER` WHERE OrderID=%s"
+}
+
+# Tables each stored procedure writes, so call_procedure can invalidate them
+PROCEDURE_TABLES = {
+    "AddMedicine": ("MEDICINE",),
+    "CreateOrder": ("ORDER",),
+    "GenerateBill": ("BILL",),
+    "BillUnbilledOrders": ("BILL",)
+}
+
+_WRITE_TARGET = re.compile(r"^\s*(?:INSERT\s+(?:IGNORE\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM)\s+`?(\w+)`?", re.I)
+
+class RefCache:
+    """Read-through cache for small reference datasets (see REF_DATASETS).
+
+    Entries expire after `ttl` seconds and the least recently used datasets
+    are dropped once more than `max_rows` rows are held. Writes made through
+    run_query / call_procedure, and TABLE_VERSION changes seen on refresh,
+    invalidate the datasets built from the affected table.
+    """
+    def __init__(self, ttl=300, max_rows=20000):
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # name -> (rows, {key: row}, loaded_at), most recent last
+        self._gen = {}                  # table -> invalidation count, guards in-flight loads
+        self._versions = {}             # table -> last TABLE_VERSION seen
+        self.stats = {"hits": 0, "misses": 0, "loads": 0, "probes": 0, "expired": 0,
+                      "evicted": 0, "invalidated": 0}
+
+    def _entry(self, name):
+        table, query = REF_DATASETS[name]
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry and now - entry[2] < self.ttl:
+                self._entries.move_to_end(name)
+                self.stats["hits"] += 1
+                return entry
+            if entry:
+                del self._entries[name]
+                self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            gen = self._gen.get(table, 0)
+        rows = run_select(query)
+        entry = (rows, {str(r[0]): r for r in rows}, now)
+        with self._lock:
+            self.stats["loads"] += 1
+            # Don't store a result an invalidation raced past while we were loading
+            if rows and self._gen.get(table, 0) == gen:
+                self._entries[name] = entry
+                self._entries.move_to_end(name)
+                self._shrink()
+        return entry
+
+    def _shrink(self):
+        total = sum(len(e[0]) for e in self._entries.values())
+        while total > self.max_rows and len(self._entries) > 1:
+            _, (rows, _, _) = self._entries.popitem(last=False)
+            total -= len(rows)
+            self.stats["evicted"] += 1
+
+    def get(self, name):
+        """All rows of a dataset."""
+        return self._entry(name)[0]
+
+    def lookup(self, name, key):
+        """The row whose first column equals `key`, or None.
+
+        A miss probes that one key (REF_KEY_PROBES) so rows added by other
+        terminals within the TTL are still found; a hit is added to the
+        cached dataset. Names without a dataset, like "orders", always probe.
+        """
+        if name in REF_DATASETS:
+            row = self._entry(name)[1].get(str(key))
+            if row is not None:
+                return row
+            table = REF_DATASETS[name][0]
+            with self._lock:
+                gen = self._gen.get(table, 0)
+        rows = run_select(REF_KEY_PROBES[name], (key,))
+        with self._lock:
+            self.stats["probes"] += 1
+            entry = self._entries.get(name)
+            if rows and entry and self._gen.get(REF_DATASETS[name][0], 0) == gen:
+                entry[0].append(rows[0])
+                entry[1][str(rows[0][0])] = rows[0]
+        return rows[0] if rows else None
+
+    def invalidate(self, *tables):
+        with self._lock:
+            for table in tables:
+                self._gen[table] = self._gen.get(table, 0) + 1
+                for name, (src, _) in REF_DATASETS.items():
+                    if src == table and self._entries.pop(name, None):
+                        self.stats["invalidated"] += 1
+
+    def invalidate_for_sql(self, query):
+        m = _WRITE_TARGET.match(query)
+        if m:
+            self.invalidate(m.group(1).upper())
+
+    def sync_versions(self, versions):
+        """Drop datasets whose table changed (per TABLE_VERSION) since the last sync."""
+        changed = [t for t, v in versions.items() if self._versions.get(t, v) != v]
+        self._versions = dict(versions)
+        if changed:
+            self.invalidate(*changed)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["datasets"] = len(self._entries)
+            stats["rows"] = sum(len(e[0]) for e in self._entries.values())
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+REF_CACHE = RefCache(**REF_CACHE_CONFIG)
+
+# ---------- SEARCH INDEX ----------
+def _norm(text):
+    return " ".join(str(text).lower().split())
+
+def _trigrams(term):
+    return {term[i:i + 3] for i in range(len(term) - 2)}
+
+def _all_trigrams(terms):
+    grams = set()
+    for term in terms:
+        grams.update(_trigrams(term))
+    return grams
+
+class TextIndex:
+    """In-memory typeahead index: sorted terms for prefix hits, trigrams for infix hits.
+
+    Each document has a label and a few texts. Every text, every word in it
+    and its digits-only form (for phone numbers) are indexed, so "smi",
+    "john s" and "98765" all find "John Smith, 9876543210". Searches never
+    touch the DB; refresh() reads only the documents stamped since the last
+    refresh and applies the ones that changed.
+    """
+    def __init__(self, query, keys, changed, overlap=5):
+        self.query = query          # rows of (doc id, label, text, ..., UpdatedAt); {where} is filled in
+        self.keys = keys            # every doc id in the source, to spot deletions
+        self.changed = changed      # {where} filter on UpdatedAt >= %s
+        self.overlap = overlap      # seconds re-read behind the watermark for late commits
+        self._lock = threading.Lock()            # guards the index structures
+        self._refresh_lock = threading.Lock()    # one refresh at a time
+        self._docs = {}             # doc id -> (label, terms)
+        self._rows = {}             # doc id -> source row, to spot changes cheaply
+        self._terms = []            # sorted [(term, doc id)]
+        self._grams = {}            # trigram -> {doc id}
+        self._watermark = None      # newest UpdatedAt applied
+
+    @staticmethod
+    def _terms_for(texts):
+        terms = set()
+        for text in texts:
+            if not text:
+                continue
+            t = _norm(text)
+            terms.add(t)
+            terms.update(t.split())
+            digits = re.sub(r"\D", "", t)
+            if len(digits) >= 3:
+                terms.add(digits)
+        return terms
+
+    def _add(self, doc_id, label, terms):
+        self._docs[doc_id] = (label, terms)
+        for term in terms:
+            bisect.insort(self._terms, (term, doc_id))
+        for g in _all_trigrams(terms):
+            self._grams.setdefault(g, set()).add(doc_id)
+
+    def _remove(self, doc_id):
+        _, terms = self._docs.pop(doc_id)
+        for term in terms:
+            i = bisect.bisect_left(self._terms, (term, doc_id))
+            if i < len(self._terms) and self._terms[i] == (term, doc_id):
+                del self._terms[i]
+        for g in _all_trigrams(terms):
+            ids = self._grams.get(g)
+            if ids:
+                ids.discard(doc_id)
+                if not ids:
+                    del self._grams[g]
+
+    def _deleted(self, known):
+        """Doc ids in `known` the source no longer has ([] if the DB can't tell now).
+
+        New docs reach `known` through the UpdatedAt read, so it holds every
+        doc id the source has: a key count equal to len(known) means nothing
+        was deleted, and only a lower one re-reads the keys.
+        """
+        rows = run_select(f"SELECT COUNT(*) FROM ({self.keys}) k")
+        if not rows or rows[0][0] >= len(known):
+            return []
+        if not rows[0][0]:
+            return list(known)
+        keys = {str(r[0]) for r in run_select(self.keys)}
+        return [d for d in known if d not in keys] if keys else []
+
+    def refresh(self):
+        """Apply the docs changed or deleted since the last refresh. Returns how many changed."""
+        with self._refresh_lock:
+            if self._watermark is None:
+                rows = run_select(self.query.format(where=""))
+            else:
+                since = self._watermark - timedelta(seconds=self.overlap)
+                rows = run_select(self.query.format(where=self.changed), (since,))
+            fresh = {}
+            for r in rows:
+                fresh[str(r[0])] = tuple(r[1:-1])
+                if r[-1] is not None and (self._watermark is None or r[-1] > self._watermark):
+                    self._watermark = r[-1]
+            changed = {d: (r[0], self._terms_for(r[1:])) for d, r in fresh.items() if self._rows.get(d) != r}
+            self._rows.update(fresh)
+            gone = self._deleted(self._rows) if self._rows else []
+            for d in gone:
+                del self._rows[d]
+            if len(gone) + len(changed) > len(self._docs) // 4:
+                # Bulk (re)build off to the side, then swap: one sort beats many insort
+                # calls, and typeahead keeps answering from the old index meanwhile
+                docs = {d: self._docs[d] for d in self._rows if d not in changed}
+                docs.update(changed)
+                terms = sorted((t, d) for d, (_, ts) in docs.items() for t in ts)
+                grams = {}
+                for d, (_, ts) in docs.items():
+                    for g in _all_trigrams(ts):
+                        grams.setdefault(g, set()).add(d)
+                with self._lock:
+                    self._docs, self._terms, self._grams = docs, terms, grams
+            else:
+                with self._lock:
+                    for d in gone:
+                        if d in self._docs:
+                            self._remove(d)
+                    for d, (label, terms) in changed.items():
+                        if d in self._docs:
+                            self._remove(d)
+                        self._add(d, label, terms)
+            return len(gone) + len(changed)
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        """Return up to `limit` (doc id, label) pairs: prefix matches first, then infix."""
+        q = _norm(text)
+        if not q:
+            return []
+        digits = re.sub(r"\D", "", q)
+        queries = [q] + ([digits] if digits and digits != q else [])
+        hits = []
+        with self._lock:
+            seen = set()
+            for qq in queries:
+                i = bisect.bisect_left(self._terms, (qq,))
+                while i < len(self._terms) and len(hits) < limit and self._terms[i][0].startswith(qq):
+                    d = self._terms[i][1]
+                    if d not in seen:
+                        seen.add(d)
+                        hits.append((d, self._docs[d][0]))
+                    i += 1
+            if len(hits) < limit and len(q) >= 3:
+                postings = sorted((self._grams.get(g, set()) for g in _trigrams(q)), key=len)
+                candidates = set(postings[0]).intersection(*postings[1:]) if postings else set()
+                infix = heapq.nsmallest(limit - len(hits),
+                                        ((self._docs[d][0], d) for d in candidates - seen
+                                         if any(q in t for t in self._docs[d][1])))
+                hits += [(d, label) for label, d in infix]
+        return hits
+
+    def __len__(self):
+        return len(self._docs)
+
+DRUG_INDEX = TextIndex(
+    "SELECT DrugName, DrugName, DrugName, MAX(UpdatedAt) FROM MEDICINE {where} GROUP BY DrugName",
+    "SELECT DISTINCT DrugName FROM MEDICINE",
+    "WHERE UpdatedAt >= %s")
+CUSTOMER_INDEX = TextIndex(   # CUSTOMER_PHONE changes touch CUSTOMER.UpdatedAt (migrations/0007)
+    "SELECT c.Cid, CONCAT(c.Cid, ' - ', c.Cname, IF(c.Phone IS NULL, '', CONCAT(' (', c.Phone, ')'))), "
+    "c.Cname, c.Phone, GROUP_CONCAT(p.Phone SEPARATOR ' '), c.UpdatedAt "
+    "FROM CUSTOMER c LEFT JOIN CUSTOMER_PHONE p ON p.Cid = c.Cid {where} GROUP BY c.Cid",
+    "SELECT Cid FROM CUSTOMER",
+    "WHERE c.UpdatedAt >= %s")
+
+# ---------- ID ALLOCATION ----------
+ID_FORMATS = {              # ID_SEQUENCE name -> how the number is rendered
+    "NOTIFICATION": "N{}",
+    "ORDER": "O{}",
+    "PRESCRIPTION": "P{}",
+    "BILL": None            # BillID is an INT column
+}
+ID_BLOCK_SIZE = 20          # IDs leased per round trip
+
+def lease_id_block(name, size):
+    """Reserve `size` consecutive numbers from ID_SEQUENCE; return the first, or None."""
+    started = time.perf_counter()
+    conn = DB_POOL.acquire()
+    if not conn:
+        return None
+    cur = TimedCursor(conn.cursor(), time.perf_counter() - started)
+    broken = False
+    try:
+        # LAST_INSERT_ID(expr) hands the new value back in the OK packet: one round trip
+        cur.execute("UPDATE ID_SEQUENCE SET NextValue = LAST_INSERT_ID(NextValue + %s) WHERE SeqName = %s",
+                    (size, name))
+        if cur.rowcount != 1:
+            show_db_error("ID Allocation Error", f"No ID_SEQUENCE row for {name}")
+            return None
+        return cur.lastrowid - size
+    except Error as e:
+        broken = _is_connection_error(e)
+        show_db_error("ID Allocation Error", f"{name}: {e}")
+        return None
+    finally:
+        cur.close()
+        DB_POOL.release(conn, discard=broken)
+
+class IdAllocator:
+    """Hands out NOTIFICATION / ORDER / PRESCRIPTION / BILL IDs from leased blocks.
+
+    Each process leases ID_BLOCK_SIZE numbers at a time, so most IDs cost no
+    round trip at all. Unused numbers from a block are simply skipped.
+    """
+    def __init__(self, block_size=ID_BLOCK_SIZE):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._blocks = {}       # name -> [next number, end (exclusive)]
+
+    def next_id(self, name):
+        with self._lock:
+            block = self._blocks.get(name)
+            if block is None or block[0] >= block[1]:
+                start = lease_id_block(name, self.block_size)
+                if start is None:
+                    return None
+                block = self._blocks[name] = [start, start + self.block_size]
+            num = block[0]
+            block[0] += 1
+        fmt = ID_FORMATS[name]
+        return num if fmt is None else fmt.format(num)
+
+ID_ALLOCATOR = IdAllocator()
+
+# ---------- FEFO BATCH ALLOCATION ----------
+ORDERED_DRUG_INSERT = "INSERT INTO ORDERED_DRUG (DrugName, OrderID, BatchNo, Ordered_quantity, Price) VALUES (%s,%s,%s,%s,%s)"
+
+class AllocationError(Error):
+    """Not enough sellable (in-stock, non-expired) quantity for a line."""
+
+class BatchAllocator:
+    """In-memory per-drug index of MEDICINE batches for first-expiry-first-out sales.
+
+    The index is synced incrementally from MEDICINE.UpdatedAt, so planning a
+    sale is a pure in-memory sort. The actual decrement is done by
+    trg_sell_stock inside the caller's transaction: if another till got there
+    first the INSERT is rejected, the drug's batches are re-read and the line
+    is planned once more.
+    """
+    def __init__(self, max_age=2.0, overlap=5):
+        self.max_age = max_age      # seconds before plan() triggers an incremental sync
+        self.overlap = overlap      # seconds re-read behind the watermark for late commits
+        self._lock = threading.Lock()
+        self._drugs = {}            # DrugName -> {BatchNo: [ExpiryDate, stock, price]}
+        self._watermark = None      # newest UpdatedAt applied
+        self._synced_at = 0.0
+        self._dirty = set()         # drugs to re-read in full (after a rollback)
+
+    def _apply(self, rows):
+        for batch, drug, exp, stock, price, updated in rows:
+            self._drugs.setdefault(drug, {})[batch] = [exp, stock or 0, price]
+            if updated is not None and (self._watermark is None or updated > self._watermark):
+                self._watermark = updated
+
+    def sync(self):
+        """Pull batches changed since the last sync (everything on first use)."""
+        cols = "SELECT BatchNo, DrugName, ExpiryDate, Stock_quantity, Price, UpdatedAt FROM MEDICINE"
+        with self._lock:
+            if self._watermark is None:
+                rows = run_select(cols + " WHERE ExpiryDate IS NULL OR ExpiryDate >= CURDATE()")
+                self._drugs = {}
+                self._apply(rows)
+                if self._watermark is None:
+                    self._watermark = datetime(1970, 1, 2)
+            else:
+                since = self._watermark - timedelta(seconds=self.overlap)
+                self._apply(run_select(cols + " WHERE UpdatedAt >= %s", (since,)))
+            dirty, self._dirty = self._dirty, set()
+            for drug in dirty:
+                self._drugs[drug] = {}
+                self._apply(run_select(cols + " WHERE DrugName = %s", (drug,)))
+            self._synced_at = time.monotonic()
+
+    def invalidate(self, drugs):
+        """Re-read these drugs on the next sync (their local stock may be wrong)."""
+        with self._lock:
+            self._dirty.update(drugs)
+            self._synced_at = 0.0
+
+    def available(self, drug, today=None):
+        today = today or date.today()
+        with self._lock:
+            return sum(stock for exp, stock, _ in self._drugs.get(drug, {}).values()
+                       if stock > 0 and (exp is None or exp >= today))
+
+    def plan(self, drug, qty, today=None, exclude=()):
+        """Split qty over the drug's batches, earliest expiry first, skipping `exclude`.
+
+        Returns [(BatchNo, quantity, batch price), ...] or None if short.
+        """
+        today = today or date.today()
+        with self._lock:
+            sellable = sorted(((exp, batch, stock, price)
+                               for batch, (exp, stock, price) in self._drugs.get(drug, {}).items()
+                               if stock > 0 and (exp is None or exp >= today) and batch not in exclude),
+                              key=lambda b: (b[0] is None, b[0] or date.max, b[1]))
+        picks, remaining = [], qty
+        for exp, batch, stock, price in sellable:
+            take = min(stock, remaining)
+            picks.append((batch, take, price))
+            remaining -= take
+            if remaining == 0:
+                return picks
+        return None
+
+    def consume(self, drug, picks):
+        """Take sold [(BatchNo, quantity, ...)] off the local stock of a drug."""
+        with self._lock:
+            batches = self._drugs.get(drug, {})
+            for batch, take, *_ in picks:
+                if batch in batches:
+                    batches[batch][1] -= take
+
+    def _reload_drug(self, cur, drug):
+        # Locking read: sees the latest committed stock and holds it for this sale
+        cur.execute("SELECT BatchNo, DrugName, ExpiryDate, Stock_quantity, Price, UpdatedAt "
+                    "FROM MEDICINE WHERE DrugName = %s FOR UPDATE", (drug,))
+        rows = cur.fetchall()
+        with self._lock:
+            self._drugs[drug] = {}
+            self._apply(rows)
+
+    def insert_lines(self, cur, order_id, drug, qty, price=None, exclude=()):
+        """Insert FEFO-allocated ORDERED_DRUG rows on `cur`, inside the caller's transaction.
+
+        `price` overrides the unit price; by default each batch's MEDICINE price
+        is used. Batches in `exclude` (already on the order) are not picked, as
+        a second row for them would violate the ORDERED_DRUG key. Returns the
+        inserted rows; raises AllocationError if short.
+        """
+        if time.monotonic() - self._synced_at > self.max_age:
+            self.sync()
+        for attempt in range(2):
+            picks = self.plan(drug, qty, exclude=exclude)
+            if picks is not None:
+                rows = [(drug, order_id, batch, take, price if price is not None else bprice)
+                        for batch, take, bprice in picks]
+                try:
+                    cur.executemany(ORDERED_DRUG_INSERT, rows)
+                    self.consume(drug, picks)
+                    return rows
+                except Error as e:
+                    if e.sqlstate != "45000" or attempt:
+                        raise
+            elif attempt:
+                break
+            self._reload_drug(cur, drug)
+        raise AllocationError(f"Not enough non-expired stock of {drug} for {qty} units "
+                              f"(available {self.available(drug)})")
+
+BATCH_ALLOCATOR = BatchAllocator()
+
+def _price_from_batches(cur, rows):
+    """Fill a None price on ORDERED_DRUG rows with their batch's MEDICINE price.
+
+    Read on the caller's cursor, so the price is the one of the transaction
+    that sells the batch; a batch that does not exist keeps None and is then
+    rejected by trg_sell_stock.
+    """
+    keys = {(r[2], r[0]) for r in rows if r[4] is None}
+    if not keys:
+        return rows
+    cur.execute("SELECT BatchNo, DrugName, Price FROM MEDICINE WHERE (BatchNo, DrugName) IN ("
+                + ", ".join(["(%s,%s)"] * len(keys)) + ") FOR UPDATE", [v for k in keys for v in k])
+    # Keys compare case-insensitively, like the columns' collation
+    prices = {(b.lower(), d.lower()): p for b, d, p in cur.fetchall()}
+    return [r if r[4] is not None else r[:4] + (prices.get((r[2].lower(), r[0].lower())),) for r in rows]
+
+def sell_fefo(order_id, drug, qty, price=None):
+    """Sell qty of a drug on an existing order, split across batches FEFO.
+
+    Returns the ORDERED_DRUG rows inserted, or None if nothing was sold.
+    """
+    def work(cur):
+        cur.execute("SELECT BatchNo FROM ORDERED_DRUG WHERE OrderID = %s AND DrugName = %s", (order_id, drug))
+        on_order = {r[0] for r in cur.fetchall()}
+        return BATCH_ALLOCATOR.insert_lines(cur, order_id, drug, qty, price, exclude=on_order)
+    rows = run_transaction(work, "Allocation Error")
+    if rows is None:
+        BATCH_ALLOCATOR.invalidate([drug])
+    return rows
+
+# ---------- MEDICINE EDITS ----------
+MEDICINE_EDIT_FIELDS = ("ExpiryDate", "Price", "SupID", "Type")   # versioned by RowVersion
+MEDICINE_ROW_QUERY = """SELECT ExpiryDate, Stock_quantity, Price, SupID, Type, RowVersion
+                        FROM MEDICINE WHERE BatchNo = %s AND DrugName = %s"""
+
+def _medicine_row(rows):
+    names = MEDICINE_EDIT_FIELDS[:1] + ("Stock_quantity",) + MEDICINE_EDIT_FIELDS[1:] + ("RowVersion",)
+    return dict(zip(names, rows[0])) if rows else None
+
+def fetch_medicine(batch, drug):
+    """{column: value} for one batch, RowVersion included, or None if it is gone."""
+    return _medicine_row(run_select(MEDICINE_ROW_QUERY, (batch, drug)))
+
+def update_medicine(batch, drug, version, changes, stock_delta=0):
+    """Apply an edit made against RowVersion `version` of a batch.
+
+    `changes` maps the MEDICINE_EDIT_FIELDS the user changed to their new
+    values and is written only if RowVersion is still `version`. Stock moves
+    by `stock_delta` from whatever it is now, so sales made since the edit
+    began are kept, and never below zero. Returns (status, current row) with
+    status "ok", "conflict" (someone else edited the batch first),
+    "negative" (not enough stock left for the delta) or "missing"; None on
+    a DB error.
+    """
+    def work(cur):
+        sets = [f"{col} = %s" for col in changes] + ["Stock_quantity = IFNULL(Stock_quantity, 0) + %s"]
+        where = ["BatchNo = %s", "DrugName = %s", "IFNULL(Stock_quantity, 0) + %s >= 0"]
+        params = list(changes.values()) + [stock_delta, batch, drug, stock_delta]
+        if changes:
+            where.append("RowVersion = %s")
+            params.append(version)
+        cur.execute(f"UPDATE MEDICINE SET {', '.join(sets)} WHERE {' AND '.join(where)}", params)
+        updated = cur.rowcount == 1
+        cur.execute(MEDICINE_ROW_QUERY, (batch, drug))
+        row = _medicine_row(cur.fetchall())
+        if updated:
+            return "ok", row
+        # rowcount counts changed rows, so 0 may also be a matched row the
+        # edit left as it was: re-check the WHERE against the row as read
+        if row is None:
+            return "missing", None
+        if changes and row["RowVersion"] != version:
+            return "conflict", row
+        if (row["Stock_quantity"] or 0) + stock_delta < 0:
+            return "negative", row
+        return "ok", row
+    if not changes and not stock_delta:
+        row = fetch_medicine(batch, drug)
+        return ("ok", row) if row else ("missing", None)
+    result = run_transaction(work, "Medicine Update Error")
+    if result and result[0] == "ok":
+        REF_CACHE.invalidate("MEDICINE")
+    return result
+
+# ---------- SALES ----------
+def checkout_order(order_id, cid, emp_id, order_date, lines, bill_id):
+    """Create an order, its ORDERED_DRUG lines and its bill atomically.
+
+    `lines` is a list of (DrugName, BatchNo, quantity, unit price). A blank
+    BatchNo is allocated FEFO across batches; a None price takes the batch's
+    own MEDICINE price, for FEFO and explicit batches alike. Lines for the same batch are merged (the first price
+    given wins), and FEFO never picks a batch the order already has, since
+    ORDERED_DRUG allows one row per batch. One round trip per stage and a
+    single commit; nothing is left behind on failure. Returns the bill total,
+    or None if rolled back.
+    """
+    explicit, fefo = {}, {}
+    for drug, batch, qty, price in lines:
+        if batch:
+            merged = explicit.setdefault((drug, batch), [0, None])
+            merged[0] += qty
+            if merged[1] is None:
+                merged[1] = price
+        else:
+            fefo.setdefault((drug, price), [0])[0] += qty
+
+    def work(cur):
+        cur.callproc('CreateOrder', (order_id, cid, emp_id, order_date))
+        rows = _price_from_batches(cur, [(drug, order_id, batch, qty, price)
+                                         for (drug, batch), (qty, price) in explicit.items()])
+        used = {}   # DrugName -> batches on this order
+        if rows:
+            cur.executemany(ORDERED_DRUG_INSERT, rows)
+            for drug, _, batch, qty, _ in rows:
+                BATCH_ALLOCATOR.consume(drug, [(batch, qty)])
+                used.setdefault(drug, set()).add(batch)
+        for (drug, price), (qty,) in fefo.items():
+            picked = BATCH_ALLOCATOR.insert_lines(cur, order_id, drug, qty, price, exclude=used.get(drug, ()))
+            used.setdefault(drug, set()).update(r[2] for r in picked)
+            rows += picked
+        cur.callproc('GenerateBill', (bill_id, cid, order_id))
+        return sum(qty * float(price or 0) for _, _, _, qty, price in rows)
+    total = run_transaction(work, "Checkout Error")
+    if total is None:
+        # Local stock was taken off for lines that were rolled back
+        BATCH_ALLOCATOR.invalidate({drug for drug, _, _, _ in lines})
+    return total
+
+def bill_unbilled_orders():
+    """Bill every order that has lines but no bill, in one set-based statement.
+
+    Returns (bills created, total billed), or None on error.
+    """
+    def work(cur):
+        bills, total = cur.callproc('BillUnbilledOrders', (0, 0))
+        return bills or 0, total or 0
+    return run_transaction(work, "Bulk Billing Error")
+
+def create_order(order_id, cid, emp_id, order_date):
+    """Create an order through CreateOrder, falling back to a plain INSERT."""
+    if call_procedure('CreateOrder', (order_id, cid, emp_id, order_date)):
+        return True
+    q = "INSERT INTO `ORDER` (OrderID, Cid, EmpID, OrderDate) VALUES (%s,%s,%s,%s)"
+    return run_query(q, (order_id, cid, emp_id, order_date))
+
+def add_ordered_drug(drug, order_id, batch, qty, price=None):
+    """Add a line to an existing order; a blank batch is allocated FEFO.
+
+    A None price takes the batch's MEDICINE price. Returns the ORDERED_DRUG
+    rows inserted, or None if nothing was sold.
+    """
+    if not batch:
+        return sell_fefo(order_id, drug, qty, price)
+    def work(cur):
+        rows = _price_from_batches(cur, [(drug, order_id, batch, qty, price)])
+        cur.execute(ORDERED_DRUG_INSERT, rows[0])
+        return rows
+    return run_transaction(work, "Query Error")
+
+def generate_bill(bill_id, cid, order_id):
+    return call_procedure('GenerateBill', (bill_id, cid, order_id))
+
+# ---------- PRESCRIPTIONS ----------
+def add_prescription(pres_id, cid, doc_id, pres_date, order_id):
+    """Insert a prescription and raise a notification for it.
+
+    Returns the notification's NID ("" if only the notification failed), or
+    None if the prescription itself was rejected.
+    """
+    q = "INSERT INTO PRESCRIPTION (PresID, Cid, DocID, PresDate, OrderID) VALUES (%s,%s,%s,%s,%s)"
+    if not run_query(q, (pres_id, cid, doc_id, pres_date, order_id)):
+        return None
+    nid = ID_ALLOCATOR.next_id("NOTIFICATION")
+    msg = f"New prescription {pres_id} for customer {cid}"
+    if nid and run_query("INSERT INTO NOTIFICATION (NID, Type, Message) VALUES (%s,%s,%s)",
+                         (nid, "Prescription", msg)):
+        return nid
+    return ""
+
+def add_prescribed_drug(drug_id, pres_id, qty):
+    return run_query("INSERT INTO PRESCRIBED_DRUG (DrugID, PresID, Quantity) VALUES (%s,%s,%s)",
+                     (drug_id, pres_id, qty))
+
+# ---------- NOTIFICATION COUNTERS ----------
+# NOTIFICATION_COUNTER (migration 0004) keeps, via triggers, the total number of
+# notifications under '*' and how many each employee has marked seen under their
+# EmpID, so unread = '*' - own row: two primary-key reads instead of an anti-join.
+UNREAD_COUNT_QUERY = """SELECT IFNULL((SELECT Notifications FROM NOTIFICATION_COUNTER WHERE EmpID = '*'), 0)
+                    - IFNULL((SELECT Notifications FROM NOTIFICATION_COUNTER WHERE EmpID = %s), 0)"""
+
+MARK_ALL_SEEN_QUERY = """INSERT INTO IS_NOTIFIED (EmpID, NID)
+               SELECT %s, n.NID FROM NOTIFICATION n
+               WHERE NOT EXISTS (SELECT 1 FROM IS_NOTIFIED i WHERE i.EmpID = %s AND i.NID = n.NID)"""
+
+def unread_count(emp_id):
+    """Notifications emp_id has not marked seen, or None if the query failed."""
+    rows = run_select(UNREAD_COUNT_QUERY, (emp_id,))
+    if not rows:
+        return None
+    return max(int(rows[0][0] or 0), 0)
+
+def mark_all_seen(emp_id):
+    """Mark every notification seen by emp_id in one INSERT ... SELECT.
+
+    Returns how many were newly marked, or None on failure.
+    """
+    def work(cur):
+        cur.execute(MARK_ALL_SEEN_QUERY, (emp_id, emp_id))
+        return max(cur.rowcount or 0, 0)
+    return run_transaction(work, "Mark All Seen Error")
+
+# ---------- NOTIFICATION FEED ----------
+NOTIFICATION_FEED_QUERY = "SELECT Seq, NID, Type, Message FROM NOTIFICATION WHERE Seq > %s ORDER BY Seq LIMIT %s"
+
+ER_BAD_FIELD_ERROR = 1054   # unknown column
+
+class NotificationFeed:
+    """Cursor over NOTIFICATION.Seq (migration 0005) that hands out each new row once.
+
+    start() and fetch() only query and may run on a worker thread, and raise
+    Error rather than showing it since they run unattended; accept()
+    keeps the cursor and must be called from one thread. AUTO_INCREMENT values
+    are taken at insert but become visible at commit, so a row can appear after
+    one with a higher Seq: the cursor stops below a missing Seq and waits up to
+    gap_wait_s for it (rolled-back or deleted rows never arrive), re-reading
+    the rows above it meanwhile without handing them out twice.
+    """
+
+    def __init__(self, batch=200, gap_wait_s=10.0, clock=time.monotonic):
+        self.batch = batch
+        self.gap_wait_s = gap_wait_s
+        self._clock = clock
+        self.last = None            # every Seq <= last has been handed out or skipped
+        self._ahead = set()         # Seqs above last already handed out
+        self._gap_since = None
+
+    def start(self):
+        """The newest Seq now, to begin the feed at; None if there is no Seq column."""
+        try:
+            rows = fetch_rows("SELECT IFNULL(MAX(Seq), 0) FROM NOTIFICATION")
+        except Error as e:
+            if e.errno == ER_BAD_FIELD_ERROR:
+                return None
+            raise
+        return int(rows[0][0])
+
+    def reset(self, last):
+        self.last = last
+        self._ahead.clear()
+        self._gap_since = None
+
+    def fetch(self, after):
+        return fetch_rows(NOTIFICATION_FEED_QUERY, (after, self.batch))
+
+    def accept(self, rows):
+        """Take fetch() rows; returns the (Seq, NID, Type, Message) rows not handed out before."""
+        new = [r for r in rows if r[0] > self.last and r[0] not in self._ahead]
+        self._ahead.update(r[0] for r in new)
+        while self._ahead:
+            low = min(self._ahead)
+            if low == self.last + 1:
+                self._ahead.discard(low)
+                self.last = low
+                self._gap_since = None
+                continue
+            now = self._clock()
+            if self._gap_since is None:
+                self._gap_since = now
+            if now - self._gap_since < self.gap_wait_s:
+                break
+            self.last = low - 1     # give up on the missing Seqs below low
+            self._gap_since = None
+        return new
+
+# ---------- EXPIRY SCAN ----------
+EXPIRY_COUNT_QUERY = """SELECT COUNT(*), IFNULL(SUM(ExpiryDate < %s), 0)
+               FROM MEDICINE WHERE ExpiryDate <= %s"""
+
+def expiry_counts(warn_days, today=None):
+    """(expired, expiring within warn_days) batch counts, from one range scan on idx_medicine_expiry.
+
+    Returns None if the query failed.
+    """
+    today = today or date.today()
+    rows = run_select(EXPIRY_COUNT_QUERY, (today, today + timedelta(days=warn_days)))
+    if not rows:
+        return None
+    total, expired = (int(v or 0) for v in rows[0])
+    return expired, total - expired
+
+# ---------- BULK CSV IMPORT ----------
+def _csv_text(limit):
+    def parse(v):
+        if len(v) > limit:
+            raise ValueError(f"longer than {limit} characters")
+        return v
+    return parse
+
+def _csv_count(v):
+    try:
+        n = int(v)
+    except ValueError:
+        raise ValueError("not a whole number")
+    if n < 0:
+        raise ValueError("must not be negative")
+    return n
+
+def _csv_money(v):
+    try:
+        d = Decimal(v)
+    except InvalidOperation:
+        raise ValueError("not a number")
+    if d < 0 or d >= Decimal("100000000"):
+        raise ValueError("out of range")
+    return d.quantize(Decimal("0.01"))
+
+def _csv_date(v):
+    try:
+        return datetime.strptime(v, "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError("not a YYYY-MM-DD date")
+
+# Per table: columns as (name, parser, required), the key duplicates are
+# checked on, and foreign keys checked in bulk as (referenced table, columns).
+IMPORT_SPECS = {
+    "MEDICINE": {
+        "columns": [("BatchNo", _csv_text(20), True), ("DrugName", _csv_text(50), True),
+                    ("ExpiryDate", _csv_date, False), ("Stock_quantity", _csv_count, False),
+                    ("Price", _csv_money, False), ("SupID", _csv_text(5), False),
+                    ("Type", _csv_text(30), False)],
+        "key": ("BatchNo", "DrugName"),
+        "refs": [("SUPPLIER", ("SupID",))]
+    },
+    "SUPPLIER": {
+        "columns": [("SupID", _csv_text(5), True), ("SupName", _csv_text(50), True),
+                    ("License_no", _csv_text(30), False), ("Email", _csv_text(50), False),
+                    ("Phone", _csv_text(15), False), ("Street", _csv_text(50), False),
+                    ("City", _csv_text(30), False)],
+        "key": ("SupID",),
+        "refs": []
+    },
+    "CUSTOMER": {
+        "columns": [("Cid", _csv_text(5), True), ("Cname", _csv_text(50), True),
+                    ("DOB", _csv_date, False), ("InsuranceID", _csv_text(5), False),
+                    ("Street", _csv_text(50), False), ("DNO", _csv_text(10), False),
+                    ("City", _csv_text(30), False), ("Phone", _csv_text(15), False)],
+        "key": ("Cid",),
+        "refs": [("INSURANCE", ("InsuranceID",))]
+    },
+    "SUPPLIES_TO": {
+        "columns": [("SupID", _csv_text(5), True), ("DrugName", _csv_text(50), True),
+                    ("BatchNo", _csv_text(20), True)],
+        "key": ("SupID", "DrugName", "BatchNo"),
+        "refs": [("SUPPLIER", ("SupID",)), ("MEDICINE", ("BatchNo", "DrugName"))]
+    }
+}
+
+def _validate_csv_row(spec, header_map, raw):
+    """Parse one CSV record into a value tuple; raises ValueError naming the bad column."""
+    values = []
+    for name, parse, required in spec["columns"]:
+        idx = header_map.get(name.lower())
+        text = raw[idx].strip() if idx is not None and idx < len(raw) else ""
+        if not text:
+            if required:
+                raise ValueError(f"{name}: required")
+            values.append(None)
+            continue
+        try:
+            values.append(parse(text))
+        except ValueError as e:
+            raise ValueError(f"{name}: {e}")
+    return tuple(values)
+
+def _missing_refs(cur, ref_table, ref_cols, keys):
+    """Return the subset of `keys` (tuples over ref_cols) that do not exist in ref_table."""
+    if not keys:
+        return set()
+    keys = list(keys)
+    cols = ", ".join(ref_cols)
+    tuple_sql = "(" + ", ".join(["%s"] * len(ref_cols)) + ")"
+    cur.execute(f"SELECT {cols} FROM `{ref_table}` WHERE ({cols}) IN ({', '.join([tuple_sql] * len(keys))})",
+                [v for k in keys for v in k])
+    # Keys compare case-insensitively, like the columns' collation
+    found = {tuple(str(v).lower() for v in r) for r in cur.fetchall()}
+    return {k for k in keys if tuple(str(v).lower() for v in k) not in found}
+
+def import_csv(path, table, upsert=False, progress=None):
+    """Validate and load a CSV file into `table` (see IMPORT_SPECS) in batches.
+
+    The file is read in one streaming pass: each record is type-checked,
+    checked for duplicates within the file, and queued; every
+    IMPORT_BATCH_ROWS rows the batch's foreign keys are checked with one
+    query per reference and the valid rows go in with a single executemany
+    in one transaction. A batch the server rejects is retried row by row so
+    the error lands on the offending line. `upsert` turns key clashes with
+    existing rows into updates. Returns a summary dict, or None if the DB is
+    unreachable.
+    """
+    spec = IMPORT_SPECS[table]
+    names = [c[0] for c in spec["columns"]]
+    key_idx = [names.index(k) for k in spec["key"]]
+    sql = f"INSERT INTO `{table}` ({', '.join(names)}) VALUES ({', '.join(['%s'] * len(names))})"
+    if upsert:
+        sql += " ON DUPLICATE KEY UPDATE " + ", ".join(f"{n} = VALUES({n})" for n in names if n not in spec["key"])
+    summary = {"table": table, "read": 0, "loaded": 0, "errors": [], "batches": 0,
+               "validate_s": 0.0, "load_s": 0.0}
+    started = time.perf_counter()
+    conn = DB_POOL.acquire()
+    if not conn:
+        return None
+    cur = TimedCursor(conn.cursor(), time.perf_counter() - started)
+    broken = False
+    seen = set()
+    batch = []   # [(line no, values)]
+
+    def flush():
+        nonlocal broken
+        if not batch:
+            return
+        t0 = time.monotonic()
+        good = batch
+        for ref_table, ref_cols in spec["refs"]:
+            idx = [names.index(c) for c in ref_cols]
+            keys = {tuple(v[i] for i in idx) for _, v in good if all(v[i] is not None for i in idx)}
+            missing = _missing_refs(cur, ref_table, ref_cols, keys)
+            if missing:
+                kept = []
+                for line, v in good:
+                    k = tuple(v[i] for i in idx)
+                    if k in missing:
+                        summary["errors"].append((line, f"{'/'.join(ref_cols)} {'/'.join(map(str, k))} not found in {ref_table}"))
+                    else:
+                        kept.append((line, v))
+                good = kept
+        if good:
+            try:
+                conn.start_transaction()
+                cur.executemany(sql, [v for _, v in good])
+                cur.timed("COMMIT", conn.commit)
+                summary["loaded"] += len(good)
+            except Error as e:
+                if _is_connection_error(e):
+                    broken = True
+                    raise
+                conn.rollback()
+                for line, v in good:
+                    try:
+                        cur.execute(sql, v)
+                        summary["loaded"] += 1
+                    except Error as row_err:
+                        if _is_connection_error(row_err):
+                            broken = True
+                            raise
+                        summary["errors"].append((line, getattr(row_err, "msg", None) or str(row_err)))
+        summary["batches"] += 1
+        summary["load_s"] += time.monotonic() - t0
+        batch.clear()
+        if progress:
+            progress(summary)
+
+    try:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if not header:
+                summary["errors"].append((1, "empty file"))
+                return summary
+            header_map = {h.strip().lower(): i for i, h in enumerate(header)}
+            absent = [n for n, _, req in spec["columns"] if req and n.lower() not in header_map]
+            if absent:
+                summary["errors"].append((1, f"missing required column(s): {', '.join(absent)}"))
+                return summary
+            t0 = time.monotonic()
+            for raw in reader:
+                line = reader.line_num
+                if not any(c.strip() for c in raw):
+                    continue
+                summary["read"] += 1
+                try:
+                    values = _validate_csv_row(spec, header_map, raw)
+                    key = tuple(str(values[i]).lower() for i in key_idx)
+                    if key in seen:
+                        raise ValueError(f"duplicate {'/'.join(spec['key'])} {'/'.join(str(values[i]) for i in key_idx)} earlier in the file")
+                    seen.add(key)
+                    batch.append((line, values))
+                except ValueError as e:
+                    summary["errors"].append((line, str(e)))
+                if len(batch) >= IMPORT_BATCH_ROWS:
+                    summary["validate_s"] += time.monotonic() - t0
+                    flush()
+                    t0 = time.monotonic()
+            summary["validate_s"] += time.monotonic() - t0
+            flush()
+    except (OSError, csv.Error, UnicodeDecodeError) as e:
+        summary["errors"].append((0, f"cannot read file: {e}"))
+    except Error as e:
+        broken = broken or _is_connection_error(e)
+        show_db_error("Import Error", str(e))
+    finally:
+        cur.close()
+        DB_POOL.release(conn, discard=broken)
+        if summary["loaded"]:
+            REF_CACHE.invalidate(table)
+    return summary
+
+def format_import_summary(summary):
+    elapsed = summary["validate_s"] + summary["load_s"]
+    rate = summary["loaded"] / elapsed if elapsed else 0.0
+    lines = [f"{summary['table']}: {summary['read']} rows read, {summary['loaded']} loaded, "
+             f"{len(summary['errors'])} errors",
+             f"{summary['batches']} batches of up to {IMPORT_BATCH_ROWS} rows; "
+             f"validate {summary['validate_s']:.2f}s, load {summary['load_s']:.2f}s, "
+             f"{rate:,.0f} rows/s overall"]
+    if summary["errors"]:
+        lines.append("")
+        lines += [f"line {line}: {msg}" for line, msg in summary["errors"][:IMPORT_ERRORS_SHOWN]]
+        if len(summary["errors"]) > IMPORT_ERRORS_SHOWN:
+            lines.append(f"... and {len(summary['errors']) - IMPORT_ERRORS_SHOWN} more")
+    return "\n".join(lines)
+
+# ---------- BACKGROUND DB EXECUTOR ----------
+class DBFuture:
+    """Handle for a background DB call. Callbacks always run on the Tk thread."""
+    def __init__(self, key=None):
+        self.key = key
+        self.cancelled = False
+        self.done = False
+        self.result = None
+        self.error = None
+        self._callbacks = []
+
+    def cancel(self):
+        """Skip the call if it has not started yet, and drop its result either way."""
+        self.cancelled = True
+
+    def add_done_callback(self, fn):
+        if self.done:
+            fn(self)
+        else:
+            self._callbacks.append(fn)
+
+class DBExecutor:
+    """Runs DB helpers on worker threads and hands results back via Tk's after() loop.
+
+    Calls submitted with a `key` supersede any earlier call with the same key,
+    so reloading a tab twice only ever paints the latest result.
+    """
+    def __init__(self, root, workers=3, poll_ms=50):
+        global _ui_dispatch
+        self.root = root
+        self.poll_ms = poll_ms
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._latest = {}
+        self._running = True
+        self._threads = []
+        for i in range(workers):
+            t = threading.Thread(target=self._worker, name=f"db-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        _ui_dispatch = self.call_in_ui
+        self._after_id = self.root.after(self.poll_ms, self._poll)
+
+    def submit(self, fn, *args, key=None, callback=None, errback=None):
+        fut = DBFuture(key)
+        if key is not None:
+            prev = self._latest.get(key)
+            if prev is not None and not prev.done:
+                prev.cancel()
+            self._latest[key] = fut
+        self._jobs.put((fut, fn, args, callback, errback))
+        return fut
+
+    def call_in_ui(self, fn, *args):
+        """Schedule fn(*args) on the Tk thread; safe to call from any thread."""
+        self._results.put((None, fn, args))
+
+    def when_all(self, futures, fn):
+        """Call fn() on the Tk thread once every future has finished or been cancelled."""
+        pending = [f for f in futures if f is not None]
+        if not pending:
+            fn(); return
+        remaining = [len(pending)]
+        def one_done(_):
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                fn()
+        for f in pending:
+            f.add_done_callback(one_done)
+
+    def _worker(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            fut, fn, args, callback, errback = job
+            if not fut.cancelled:
+                try:
+                    fut.result = fn(*args)
+                except Exception as e:
+                    fut.error = e
+            self._results.put((fut, callback, errback))
+
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    fut, a, b = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    if fut is None:
+                        a(*b)
+                    else:
+                        self._finish(fut, a, b)
+                except tk.TclError:
+                    pass  # target widget was closed while the query ran
+                except Exception as e:
+                    # A failing callback must not stop the loop for every later result
+                    show_db_error("Background Error", f"{type(e).__name__}: {e}")
+        finally:
+            if self._running:
+                self._after_id = self.root.after(self.poll_ms, self._poll)
+
+    def _finish(self, fut, callback, errback):
+        fut.done = True
+        if fut.key is not None and self._latest.get(fut.key) is fut:
+            del self._latest[fut.key]
+        if not fut.cancelled:
+            if fut.error is not None:
+                if errback:
+                    errback(fut.error)
+                else:
+                    messagebox.showerror("Background Error", str(fut.error))
+            elif callback:
+                callback(fut.result)
+        for cb in fut._callbacks:
+            cb(fut)
+        fut._callbacks = []
+
+    def shutdown(self):
+        global _ui_dispatch
+        self._running = False
+        for fut in self._latest.values():
+            fut.cancel()
+        for _ in self._threads:
+            self._jobs.put(None)
+        try:
+            self.root.after_cancel(self._after_id)
+        except tk.TclError:
+            pass
+        if _ui_dispatch == self.call_in_ui:
+            _ui_dispatch = None
+
+# ---------- PAGED TABLE ----------
+class PagedTable:
+    """Treeview that loads a table in primary-key keyset pages as the user scrolls.
+
+    At most `max_pages` pages live in the widget; scrolling past either end
+    fetches the next/previous page and drops the one furthest away, so memory
+    stays bounded however large the table grows.
+    """
+    def __init__(self, parent, executor, table, columns, key_cols, date_cols=(),
+                 height=14, col_width=120, page_size=TABLE_PAGE_SIZE, max_pages=TABLE_MAX_PAGES,
+                 where="", params=()):
+        self.executor = executor
+        self.table = table
+        self.where = where          # optional fixed filter, e.g. "ExpiryDate < %s"
+        self.params = tuple(params)
+        self._job_key = f"{table}:{id(self)}"
+        self.columns = columns
+        self.key_cols = key_cols
+        self.date_cols = [columns.index(c) for c in date_cols]
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self._key_idx = [columns.index(k) for k in key_cols]
+        self._pages = []        # [{"first": key, "last": key, "items": [iid, ...]}]
+        self._at_start = True
+        self._at_end = True
+        self._loading = False
+        self._total = None
+
+        self.frame = ttk.Frame(parent)
+        body = ttk.Frame(self.frame)
+        body.pack(fill="both", expand=True)
+        self.tree = ttk.Treeview(body, columns=columns, show="headings", height=height)
+        for c in columns:
+            self.tree.heading(c, text=c)
+            self.tree.column(c, width=col_width)
+        self.vsb = ttk.Scrollbar(body, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.vsb.pack(side="right", fill="y")
+        foot = ttk.Frame(self.frame)
+        foot.pack(fill="x", pady=(2, 0))
+        self.status = ttk.Label(foot, text="", foreground="gray")
+        self.status.pack(side="left")
+        ttk.Button(foot, text="Export...", command=self.export).pack(side="right")
+
+    # ----- SQL -----
+    def _where(self, keyset=""):
+        conds = [c for c in (self.where, keyset) if c]
+        return ("WHERE " + " AND ".join(conds)) if conds else ""
+
+    def _select(self, keyset="", order="ASC"):
+        cols = ", ".join(self.columns)
+        order_by = ", ".join(f"{k} {order}" for k in self.key_cols)
+        return f"SELECT {cols} FROM `{self.table}` {self._where(keyset)} ORDER BY {order_by} LIMIT {self.page_size}"
+
+    def export(self):
+        """Stream every row matching the current filter (not just the pages in view) to a file."""
+        cols = ", ".join(self.columns)
+        order_by = ", ".join(self.key_cols)
+        query = f"SELECT {cols} FROM `{self.table}` {self._where()} ORDER BY {order_by}"
+        export_dialog(self.frame, self.executor, query, self.params, self.table.lower())
+
+    def _keyset(self, op):
+        keys = ", ".join(self.key_cols)
+        marks = ", ".join(["%s"] * len(self.key_cols))
+        return f"({keys}) {op} ({marks})"
+
+    # ----- loading -----
+    def set_filter(self, where="", params=()):
+        """Replace the fixed filter and reload from the first page."""
+        self.where = where
+        self.params = tuple(params)
+        return self.reload()
+
+    def reload(self):
+        """Drop everything and fetch the first page plus a fresh row count."""
+        self.executor.submit(run_select, f"SELECT COUNT(*) FROM `{self.table}` {self._where()}", self.params,
+                             key=f"count:{self._job_key}", callback=self._set_total)
+        return self._fetch(self._select(), self.params, self._fill_first)
+
+    def _fetch(self, query, params, callback):
+        self._loading = True
+        fut = self.executor.submit(run_select, query, params, key=f"page:{self._job_key}", callback=callback)
+        fut.add_done_callback(self._done_loading)
+        return fut
+
+    def _done_loading(self, fut):
+        self._loading = False
+        self._update_status()
+
+    def _fetch_next(self):
+        if self._loading or self._at_end or not self._pages:
+            return
+        self._fetch(self._select(self._keyset(">")), self.params + self._pages[-1]["last"], self._append_page)
+
+    def _fetch_prev(self):
+        if self._loading or self._at_start or not self._pages:
+            return
+        self._fetch(self._select(self._keyset("<"), "DESC"), self.params + self._pages[0]["first"], self._prepend_page)
+
+    def _on_scroll(self, first, last):
+        self.vsb.set(first, last)
+        if float(last) >= 0.95:
+            self._fetch_next()
+        elif float(first) <= 0.05:
+            self._fetch_prev()
+
+    # ----- painting -----
+    def _format(self, r):
+        row = list(r)
+        for i in self.date_cols:
+            if row[i]:
+                try:
+                    row[i] = row[i].strftime("%Y-%m-%d")
+                except:
+                    pass
+        return tuple(row)
+
+    def _key(self, r):
+        return tuple(r[i] for i in self._key_idx)
+
+    def _make_page(self, rows, index):
+        items = []
+        for offset, r in enumerate(rows):
+            pos = "end" if index == "end" else index + offset
+            items.append(self.tree.insert("", pos, values=self._format(r)))
+        return {"first": self._key(rows[0]), "last": self._key(rows[-1]), "items": items}
+
+    def _fill_first(self, rows):
+        self.tree.delete(*self.tree.get_children())
+        self._pages = []
+        self._at_start = True
+        self._at_end = len(rows) < self.page_size
+        if rows:
+            self._pages.append(self._make_page(rows, "end"))
+
+    def _append_page(self, rows):
+        if len(rows) < self.page_size:
+            self._at_end = True
+        if not rows:
+            return
+        self._pages.append(self._make_page(rows, "end"))
+        if len(self._pages) > self.max_pages:
+            top, total = self.tree.yview()[0], len(self.tree.get_children())
+            dropped = self._pages.pop(0)
+            self.tree.delete(*dropped["items"])
+            self._at_start = False
+            remaining = total - len(dropped["items"])
+            if remaining:
+                self.tree.yview_moveto(max(0.0, (top * total - len(dropped["items"])) / remaining))
+
+    def _prepend_page(self, rows):
+        if len(rows) < self.page_size:
+            self._at_start = True
+        if not rows:
+            return
+        rows = list(reversed(rows))
+        top, total = self.tree.yview()[0], len(self.tree.get_children())
+        self._pages.insert(0, self._make_page(rows, 0))
+        new_total = total + len(rows)
+        self.tree.yview_moveto((top * total + len(rows)) / new_total)
+        if len(self._pages) > self.max_pages:
+            dropped = self._pages.pop()
+            self.tree.delete(*dropped["items"])
+            self._at_end = False
+
+    def _set_total(self, rows):
+        self._total = rows[0][0] if rows else None
+        self._update_status()
+
+    def _update_status(self):
+        loaded = sum(len(p["items"]) for p in self._pages)
+        total = "?" if self._total is None else self._total
+        more = " (scroll for more)" if not self._at_end else ""
+        self.status.config(text=f"{loaded} rows in view of {total} total{more}")
+
+# ---------- STREAMING QUERY ----------
+ER_QUERY_INTERRUPTED = 1317
+ER_QUERY_TIMEOUT = 3024     # MAX_EXECUTION_TIME exceeded
+
+_SELECT_HEAD = re.compile(r"^\s*SELECT\b", re.I)
+
+def with_time_limit(query, timeout_ms):
+    """Add a MAX_EXECUTION_TIME optimizer hint to a SELECT.
+
+    A hint rather than SET SESSION max_execution_time, so the limit cannot
+    leak onto the pooled connection's next user.
+    """
+    if not timeout_ms or not _SELECT_HEAD.match(query):
+        return query
+    return _SELECT_HEAD.sub(f"SELECT /*+ MAX_EXECUTION_TIME({int(timeout_ms)}) */", query, count=1)
+
+def explain_query(query, params=()):
+    """Run EXPLAIN FORMAT=JSON; return (summary lines, pretty JSON), or None on error."""
+    rows = run_select("EXPLAIN FORMAT=JSON " + query, params)
+    if not rows:
+        return None
+    plan = json.loads(rows[0][0])
+    lines = []
+    cost = plan.get("query_block", {}).get("cost_info", {}).get("query_cost")
+    if cost:
+        lines.append(f"Estimated query cost: {cost}")
+
+    def walk(node):
+        if isinstance(node, list):
+            for item in node:
+                walk(item)
+            return
+        if not isinstance(node, dict):
+            return
+        table = node.get("table")
+        if isinstance(table, dict) and "table_name" in table:
+            access = table.get("access_type", "?")
+            key = table.get("key") or "-"
+            est = table.get("rows_examined_per_scan", "?")
+            lines.append(f"{table['table_name']}: access={access}, index={key}, est. rows={est}")
+            if access == "ALL":
+                lines.append(f"  WARNING: full table scan on {table['table_name']}"
+                             + (f" (possible keys: {', '.join(table['possible_keys'])})" if table.get("possible_keys") else ""))
+        if node.get("using_filesort"):
+            lines.append("  NOTE: uses a filesort")
+        if node.get("using_temporary_table"):
+            lines.append("  NOTE: uses a temporary table")
+        for value in node.values():
+            walk(value)
+    walk(plan)
+    return lines, json.dumps(plan, indent=2)
+
+class QueryStream:
+    """Runs one SELECT on an unbuffered cursor and feeds the rows to the UI in chunks.
+
+    run() executes on a DB worker; columns and every fetchmany() chunk are
+    handed to the Tk thread with executor.call_in_ui (or, with in_worker,
+    passed straight to the callbacks on the worker). The stream stops after
+    `max_rows` rows (None = no cap), and cancel() sends KILL QUERY for the
+    running statement from a second pooled connection. A connection left
+    mid-result is discarded rather than returned to the pool.
+    """
+    def __init__(self, executor, query, params=(), on_columns=None, on_rows=None,
+                 chunk=QUERY_CHUNK_ROWS, max_rows=QUERY_MAX_ROWS, timeout_ms=QUERY_TIMEOUT_MS,
+                 keep_rows=False, in_worker=False):
+        self.executor = executor
+        self._deliver = (lambda fn, *args: fn(*args)) if in_worker else executor.call_in_ui
+        self.query = with_time_limit(query, timeout_ms)
+        self.params = params
+        self.on_columns = on_columns
+        self.on_rows = on_rows
+        self.chunk = chunk
+        self.max_rows = max_rows
+        self.timeout_ms = timeout_ms
+        self.started = time.monotonic()
+        self.rows = 0
+        self.capped = False
+        self.cancelled = False
+        self.finished = False       # every row was read without error
+        self.columns = ()
+        self.description = ()       # DB-API cursor.description of the result
+        self.kept = [] if keep_rows else None
+        self._conn_id = None        # server thread id of the streaming connection while held
+        self._lock = threading.Lock()   # guards _conn_id and the release of that connection
+
+    def run(self):
+        """Stream the result; returns (rows sent, capped, cancelled)."""
+        started = time.perf_counter()
+        conn = DB_POOL.acquire()
+        if not conn:
+            return 0, False, False
+        with self._lock:
+            self._conn_id = conn.connection_id
+        cur = TimedCursor(conn.cursor(buffered=False), time.perf_counter() - started)
+        streaming = finished = broken = False
+        try:
+            cur.execute(self.query, self.params)
+            streaming = True
+            self.columns = tuple(cur.column_names)
+            self.description = tuple(cur.description)
+            self._deliver(self.on_columns, self.columns)
+            while not self.cancelled:
+                size = self.chunk if self.max_rows is None else min(self.chunk, self.max_rows - self.rows)
+                batch = cur.fetchmany(size)
+                if not batch:
+                    finished = self.finished = True
+                    break
+                if self.kept is not None:
+                    self.kept.extend(batch)
+                self.rows += len(batch)
+                self._deliver(self.on_rows, batch)
+                if self.max_rows is not None and self.rows >= self.max_rows:
+                    self.capped = True
+                    break
+        except Error as e:
+            broken = _is_connection_error(e)
+            if e.errno == ER_QUERY_TIMEOUT:
+                show_db_error("Query Timeout", f"Stopped after the {self.timeout_ms / 1000:g}s statement time limit.\n{e}")
+            elif not (self.cancelled and e.errno == ER_QUERY_INTERRUPTED):
+                show_db_error("Query Error", str(e))
+        finally:
+            if streaming and not finished and not broken:
+                self._kill(conn.connection_id)
+            try:
+                cur.close()
+            except Error:
+                pass
+            # Once released the thread id may belong to another user's statement,
+            # so it is cleared first and under the lock _kill checks it with
+            with self._lock:
+                self._conn_id = None
+                # Unread rows would poison the next user of this connection
+                DB_POOL.release(conn, discard=broken or not finished)
+        return self.rows, self.capped, self.cancelled
+
+    def cancel(self):
+        """Stop streaming and kill the statement if the server is still running it."""
+        self.cancelled = True
+        conn_id = self._conn_id
+        if conn_id is not None:
+            # Own thread: the DB workers may all be busy, this one included
+            threading.Thread(target=self._kill, args=(conn_id,), daemon=True).start()
+
+    def _kill(self, conn_id):
+        conn = DB_POOL.acquire()
+        if not conn:
+            return
+        cur = conn.cursor()
+        try:
+            # Only while run() still holds that connection; the lock keeps it
+            # from being released to the pool until the KILL has been sent
+            with self._lock:
+                if self._conn_id == conn_id:
+                    cur.execute(f"KILL QUERY {int(conn_id)}")
+        except Error:
+            pass   # the statement already finished
+        finally:
+            cur.close()
+            DB_POOL.release(conn)
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+# ---------- STREAMING EXPORT ----------
+EXPORT_FORMATS = {"CSV": ".csv", "Parquet": ".parquet"}
+
+class CsvSink:
+    """Writes streamed rows to a CSV file with a header line."""
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._writer = None
+
+    def begin(self, description):
+        self._file = open(self.path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([d[0] for d in description])
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+# mysql-connector leaves precision and scale out of cursor.description, so
+# DECIMAL columns get a fixed scale: enough for DECIMAL(14,2) and for AVG()
+# of it (scale + 4); ParquetSink rounds anything finer.
+PARQUET_DECIMAL_SCALE = 10
+_PARQUET_DECIMAL_STEP = Decimal(1).scaleb(-PARQUET_DECIMAL_SCALE)
+
+def _arrow_type(desc):
+    """Parquet column type for a cursor.description entry; text when unsure."""
+    code = desc[1]
+    if code in (FieldType.TINY, FieldType.SHORT, FieldType.INT24, FieldType.LONG,
+                FieldType.LONGLONG, FieldType.YEAR):
+        return pa.int64()
+    if code in (FieldType.FLOAT, FieldType.DOUBLE):
+        return pa.float64()
+    if code in (FieldType.DECIMAL, FieldType.NEWDECIMAL):
+        return pa.decimal128(38, PARQUET_DECIMAL_SCALE)
+    if code == FieldType.DATE:
+        return pa.date32()
+    if code in (FieldType.DATETIME, FieldType.TIMESTAMP):
+        return pa.timestamp("us")
+    return pa.string()
+
+class ParquetSink:
+    """Writes streamed rows as Parquet, one row group per fetched chunk."""
+    def __init__(self, path):
+        self.path = path
+        self._writer = None
+        self._schema = None
+
+    def begin(self, description):
+        self._schema = pa.schema([(d[0], _arrow_type(d)) for d in description])
+        self._writer = pq.ParquetWriter(self.path, self._schema)
+
+    def write(self, rows):
+        columns = []
+        for i, field in enumerate(self._schema):
+            values = [r[i] for r in rows]
+            if pa.types.is_string(field.type):
+                values = [None if v is None else str(v) for v in values]
+            elif pa.types.is_decimal(field.type):
+                values = [None if v is None else Decimal(v).quantize(_PARQUET_DECIMAL_STEP) for v in values]
+            columns.append(pa.array(values, type=field.type))
+        self._writer.write_table(pa.Table.from_arrays(columns, schema=self._schema))
+
+    def close(self):
+        if self._writer:
+            self._writer.close()
+
+def export_query(stream, path, fmt):
+    """Run a QueryStream (built with in_worker=True) into a file; returns (rows, cancelled).
+
+    Rows go from fetchmany() straight to the file, so memory stays at one
+    chunk however large the result. A cancelled or failed export removes
+    its partial file.
+    """
+    sink = ParquetSink(path) if fmt == "Parquet" else CsvSink(path)
+    stream.on_columns = lambda cols: sink.begin(stream.description)
+    stream.on_rows = sink.write
+    ok = False
+    try:
+        stream.run()
+        ok = stream.finished
+    finally:
+        sink.close()
+        if not ok:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return stream.rows, stream.cancelled
+
+def export_dialog(parent, executor, query, params=(), name="export", timeout_ms=0):
+    """Ask for a file and format, then stream `query` to it on a DB worker with a Cancel button.
+
+    timeout_ms caps each statement like the Queries tab does; 0 leaves
+    table and report exports unlimited.
+    """
+    formats = [f for f in EXPORT_FORMATS if f != "Parquet" or pa is not None]
+    path = filedialog.asksaveasfilename(
+        parent=parent, initialfile=name + ".csv",
+        filetypes=[(f, "*" + EXPORT_FORMATS[f]) for f in formats])
+    if not path:
+        return
+    fmt = "Parquet" if path.lower().endswith(".parquet") else "CSV"
+    if fmt == "Parquet" and pa is None:
+        messagebox.showwarning("Export", "Parquet export needs the pyarrow package; use a .csv file name.", parent=parent)
+        return
+    stream = QueryStream(executor, query, params, max_rows=None, timeout_ms=timeout_ms,
+                         chunk=QUERY_CHUNK_ROWS * 4, in_worker=True)
+    win = tk.Toplevel(parent); win.title("Export")
+    label = ttk.Label(win, text=f"Exporting {name} to {os.path.basename(path)} ...")
+    label.pack(padx=10, pady=8)
+    ttk.Button(win, text="Cancel", command=stream.cancel).pack(pady=(0, 8))
+
+    def tick():
+        if win.winfo_exists() and not stream.finished:
+            label.config(text=f"Exporting {name}: {stream.rows} rows, {stream.elapsed():.1f}s")
+            win.after(250, tick)
+
+    def done(res):
+        rows, cancelled = res
+        if win.winfo_exists():
+            win.destroy()
+        if cancelled:
+            messagebox.showinfo("Export", "Export cancelled.", parent=parent)
+        elif stream.finished:
+            rate = rows / stream.elapsed() if stream.elapsed() else 0.0
+            messagebox.showinfo("Export", f"Exported {rows} rows to {path}\n"
+                                f"{fmt}, {stream.elapsed():.1f}s ({rate:,.0f} rows/s)", parent=parent)
+
+    def failed(e):
+        if win.winfo_exists():
+            win.destroy()
+        messagebox.showerror("Export Error", str(e), parent=parent)
+    executor.submit(export_query, stream, path, fmt, callback=done, errback=failed)
+    tick()
+
+# ---------- PRE-BUILT REPORTS ----------
+# Queries-tab report name -> (SQL, tables it reads). The tables decide when a
+# cached result goes stale; benchmarks/bench_indexes.py times the same SQL.
+PREBUILT_REPORTS = {
+    "All medicines expiring within WARN_DAYS": (
+        "SELECT BatchNo, DrugName, ExpiryDate, Stock_quantity FROM MEDICINE WHERE ExpiryDate <= %s",
+        ("MEDICINE",)),
+    "Join: Orders with Customer & Total": (
+        """SELECT o.OrderID, o.OrderDate, c.Cname,
+                  IFNULL(SUM(od.Ordered_quantity * od.Price),0) AS OrderTotal
+           FROM `ORDER` o
+           LEFT JOIN CUSTOMER c ON o.Cid = c.Cid
+           LEFT JOIN ORDERED_DRUG od ON o.OrderID = od.OrderID
+           GROUP BY o.OrderID, o.OrderDate, c.Cname""",
+        ("ORDER", "CUSTOMER", "ORDERED_DRUG")),
+    "Aggregate: Stock per Supplier": (
+        """SELECT s.SupID, s.SupName, IFNULL(SUM(m.Stock_quantity),0) AS TotalStock
+           FROM SUPPLIER s
+           LEFT JOIN MEDICINE m ON s.SupID = m.SupID
+           GROUP BY s.SupID, s.SupName""",
+        ("SUPPLIER", "MEDICINE")),
+    "Aggregate: Stock value per Supplier & Type": (
+        """SELECT v.SupID, sp.SupName, v.Type, v.Batches, v.TotalQty, v.TotalValue
+           FROM STOCK_VALUE_SUMMARY v
+           LEFT JOIN SUPPLIER sp ON sp.SupID = v.SupID
+           ORDER BY v.SupID, v.Type""",
+        ("MEDICINE", "SUPPLIER")),   # the summary is maintained from MEDICINE
+    "Nested: Customers with insurance active (nested subquery)": (
+        """SELECT Cid, Cname FROM CUSTOMER
+           WHERE InsuranceID IN (
+                SELECT InsuranceID FROM INSURANCE WHERE EndDate >= CURDATE()
+           )""",
+        ("CUSTOMER", "INSURANCE")),
+    "Function: TotalStockValue()": (
+        "SELECT TotalStockValue() AS TotalStockValue",
+        ("MEDICINE",)),
+    "Function: IsExpired(batch, name) (example B002, Amoxicillin)": (
+        "SELECT IsExpired(%s,%s) AS IsExpired",
+        ("MEDICINE",)),
+    "IS_NOTIFIED: Who has seen which notifications": (
+        """SELECT i.EmpID, e.Ename, i.NID, n.Type, n.Message
+           FROM IS_NOTIFIED i
+           LEFT JOIN EMPLOYEE e ON i.EmpID = e.EmpID
+           LEFT JOIN NOTIFICATION n ON i.NID = n.NID
+           ORDER BY i.NID DESC""",
+        ("IS_NOTIFIED", "EMPLOYEE", "NOTIFICATION")),
+    "Insurance: All active insurances with customer details": (
+        """SELECT i.InsuranceID, i.StartDate, i.EndDate,
+                  COUNT(c.Cid) AS CustomerCount,
+                  GROUP_CONCAT(c.Cname SEPARATOR ', ') AS Customers
+           FROM INSURANCE i
+           LEFT JOIN CUSTOMER c ON i.InsuranceID = c.InsuranceID
+           GROUP BY i.InsuranceID, i.StartDate, i.EndDate
+           ORDER BY i.EndDate DESC""",
+        ("INSURANCE", "CUSTOMER")),
+}
+
+def report_query(name, warn_days):
+    """(SQL, params, tables read) for a pre-built report name, or None."""
+    if name not in PREBUILT_REPORTS:
+        return None
+    q, tables = PREBUILT_REPORTS[name]
+    params = ()
+    if name == "All medicines expiring within WARN_DAYS":
+        params = ((date.today() + timedelta(days=warn_days)).strftime("%Y-%m-%d"),)
+    elif name.startswith("Function: IsExpired"):
+        params = ("B002", "Amoxicillin")
+    return q, params, tables
+
+def fetch_report(name, warn_days, max_rows=QUERY_MAX_ROWS):
+    """Run a pre-built report to the end on the calling thread.
+
+    Returns (columns, rows, capped), or None if the name is unknown or the
+    query failed.
+    """
+    selected = report_query(name, warn_days)
+    if selected is None:
+        return None
+    q, params, _ = selected
+    stream = QueryStream(None, q, params, on_columns=lambda cols: None, on_rows=lambda rows: None,
+                         max_rows=max_rows, keep_rows=True, in_worker=True)
+    stream.run()
+    if not (stream.finished or stream.capped):
+        return None
+    return list(stream.columns), stream.kept, stream.capped
+
+# ---------- REPORT CACHE ----------
+class ReportCache:
+    """Results of pre-built reports, keyed on SQL + params + date.
+
+    Each entry remembers the TABLE_VERSION counters of the tables the report
+    reads, taken before it ran; it is served until any of them moves. Used
+    from the Tk thread only. Least recently used entries go past `size`.
+    """
+    def __init__(self, size=REPORT_CACHE_ENTRIES):
+        self.size = size
+        self._entries = OrderedDict()   # key -> (versions, columns, rows)
+        self.stats = {"hits": 0, "misses": 0, "stale": 0}
+
+    @staticmethod
+    def key(query, params):
+        # CURDATE() in a report makes its result date-dependent
+        return (query, tuple(params), date.today())
+
+    @staticmethod
+    def versions_of(tables, versions):
+        return tuple(versions.get(t) for t in tables) if versions else None
+
+    def get(self, key, versions):
+        entry = self._entries.get(key)
+        if entry is None or versions is None or None in versions:
+            self.stats["misses"] += 1
+            return None
+        if entry[0] != versions:
+            del self._entries[key]
+            self.stats["stale"] += 1
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry[1], entry[2]
+
+    def put(self, key, versions, columns, rows):
+        if versions is None or None in versions:
+            return
+        self._entries[key] = (versions, columns, rows)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def snapshot(self):
+        stats = dict(self.stats)
+        stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+REPORT_CACHE = ReportCache()
+
+# ---------- SERVICE CLIENT ----------
+class LocalBackend:
+    """The data operations PharmacyApp runs, executed in-process on DB_POOL."""
+    remote = False
+    next_id = staticmethod(ID_ALLOCATOR.next_id)
+    create_order = staticmethod(create_order)
+    add_ordered_drug = staticmethod(add_ordered_drug)
+    checkout_order = staticmethod(checkout_order)
+    generate_bill = staticmethod(generate_bill)
+    bill_unbilled_orders = staticmethod(bill_unbilled_orders)
+    add_prescription = staticmethod(add_prescription)
+    add_prescribed_drug = staticmethod(add_prescribed_drug)
+    expiry_counts = staticmethod(expiry_counts)
+    fetch_report = staticmethod(fetch_report)
+
+class ServiceClient:
+    """LocalBackend's operations, sent to pharmacy_service.py over HTTP/JSON.
+
+    Every method keeps the return contract of the local helper it mirrors;
+    errors reported by the service go through show_db_error and the call
+    returns None / False. Each thread keeps one keep-alive connection.
+    Call login() first: the service checks every call against the role of
+    the employee who logged in.
+    """
+    remote = True
+
+    def __init__(self, url, timeout=30):
+        parts = urllib.parse.urlsplit(url)
+        self.url = url.rstrip("/")
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.token = None
+        self._local = threading.local()
+
+    def _request(self, method, path, body=None):
+        payload = None if body is None else json.dumps(body, default=str).encode()
+        headers = {"Content-Type": "application/json"} if payload is not None else {}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        for attempt in range(2):
+            conn = getattr(self._local, "conn", None)
+            reused = conn is not None
+            if conn is None:
+                conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                # The service drops idle keep-alive connections. A request is resent once,
+                # on a fresh connection, only if the reused one was found closed: the send
+                # failed, or it closed without a single response byte. After a timeout or
+                # a partial response the request may have run, so it is never resent.
+                try:
+                    conn.request(method, self.prefix + path, payload, headers)
+                except (BrokenPipeError, ConnectionResetError):
+                    if not reused or attempt:
+                        raise
+                    self._close_conn()
+                    continue
+                try:
+                    resp = conn.getresponse()
+                except http.client.RemoteDisconnected:
+                    if not reused or attempt:
+                        raise
+                    self._close_conn()
+                    continue
+                data = resp.read()
+                return resp.status, json.loads(data) if data else {}
+            except (http.client.HTTPException, OSError):
+                self._close_conn()
+                raise
+
+    def _close_conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+        self._local.conn = None
+
+    def _call(self, method, path, body=None):
+        """The decoded JSON reply, or None after reporting the failure."""
+        try:
+            status, data = self._request(method, path, body)
+        except (http.client.HTTPException, OSError, ValueError) as e:
+            show_db_error("Service Error", f"{self.url}{path}: {e}")
+            return None
+        if status >= 400:
+            show_db_error(data.get("error", "Service Error"), data.get("detail", f"HTTP {status}"))
+            return None
+        return data
+
+    def login(self, emp_id, auth_key):
+        """Open a service session with the login window's credentials; True on success."""
+        data = self._call("POST", "/login", {"emp_id": emp_id, "auth_key": auth_key})
+        self.token = data and data["token"]
+        return bool(self.token)
+
+    def logout(self):
+        if self.token:
+            self._call("POST", "/logout")
+            self.token = None
+
+    def next_id(self, name):
+        data = self._call("POST", f"/ids/{name}")
+        return data and data["id"]
+
+    def create_order(self, order_id, cid, emp_id, order_date):
+        return self._call("POST", "/orders", {"order_id": order_id, "cid": cid, "emp_id": emp_id,
+                                              "order_date": order_date}) is not None
+
+    def add_ordered_drug(self, drug, order_id, batch, qty, price=None):
+        data = self._call("POST", f"/orders/{urllib.parse.quote(order_id, safe='')}/drugs",
+                          {"drug": drug, "batch": batch, "qty": qty, "price": price})
+        return data and [tuple(r) for r in data["rows"]]
+
+    def checkout_order(self, order_id, cid, emp_id, order_date, lines, bill_id):
+        data = self._call("POST", "/orders/checkout",
+                          {"order_id": order_id, "cid": cid, "emp_id": emp_id, "order_date": order_date,
+                           "lines": [list(line) for line in lines], "bill_id": bill_id})
+        return data and data["total"]
+
+    def generate_bill(self, bill_id, cid, order_id):
+        return self._call("POST", "/bills", {"bill_id": bill_id, "cid": cid, "order_id": order_id}) is not None
 
-def call_procedure(procname, params=()):
-    conn = get_connection()
-    if not conn:
-        return False
-    cur = conn.cursor()
-    try:
-        cur.callproc(procname, params)
-        conn.commit()
-        return True
-    except Error as e:
-        messagebox.showerror("Procedure Error", f"{procname}: {e}")
-        return False
-    finally:
-        cur.close()
-        conn.close()
+    def bill_unbilled_orders(self):
+        data = self._call("POST", "/bills/unbilled")
+        return data and (data["bills"], data["total"])
 
-def get_next_nid():
-    rows = run_select("SELECT NID FROM NOTIFICATION ORDER BY NID DESC LIMIT 1")
-    if not rows or rows[0][0] is None:
-        return "N001"
-    try:
-        last_nid = rows[0][0]
-        num = int(last_nid[1:]) + 1
-        return f"N{num:03d}"
-    except:
-        return "N001"
+    def add_prescription(self, pres_id, cid, doc_id, pres_date, order_id):
+        data = self._call("POST", "/prescriptions", {"pres_id": pres_id, "cid": cid, "doc_id": doc_id,
+                                                     "pres_date": pres_date, "order_id": order_id})
+        return data and data["nid"]
+
+    def add_prescribed_drug(self, drug_id, pres_id, qty):
+        return self._call("POST", f"/prescriptions/{urllib.parse.quote(pres_id, safe='')}/drugs",
+                          {"drug_id": drug_id, "qty": qty}) is not None
+
+    def expiry_counts(self, warn_days):
+        data = self._call("GET", f"/expiry?days={int(warn_days)}")
+        return data and (data["expired"], data["expiring"])
+
+    def fetch_report(self, name, warn_days, max_rows=QUERY_MAX_ROWS):
+        data = self._call("GET", f"/reports/{urllib.parse.quote(name, safe='')}"
+                                 f"?days={int(warn_days)}&max_rows={int(max_rows)}")
+        return data and (data["columns"], [tuple(r) for r in data["rows"]], data["capped"])
+
+def make_backend(emp_id=None, auth_key=None):
+    """ServiceClient logged in as emp_id when SERVICE_CONFIG names a service, else LocalBackend.
+
+    Returns None if the service refused the login.
+    """
+    if SERVICE_CONFIG["url"]:
+        client = ServiceClient(SERVICE_CONFIG["url"], SERVICE_CONFIG["timeout"])
+        return client if client.login(emp_id, auth_key) else None
+    return LocalBackend()
 
 # ---------- LOGIN WINDOW ----------
 class LoginWindow(tk.Tk):
@@ -238,10 +2673,7 @@ class LoginWindow(tk.Tk):
             self.user_role = "Admin"
             
             # Success - Admin login
-            self.withdraw()
-            app = PharmacyApp(self.logged_in_user, self.user_name, self.user_role)
-            app.mainloop()
-            self.destroy()
+            self.open_app(empid, auth)
             return
         
         # Query database for regular users
@@ -262,19 +2694,60 @@ class LoginWindow(tk.Tk):
                 return
             
             # Success
-            self.withdraw()
-            app = PharmacyApp(self.logged_in_user, self.user_name, self.user_role)
-            app.mainloop()
-            self.destroy()
+            self.open_app(empid, auth)
         else:
             self.status_label.config(text="❌ Invalid Username or Password")
             self.auth_entry.delete(0, 'end')
 
+    def open_app(self, empid, auth):
+        # With a service configured the same credentials open its session
+        backend = make_backend(empid, auth)
+        if backend is None:
+            self.status_label.config(text="❌ Service login failed")
+            return
+        self.withdraw()
+        app = PharmacyApp(self.logged_in_user, self.user_name, self.user_role, backend)
+        app.mainloop()
+        self.destroy()
+
 # ---------- MAIN APPLICATION ----------
 class PharmacyApp(tk.Tk):
     WARN_DAYS = 7
 
-    def __init__(self, empid, emp_name, role):
+    # Tab text -> builder method, in notebook order
+    TAB_BUILDERS = [
+        ("Dashboard", "create_dashboard_tab"),
+        ("Employees", "create_employee_tab"),
+        ("Suppliers", "create_supplier_tab"),
+        ("Medicines", "create_medicine_tab"),
+        ("Customers", "create_customer_tab"),
+        ("Orders", "create_order_tab"),
+        ("Ordered Drugs", "create_ordered_drug_tab"),
+        ("Bills", "create_bill_tab"),
+        ("Disposals", "create_disposal_tab"),
+        ("Prescriptions", "create_prescription_tab"),
+        ("Notifications", "create_notifications_tab"),
+        ("Queries", "create_queries_tab"),
+    ]
+
+    # Tab text -> (tables its rows come from, loader method)
+    TAB_TABLES = {
+        "Employees": (("EMPLOYEE",), "load_employees"),
+        "Suppliers": (("SUPPLIER",), "load_suppliers"),
+        "Medicines": (("MEDICINE",), "load_medicines"),
+        "Customers": (("CUSTOMER", "CUSTOMER_PHONE"), "load_customers"),
+        "Orders": (("ORDER",), "load_orders"),
+        "Ordered Drugs": (("ORDERED_DRUG",), "load_ordered_drugs"),
+        "Bills": (("BILL",), "load_bills"),
+        "Disposals": (("DISPOSAL",), "load_disposals"),
+        "Prescriptions": (("PRESCRIPTION",), "load_prescriptions"),
+        "Notifications": (("NOTIFICATION",), "load_notifications"),
+    }
+
+    SUPPLIER_QUERY = "SELECT SupID, SupName, License_no, Email, Phone, Street, City FROM SUPPLIER"
+    NOTIFICATION_QUERY = "SELECT NID, Type, Message FROM NOTIFICATION ORDER BY Seq DESC"
+
+    def __init__(self, empid, emp_name, role, backend=None):
         super().__init__()
         self.current_user = empid
         self.current_user_name = emp_name
@@ -291,6 +2764,11 @@ class PharmacyApp(tk.Tk):
         
         self.resizable(True, True)
         
+        # Background DB worker threads; results are applied on the Tk thread
+        self.db = DBExecutor(self, **EXECUTOR_CONFIG)
+        # Sales, billing, prescriptions, expiry and reports: in-process or via pharmacy_service.py
+        self.backend = backend or LocalBackend()
+        
         # Top bar with user info
         self.create_top_bar()
         
@@ -301,6 +2779,7 @@ class PharmacyApp(tk.Tk):
         self.create_tabs_based_on_role()
         
         self.refresh_all()
+        self.start_notification_feed()
         self.protocol("WM_DELETE_WINDOW", self.on_exit)
 
     def create_top_bar(self):
@@ -319,6 +2798,13 @@ class PharmacyApp(tk.Tk):
 
     def logout(self):
         if messagebox.askyesno("Logout", "Are you sure you want to logout?"):
+            if getattr(self, "_latency_after", None):
+                self.after_cancel(self._latency_after)
+            if getattr(self, "_feed_after", None):
+                self.after_cancel(self._feed_after)
+            self.db.shutdown()
+            if self.backend.remote:
+                self.backend.logout()
             self.destroy()
             login = LoginWindow()
             login.mainloop()
@@ -335,40 +2821,92 @@ class PharmacyApp(tk.Tk):
 
     def create_tabs_based_on_role(self):
         allowed_tabs = self.privileges["tabs"]
+        self._tab_names = {}        # notebook tab widget name -> tab text
+        self._tab_frames = {}       # tab text -> frame
+        self._built_tabs = set()
+        self._loaded_tabs = set()
+        self._tab_versions = {}     # tab text -> table versions its rows were loaded at
+        self._expiry_seen = None
+        self._unread = None         # current_user's unread notifications, shown on the tab
+        self._unread_seen = None    # (NOTIFICATION, IS_NOTIFIED) versions the count was read at
+        
+        for name, builder in self.TAB_BUILDERS:
+            if name in allowed_tabs:
+                frame = ttk.Frame(self.nb)
+                self.nb.add(frame, text=name)
+                self._tab_names[str(frame)] = name
+                self._tab_frames[name] = frame
         
-        if "Dashboard" in allowed_tabs:
-            self.create_dashboard_tab()
-        if "Employees" in allowed_tabs:
-            self.create_employee_tab()
-        if "Suppliers" in allowed_tabs:
-            self.create_supplier_tab()
-        if "Medicines" in allowed_tabs:
-            self.create_medicine_tab()
-        if "Customers" in allowed_tabs:
-            self.create_customer_tab()
-        if "Orders" in allowed_tabs:
-            self.create_order_tab()
-        if "Ordered Drugs" in allowed_tabs:
-            self.create_ordered_drug_tab()
-        if "Bills" in allowed_tabs:
-            self.create_bill_tab()
-        if "Disposals" in allowed_tabs:
-            self.create_disposal_tab()
-        if "Prescriptions" in allowed_tabs:
-            self.create_prescription_tab()
-        if "Notifications" in allowed_tabs:
-            self.create_notifications_tab()
-        if "Queries" in allowed_tabs:
-            self.create_queries_tab()
+        # Dashboard hosts the activity log, so it is always built up front.
+        # Every other tab is built and loaded the first time it is selected.
+        if "Dashboard" in self._tab_frames:
+            self.build_tab("Dashboard")
+        self.nb.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+
+    def build_tab(self, name):
+        if name in self._built_tabs:
+            return
+        builder = dict(self.TAB_BUILDERS)[name]
+        getattr(self, builder)(self._tab_frames[name])
+        self._built_tabs.add(name)
+
+    def _on_tab_changed(self, event=None):
+        name = self._tab_names.get(self.nb.select())
+        if name is None:
+            return
+        self.build_tab(name)
+        if name in self.TAB_TABLES and name not in self._loaded_tabs:
+            self._loaded_tabs.add(name)
+            self.db.submit(fetch_table_versions, key=f"versions:{name}",
+                           callback=lambda versions: self._load_tab(name, versions))
+
+    def _load_tab(self, name, versions):
+        tables, loader = self.TAB_TABLES[name]
+        self._tab_versions[name] = tuple(versions.get(t) for t in tables) if versions else None
+        return getattr(self, loader)()
+
+    def reload_tab(self, name):
+        """Reload a tab's rows if the user has opened it; otherwise it loads on first view."""
+        if name in self._loaded_tabs:
+            return getattr(self, self.TAB_TABLES[name][1])()
+
+    def _has_unread_badge(self):
+        # The hardcoded admin has no EMPLOYEE row, so nothing to count for it
+        return "Notifications" in self._tab_frames and self.current_user != "ADMIN"
+
+    def refresh_unread_badge(self):
+        if self._has_unread_badge():
+            self.db.submit(unread_count, self.current_user, key="unread_count", callback=self.set_unread_badge)
+
+    def set_unread_badge(self, count):
+        if count is None or not self._has_unread_badge():
+            return
+        self._unread = count
+        text = f"Notifications ({count})" if count else "Notifications"
+        self.nb.tab(self._tab_frames["Notifications"], text=text)
+
+    def bump_unread(self, delta):
+        """Adjust the badge for this till's own changes without re-reading the counter."""
+        if self._unread is not None:
+            self.set_unread_badge(max(self._unread + delta, 0))
 
     def on_exit(self):
         if messagebox.askokcancel("Quit", "Exit PharmacyApp?"):
+            if getattr(self, "query_stream", None):
+                self.query_stream.cancel()
+            if getattr(self, "_latency_after", None):
+                self.after_cancel(self._latency_after)
+            if getattr(self, "_feed_after", None):
+                self.after_cancel(self._feed_after)
+            self.db.shutdown()
+            if self.backend.remote:
+                self.backend.logout()
+            DB_POOL.close_all()
+            QUERY_METRICS.close()
             self.destroy()
 
     # ---------------- Dashboard ----------------
-    def create_dashboard_tab(self):
-        frame = ttk.Frame(self.nb)
-        self.nb.add(frame, text="Dashboard")
+    def create_dashboard_tab(self, frame):
         title = ttk.Label(frame, text="Dashboard", font=("Segoe UI", 16))
         title.pack(anchor="w", padx=10, pady=8)
         btn_frame = ttk.Frame(frame)
@@ -377,9 +2915,74 @@ class PharmacyApp(tk.Tk):
         ttk.Button(btn_frame, text=f"Check Expiry (now + {self.WARN_DAYS} days)", command=self.check_expiry_notifications).pack(side="left", padx=4)
         ttk.Button(btn_frame, text="Show Total Stock Value", command=self.show_total_stock_value).pack(side="left", padx=4)
         ttk.Button(btn_frame, text="Show Unseen Notifications Count", command=self.show_unseen_notifications_count).pack(side="left", padx=4)
+        ttk.Button(btn_frame, text="DB Pool Stats", command=self.show_pool_stats).pack(side="left", padx=4)
+        ttk.Button(btn_frame, text="Cache Stats", command=self.show_cache_stats).pack(side="left", padx=4)
+        expiry_frame = ttk.LabelFrame(frame, text="Expiry status")
+        expiry_frame.pack(fill="x", padx=10, pady=6)
+        self.expired_label = ttk.Label(expiry_frame, text="Expired: -")
+        self.expired_label.grid(row=0, column=0, sticky="w", padx=6, pady=3)
+        ttk.Button(expiry_frame, text="View", command=lambda: self.show_expiry_drilldown("expired")).grid(row=0, column=1, padx=6, pady=3)
+        self.expiring_label = ttk.Label(expiry_frame, text=f"Expiring within {self.WARN_DAYS} days: -")
+        self.expiring_label.grid(row=1, column=0, sticky="w", padx=6, pady=3)
+        ttk.Button(expiry_frame, text="View", command=lambda: self.show_expiry_drilldown("expiring")).grid(row=1, column=1, padx=6, pady=3)
+        self.create_latency_panel(frame)
         self.log = tk.Text(frame, height=10, state="disabled")
         self.log.pack(fill="both", expand=False, padx=10, pady=8)
 
+    def create_latency_panel(self, frame):
+        panel = ttk.LabelFrame(frame, text="DB latency on this till (ms, per statement)")
+        panel.pack(fill="both", expand=True, padx=10, pady=6)
+        bar = ttk.Frame(panel); bar.pack(fill="x", padx=6, pady=3)
+        ttk.Button(bar, text="Slow Queries...", command=self.show_slow_queries).pack(side="left", padx=4)
+        ttk.Button(bar, text="Reset", command=self.reset_latency_stats).pack(side="left", padx=4)
+        trace = QUERY_METRICS.trace_path or "off"
+        self.latency_label = ttk.Label(bar, text="", foreground="gray")
+        self.latency_label.pack(side="left", padx=8)
+        ttk.Label(bar, text=f"Trace: {trace}", foreground="gray").pack(side="right", padx=4)
+        cols = ("Statement", "Calls", "Errors", "Rows", "p50", "p95", "p99", "Max", "Connect", "Execute", "Fetch")
+        self.latency_tree = ttk.Treeview(panel, columns=cols, show="headings", height=7)
+        for c in cols:
+            self.latency_tree.heading(c, text=c)
+            self.latency_tree.column(c, width=460 if c == "Statement" else 62, anchor="w" if c == "Statement" else "e")
+        self.latency_tree.pack(fill="both", expand=True, padx=6, pady=(0, 6))
+        self.refresh_latency_panel()
+
+    def refresh_latency_panel(self):
+        """Repaint the latency table from QUERY_METRICS (memory only, no DB call) and reschedule."""
+        rows = QUERY_METRICS.snapshot()
+        self.latency_tree.delete(*self.latency_tree.get_children())
+        for r in rows:
+            self.latency_tree.insert("", "end", values=(
+                r["sql"], r["count"], r["errors"], f"{r['avg_rows']:.1f}",
+                f"{r['p50']:g}", f"{r['p95']:g}", f"{r['p99']:g}", f"{r['max']:.1f}",
+                f"{r['connect_ms']:.2f}", f"{r['execute_ms']:.2f}", f"{r['fetch_ms']:.2f}"))
+        calls = sum(r["count"] for r in rows)
+        self.latency_label.config(text=f"{calls} calls, {len(rows)} statements, "
+                                       f"{len(QUERY_METRICS.slow)} over {QUERY_METRICS.slow_ms} ms")
+        self._latency_after = self.after(METRICS_REFRESH_MS, self.refresh_latency_panel)
+
+    def reset_latency_stats(self):
+        QUERY_METRICS.reset()
+        self.after_cancel(self._latency_after)
+        self.refresh_latency_panel()
+        self.append_log("DB latency statistics reset")
+
+    def show_slow_queries(self):
+        dlg = tk.Toplevel(self); dlg.title(f"Slow Queries (over {QUERY_METRICS.slow_ms} ms)")
+        dlg.geometry("1000x420")
+        cols = ("Time", "Total ms", "Connect", "Execute", "Fetch", "Rows", "Error", "Statement", "Params")
+        tree = ttk.Treeview(dlg, columns=cols, show="headings")
+        for c in cols:
+            tree.heading(c, text=c)
+            tree.column(c, width=320 if c in ("Statement", "Params") else 70)
+        for e in reversed(QUERY_METRICS.slow):
+            tree.insert("", "end", values=(
+                datetime.fromtimestamp(e["ts"]).strftime("%H:%M:%S"), e["total_ms"], e["connect_ms"],
+                e["execute_ms"], e["fetch_ms"], e["rows"], e.get("error", ""), e["sql"], e.get("params", "")))
+        tree.pack(fill="both", expand=True, padx=8, pady=8)
+        if not QUERY_METRICS.slow:
+            ttk.Label(dlg, text="No slow statements recorded yet.").pack(pady=4)
+
     def append_log(self, text):
         if hasattr(self, 'log'):
             self.log.config(state="normal")
@@ -387,96 +2990,294 @@ class PharmacyApp(tk.Tk):
             self.log.see("end")
             self.log.config(state="disabled")
 
+    def _add_search_box(self, parent, index, label, on_pick, on_clear):
+        """Typeahead row: matches from `index` as you type; picking one calls on_pick(doc id)."""
+        row = ttk.Frame(parent); row.pack(fill="x", padx=8)
+        ttk.Label(row, text=label).pack(side="left", padx=4)
+        var = tk.StringVar()
+        entry = ttk.Entry(row, textvariable=var, width=40)
+        entry.pack(side="left", padx=4)
+        matches = tk.Listbox(parent, height=6)
+        found = []
+
+        def on_key(event=None):
+            found[:] = index.search(var.get())
+            matches.delete(0, "end")
+            for _, text in found:
+                matches.insert("end", text)
+            if found:
+                matches.pack(fill="x", padx=12, after=row)
+            else:
+                matches.pack_forget()
+
+        def pick(event=None):
+            sel = matches.curselection()
+            i = sel[0] if sel else 0
+            if i < len(found):
+                doc_id, text = found[i]
+                var.set(text)
+                matches.pack_forget()
+                on_pick(doc_id)
+
+        def clear():
+            var.set("")
+            matches.pack_forget()
+            on_clear()
+
+        entry.bind("<KeyRelease>", lambda e: on_key() if e.keysym not in ("Return", "Escape", "Down") else None)
+        entry.bind("<Return>", pick)
+        entry.bind("<Escape>", lambda e: clear())
+        entry.bind("<Down>", lambda e: (matches.focus_set(), matches.selection_set(0)) if found else None)
+        matches.bind("<Return>", pick)
+        matches.bind("<Double-Button-1>", pick)
+        ttk.Button(row, text="Clear", command=clear).pack(side="left", padx=4)
+
+    def import_csv_dialog(self, tables):
+        """Pick a CSV file and target table, then bulk-load it in the background."""
+        if not self.check_permission("add"):
+            messagebox.showwarning("Permission Denied", "You don't have permission to import data")
+            return
+        dlg = tk.Toplevel(self); dlg.title("Import CSV")
+        ttk.Label(dlg, text="Table").grid(row=0, column=0, sticky="w", padx=6, pady=4)
+        table_combo = ttk.Combobox(dlg, values=list(tables), state="readonly", width=20)
+        table_combo.set(tables[0])
+        table_combo.grid(row=0, column=1, sticky="w", padx=6, pady=4)
+        ttk.Label(dlg, text="File").grid(row=1, column=0, sticky="w", padx=6, pady=4)
+        path_var = tk.StringVar()
+        ttk.Entry(dlg, textvariable=path_var, width=50).grid(row=1, column=1, padx=6, pady=4)
+        ttk.Button(dlg, text="Browse...", command=lambda: path_var.set(
+            filedialog.askopenfilename(parent=dlg, filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]) or path_var.get())
+        ).grid(row=1, column=2, padx=6, pady=4)
+        upsert_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(dlg, text="Update rows whose key already exists", variable=upsert_var).grid(
+            row=2, column=1, sticky="w", padx=6, pady=4)
+        cols_label = ttk.Label(dlg, foreground="gray")
+        cols_label.grid(row=3, column=0, columnspan=3, sticky="w", padx=6, pady=4)
+        status = ttk.Label(dlg, text="")
+        status.grid(row=5, column=0, columnspan=3, sticky="w", padx=6, pady=4)
+
+        def show_columns(event=None):
+            spec = IMPORT_SPECS[table_combo.get()]
+            cols = [n + ("*" if req else "") for n, _, req in spec["columns"]]
+            cols_label.config(text="Header columns (* required): " + ", ".join(cols))
+        table_combo.bind("<<ComboboxSelected>>", show_columns)
+        show_columns()
+
+        def progress(summary):
+            self.db.call_in_ui(lambda: status.winfo_exists() and status.config(
+                text=f"{summary['read']} read, {summary['loaded']} loaded, {len(summary['errors'])} errors..."))
+
+        def done(summary):
+            if summary is None:
+                return
+            text = format_import_summary(summary)
+            self.append_log(text.split("\n")[0])
+            win = tk.Toplevel(self); win.title("Import Summary")
+            txt = tk.Text(win, width=100, height=25)
+            txt.pack(fill="both", expand=True, padx=6, pady=6)
+            txt.insert("end", text)
+            txt.config(state="disabled")
+            if summary["loaded"]:
+                for name, (tabs, _) in self.TAB_TABLES.items():
+                    if summary["table"] in tabs:
+                        self.reload_tab(name)
+
+        def start():
+            path = path_var.get().strip()
+            if not path:
+                messagebox.showwarning("Input", "Choose a CSV file", parent=dlg); return
+            table = table_combo.get()
+            status.config(text=f"Importing into {table} ...")
+            import_btn.config(state="disabled")
+            self.db.submit(import_csv, path, table, upsert_var.get(), progress,
+                           callback=lambda summary: (dlg.winfo_exists() and dlg.destroy(), done(summary)))
+        import_btn = ttk.Button(dlg, text="Import", command=start)
+        import_btn.grid(row=4, column=0, columnspan=3, pady=8)
+
+    def load_tree_async(self, key, tree, query, params=(), date_col=None, on_loaded=None):
+        """Fetch rows on a worker thread and repaint `tree` when they arrive.
+
+        Returns the DBFuture; a newer load with the same key cancels this one.
+        """
+        def fill(rows):
+            tree.delete(*tree.get_children())
+            for r in rows:
+                row = list(r)
+                if date_col is not None and row[date_col]:
+                    try:
+                        row[date_col] = row[date_col].strftime("%Y-%m-%d")
+                    except:
+                        pass
+                tree.insert("", "end", values=tuple(row))
+            if on_loaded:
+                on_loaded(rows)
+        return self.db.submit(run_select, query, params, key=key, callback=fill)
+
     def refresh_all(self):
-        self.append_log("Refreshing all lists...")
-        if hasattr(self, 'emp_tree'):
-            self.load_employees()
-        if hasattr(self, 'sup_tree'):
-            self.load_suppliers()
-        if hasattr(self, 'med_tree'):
-            self.load_medicines()
-        if hasattr(self, 'cust_tree'):
-            self.load_customers()
-        if hasattr(self, 'order_tree'):
-            self.load_orders()
-        if hasattr(self, 'od_tree'):
-            self.load_ordered_drugs()
-        if hasattr(self, 'bill_tree'):
-            self.load_bills()
-        if hasattr(self, 'disp_tree'):
-            self.load_disposals()
-        if hasattr(self, 'pres_tree'):
-            self.load_prescriptions()
-        if hasattr(self, 'notif_tree'):
-            self.load_notifications()
-        self.append_log("Refresh complete.")
-        self.check_expiry_notifications()
+        self.append_log("Checking for changes...")
+        self.db.submit(fetch_table_versions, key="versions:refresh", callback=self._refresh_changed)
+
+    def _refresh_changed(self, versions):
+        """Reload only opened tabs whose tables' versions moved since their last load."""
+        if versions:
+            REF_CACHE.sync_versions(versions)
+        futures = []
+        reloaded = []
+        for name in self._loaded_tabs:
+            if name == "Notifications" and self.notif_feed:
+                continue    # the feed appends new rows; Reload picks up other tills' deletes
+            tables, loader = self.TAB_TABLES[name]
+            current = tuple(versions.get(t) for t in tables) if versions else None
+            if current is None or current != self._tab_versions.get(name):
+                futures.append(self._load_tab(name, versions))
+                reloaded.append(name)
+        if reloaded:
+            self.append_log(f"Reloading changed tabs: {', '.join(sorted(reloaded))}")
+            self.db.when_all(futures, lambda: self.append_log("Refresh complete."))
+        else:
+            self.append_log("Refresh complete: nothing changed.")
+        # Expiry status depends on the date as well as on MEDICINE rows
+        expiry_key = (versions.get("MEDICINE") if versions else None, date.today())
+        if expiry_key[0] is None or expiry_key != self._expiry_seen:
+            self._expiry_seen = expiry_key
+            self.check_expiry_notifications()
+        unread_key = tuple(versions.get(t) for t in ("NOTIFICATION", "IS_NOTIFIED")) if versions else None
+        if unread_key is None or unread_key != self._unread_seen:
+            self._unread_seen = unread_key
+            self.refresh_unread_badge()
+
+    def _expiry_window(self):
+        today = date.today()
+        return today, today + timedelta(days=self.WARN_DAYS)
 
     def check_expiry_notifications(self):
-        rows = run_select("SELECT BatchNo, DrugName, ExpiryDate, Stock_quantity FROM MEDICINE")
-        if not rows:
-            self.append_log("No medicines found for expiry check.")
+        self.db.submit(self.backend.expiry_counts, self.WARN_DAYS, key="expiry_check",
+                       callback=self._show_expiry_counts)
+
+    def _show_expiry_counts(self, counts):
+        if not counts:
+            self.append_log("Expiry check returned no data.")
             return
-        today = date.today()
-        warn_until = today + timedelta(days=self.WARN_DAYS)
-        expired = []
-        expiring_soon = []
-        for batch, name, exp_dt, stock in rows:
-            if exp_dt is None:
-                continue
-            if isinstance(exp_dt, datetime):
-                exp = exp_dt.date()
-            elif isinstance(exp_dt, date):
-                exp = exp_dt
-            else:
-                try:
-                    exp = datetime.strptime(str(exp_dt), "%Y-%m-%d").date()
-                except:
-                    continue
-            if exp < today:
-                expired.append((batch, name, exp, stock))
-            elif today <= exp <= warn_until:
-                expiring_soon.append((batch, name, exp, stock))
+        expired, expiring = counts
+        if hasattr(self, 'expired_label'):
+            self.expired_label.config(text=f"Expired: {expired} batches",
+                                      foreground="red" if expired else "")
+            self.expiring_label.config(text=f"Expiring within {self.WARN_DAYS} days: {expiring} batches",
+                                       foreground="orange" if expiring else "")
         if expired:
-            msg_lines = [f"{b} | {n} | Expired on: {e} | Qty: {s}" for b, n, e, s in expired]
-            msg = "Expired medicines:\n" + "\n".join(msg_lines)
-            self.append_log(f"Expired medicines detected: {len(expired)}")
-            messagebox.showwarning("Expired Medicines", msg)
+            self.append_log(f"Expired medicines detected: {expired}")
         else:
             self.append_log("No expired medicines found.")
-        if expiring_soon:
-            msg_lines = [f"{b} | {n} | Expires: {e} | Qty: {s}" for b, n, e, s in expiring_soon]
-            msg = f"Medicines expiring within {self.WARN_DAYS} days:\n" + "\n".join(msg_lines)
-            self.append_log(f"Expiring soon medicines detected: {len(expiring_soon)}")
-            messagebox.showinfo("Expiring Soon", msg)
+        if expiring:
+            self.append_log(f"Expiring soon medicines detected: {expiring}")
         else:
             self.append_log(f"No medicines expiring within {self.WARN_DAYS} days.")
 
-    def show_total_stock_value(self):
-        cols, rows = run_select_with_cols("SELECT TotalStockValue()")
-        if rows:
-            val = rows[0][0]
-            messagebox.showinfo("Total Stock Value", f"Total stock value: {val}")
-            self.append_log(f"TotalStockValue() -> {val}")
+    def show_expiry_drilldown(self, bucket):
+        today, warn_until = self._expiry_window()
+        if bucket == "expired":
+            title, where, params = "Expired Medicines", "ExpiryDate < %s", (today,)
         else:
+            title = f"Medicines expiring within {self.WARN_DAYS} days"
+            where, params = "ExpiryDate >= %s AND ExpiryDate <= %s", (today, warn_until)
+        dlg = tk.Toplevel(self); dlg.title(title); dlg.geometry("720x420")
+        cols = ("ExpiryDate","BatchNo","DrugName","Stock_quantity","SupID")
+        # Keyset on (ExpiryDate, PK) walks idx_medicine_expiry in order
+        pager = PagedTable(dlg, self.db, "MEDICINE", cols, ("ExpiryDate","BatchNo","DrugName"),
+                           date_cols=("ExpiryDate",), where=where, params=params)
+        pager.frame.pack(fill="both", expand=True, padx=8, pady=6)
+        pager.reload()
+
+    def show_total_stock_value(self):
+        q = """SELECT v.SupID, sp.SupName, v.Type, v.TotalValue
+               FROM STOCK_VALUE_SUMMARY v
+               LEFT JOIN SUPPLIER sp ON sp.SupID = v.SupID
+               ORDER BY v.TotalValue DESC"""
+        self.db.submit(run_select, q, key="stock_value", callback=self._show_stock_value)
+
+    def _show_stock_value(self, rows):
+        if not rows:
             messagebox.showinfo("Total Stock Value", "No data or error computing stock value.")
+            return
+        total = sum(r[3] for r in rows)
+        by_supplier = {}
+        for supid, sname, _, value in rows:
+            label = f"{supid} - {sname}" if supid else "(no supplier)"
+            by_supplier[label] = by_supplier.get(label, 0) + value
+        lines = [f"{label}: {value}" for label, value in sorted(by_supplier.items(), key=lambda kv: -kv[1])]
+        lines += ["", "By type:"] + [f"{supid or '-'} / {mtype or '-'}: {value}" for supid, _, mtype, value in rows]
+        messagebox.showinfo("Total Stock Value", f"Total stock value: {total}\n\nBy supplier:\n" + "\n".join(lines))
+        self.append_log(f"Total stock value -> {total}")
+
+    def show_pool_stats(self):
+        st = DB_POOL.snapshot()
+        msg = (f"Open: {st['open']}/{st['size']} (idle {st['idle']})\n"
+               f"Hits: {st['hits']} | Misses: {st['misses']} | Hit rate: {st['hit_rate']:.0%}\n"
+               f"Waits: {st['waits']} | Avg wait: {st['avg_wait_ms']:.1f} ms | Timeouts: {st['timeouts']}\n"
+               f"Evicted: {st['evicted']} | Failed health checks: {st['failed_checks']}")
+        messagebox.showinfo("DB Pool Stats", msg)
+        self.append_log(f"Pool stats: hits={st['hits']} misses={st['misses']} waits={st['waits']} avg_wait={st['avg_wait_ms']:.1f}ms")
+
+    def show_cache_stats(self):
+        st = REF_CACHE.snapshot()
+        msg = (f"Datasets cached: {st['datasets']} ({st['rows']} rows)\n"
+               f"Hits: {st['hits']} | Misses: {st['misses']} | Hit rate: {st['hit_rate']:.0%}\n"
+               f"Loads: {st['loads']} | Key probes: {st['probes']} | Expired: {st['expired']} | Evicted: {st['evicted']} | Invalidated: {st['invalidated']}")
+        rc = REPORT_CACHE.snapshot()
+        msg += (f"\n\nReport results cached: {rc['entries']}\n"
+                f"Hits: {rc['hits']} | Misses: {rc['misses']} (stale {rc['stale']}) | Hit rate: {rc['hit_rate']:.0%}")
+        messagebox.showinfo("Cache Stats", msg)
+        self.append_log(f"Cache stats: hits={st['hits']} misses={st['misses']} hit_rate={st['hit_rate']:.0%}")
+
+    def _check_refs(self, checks, on_ok, parent=None, on_fail=None):
+        """Validate typed-in references [(dataset, key, what)] on a DB worker.
+
+        Warns about the first unknown one (then calls on_fail()), otherwise
+        calls on_ok(); both on the Tk thread.
+        """
+        checks = [c for c in checks if c[1]]
+
+        def first_unknown():
+            for dataset, key, what in checks:
+                if not REF_CACHE.lookup(dataset, key):
+                    return what, key
+            return None
+
+        def done(bad):
+            if bad:
+                messagebox.showerror("Invalid Reference", f"{bad[0]} '{bad[1]}' does not exist.", parent=parent)
+                if on_fail:
+                    on_fail()
+            else:
+                on_ok()
+        if not checks:
+            on_ok()
+        else:
+            self.db.submit(first_unknown, callback=done)
 
     def show_unseen_notifications_count(self):
-        rows = run_select("SELECT COUNT(*) FROM NOTIFICATION n WHERE NOT EXISTS (SELECT 1 FROM IS_NOTIFIED i WHERE i.NID = n.NID)")
-        if rows:
-            cnt = rows[0][0]
-            messagebox.showinfo("Unseen Notifications", f"Unseen notifications: {cnt}")
+        if self.current_user != "ADMIN":
+            def show_own(cnt):
+                if cnt is None:
+                    return
+                self.set_unread_badge(cnt)
+                messagebox.showinfo("Unseen Notifications", f"Unseen by you ({self.current_user}): {cnt}")
+                self.append_log(f"Unseen notifications for {self.current_user}: {cnt}")
+            self.db.submit(unread_count, self.current_user, key="unseen_count", callback=show_own)
+            return
+        # Admin is not an employee: count notifications nobody has seen
+        def show_all(rows):
+            cnt = rows[0][0] if rows else 0
+            messagebox.showinfo("Unseen Notifications", f"Unseen by anyone: {cnt}")
             self.append_log(f"Unseen notifications: {cnt}")
-        else:
-            messagebox.showinfo("Unseen Notifications", "0")
-            self.append_log("Unseen notifications: 0")
+        self.db.submit(run_select, "SELECT COUNT(*) FROM NOTIFICATION n WHERE NOT EXISTS (SELECT 1 FROM IS_NOTIFIED i WHERE i.NID = n.NID)",
+                       key="unseen_count", callback=show_all)
 
     # ---------------- Employee ----------------
-    def create_employee_tab(self):
-        frame = ttk.Frame(self.nb)
-        self.nb.add(frame, text="Employees")
+    def create_employee_tab(self, frame):
         top = ttk.Frame(frame); top.pack(fill="x", padx=8, pady=6)
         ttk.Button(top, text="Reload", command=self.load_employees).pack(side="left", padx=4)
+        ttk.Button(top, text="Export...", command=lambda: export_dialog(self, self.db, self._employee_query(), name="employee")).pack(side="left", padx=4)
         
         if self.check_permission("add") and self.privileges["can_manage_employees"]:
             ttk.Button(top, text="Add Employee", command=self.add_employee_dialog).pack(side="left", padx=4)
@@ -498,21 +3299,13 @@ class PharmacyApp(tk.Tk):
             self.emp_tree.column(c, width=110)
         self.emp_tree.pack(fill="both", expand=True, padx=8, pady=6)
 
-    def load_employees(self):
+    def _employee_query(self):
         if self.privileges["can_view_salary"]:
-            rows = run_select("SELECT EmpID, Ename, DOB, Role, Salary, Phone, AuthKey FROM EMPLOYEE")
-        else:
-            rows = run_select("SELECT EmpID, Ename, DOB, Role, Phone FROM EMPLOYEE")
-        
-        self.emp_tree.delete(*self.emp_tree.get_children())
-        for r in rows:
-            row = list(r)
-            if row[2]:
-                try:
-                    row[2] = row[2].strftime("%Y-%m-%d")
-                except:
-                    pass
-            self.emp_tree.insert("", "end", values=tuple(row))
+            return "SELECT EmpID, Ename, DOB, Role, Salary, Phone, AuthKey FROM EMPLOYEE"
+        return "SELECT EmpID, Ename, DOB, Role, Phone FROM EMPLOYEE"
+
+    def load_employees(self):
+        return self.load_tree_async("employees", self.emp_tree, self._employee_query(), date_col=2)
 
     def add_employee_dialog(self):
         if not self.check_permission("add") or not self.privileges["can_manage_employees"]:
@@ -595,14 +3388,14 @@ class PharmacyApp(tk.Tk):
                 messagebox.showinfo("Deleted","Employee deleted"); self.load_employees()
 
     # ---------------- Supplier ----------------
-    def create_supplier_tab(self):
-        frame = ttk.Frame(self.nb)
-        self.nb.add(frame, text="Suppliers")
+    def create_supplier_tab(self, frame):
         top = ttk.Frame(frame); top.pack(fill="x", padx=8, pady=6)
         ttk.Button(top, text="Reload", command=self.load_suppliers).pack(side="left", padx=4)
+        ttk.Button(top, text="Export...", command=lambda: export_dialog(self, self.db, self.SUPPLIER_QUERY, name="supplier")).pack(side="left", padx=4)
         
         if self.check_permission("add"):
             ttk.Button(top, text="Add Supplier", command=self.add_supplier_dialog).pack(side="left", padx=4)
+            ttk.Button(top, text="Import CSV", command=lambda: self.import_csv_dialog(("SUPPLIER", "SUPPLIES_TO"))).pack(side="left", padx=4)
         if self.check_permission("delete"):
             ttk.Button(top, text="Delete Selected", command=self.delete_supplier_selected).pack(side="left", padx=4)
         if self.check_permission("edit"):
@@ -616,10 +3409,7 @@ class PharmacyApp(tk.Tk):
         self.sup_tree.pack(fill="both", expand=True, padx=8, pady=6)
 
     def load_suppliers(self):
-        rows = run_select("SELECT SupID, SupName, License_no, Email, Phone, Street, City FROM SUPPLIER")
-        self.sup_tree.delete(*self.sup_tree.get_children())
-        for r in rows:
-            self.sup_tree.insert("", "end", values=r)
+        return self.load_tree_async("suppliers", self.sup_tree, self.SUPPLIER_QUERY)
 
     def add_supplier_dialog(self):
         if not self.check_permission("add"):
@@ -689,37 +3479,30 @@ class PharmacyApp(tk.Tk):
                 messagebox.showinfo("Deleted","Supplier deleted"); self.load_suppliers()
 
     # ---------------- Medicine ----------------
-    def create_medicine_tab(self):
-        frame = ttk.Frame(self.nb)
-        self.nb.add(frame, text="Medicines")
+    def create_medicine_tab(self, frame):
         top = ttk.Frame(frame); top.pack(fill="x", padx=8, pady=6)
         ttk.Button(top, text="Reload", command=self.load_medicines).pack(side="left", padx=4)
         
         if self.check_permission("add"):
             ttk.Button(top, text="Add Medicine", command=self.add_medicine_dialog).pack(side="left", padx=4)
+            ttk.Button(top, text="Import CSV", command=lambda: self.import_csv_dialog(("MEDICINE", "SUPPLIES_TO"))).pack(side="left", padx=4)
         if self.check_permission("edit"):
             ttk.Button(top, text="Update Selected", command=self.update_medicine_dialog).pack(side="left", padx=4)
         if self.check_permission("delete"):
             ttk.Button(top, text="Delete Selected", command=self.delete_medicine_selected).pack(side="left", padx=4)
         
+        self._add_search_box(frame, DRUG_INDEX, "Search drug:",
+                             lambda drug: self.med_pager.set_filter("DrugName = %s", (drug,)),
+                             lambda: self.med_pager.set_filter())
         cols = ("BatchNo","DrugName","ExpiryDate","Stock_quantity","Price","SupID","Type")
-        self.med_tree = ttk.Treeview(frame, columns=cols, show="headings", height=16)
-        for c in cols:
-            self.med_tree.heading(c, text=c)
-            self.med_tree.column(c, width=120)
-        self.med_tree.pack(fill="both", expand=True, padx=8, pady=6)
+        self.med_pager = PagedTable(frame, self.db, "MEDICINE", cols, ("BatchNo","DrugName"),
+                                    date_cols=("ExpiryDate",), height=16)
+        self.med_tree = self.med_pager.tree
+        self.med_pager.frame.pack(fill="both", expand=True, padx=8, pady=6)
 
     def load_medicines(self):
-        rows = run_select("SELECT BatchNo, DrugName, ExpiryDate, Stock_quantity, Price, SupID, Type FROM MEDICINE")
-        self.med_tree.delete(*self.med_tree.get_children())
-        for r in rows:
-            row = list(r)
-            if row[2]:
-                try:
-                    row[2] = row[2].strftime("%Y-%m-%d")
-                except:
-                    pass
-            self.med_tree.insert("", "end", values=tuple(row))
+        self.db.submit(DRUG_INDEX.refresh, key="index:drugs")
+        return self.med_pager.reload()
 
     def add_medicine_dialog(self):
         if not self.check_permission("add"):
@@ -745,13 +3528,15 @@ class PharmacyApp(tk.Tk):
             mtype = entries["Type"].get().strip() or None
             if not batch or not name:
                 messagebox.showwarning("Input","BatchNo & DrugName required"); return
-            ok = call_procedure('AddMedicine', (batch, name, exp, stock, price, supid, mtype))
-            if ok:
-                messagebox.showinfo("Added","Medicine added via procedure"); dlg.destroy(); self.load_medicines()
-            else:
-                q = "INSERT INTO MEDICINE (BatchNo, DrugName, ExpiryDate, Stock_quantity, Price, SupID, Type) VALUES (%s,%s,%s,%s,%s,%s,%s)"
-                if run_query(q, (batch, name, exp, stock, price, supid, mtype)):
-                    messagebox.showinfo("Added","Medicine added"); dlg.destroy(); self.load_medicines()
+            def add():
+                ok = call_procedure('AddMedicine', (batch, name, exp, stock, price, supid, mtype))
+                if ok:
+                    messagebox.showinfo("Added","Medicine added via procedure"); dlg.destroy(); self.load_medicines()
+                else:
+                    q = "INSERT INTO MEDICINE (BatchNo, DrugName, ExpiryDate, Stock_quantity, Price, SupID, Type) VALUES (%s,%s,%s,%s,%s,%s,%s)"
+                    if run_query(q, (batch, name, exp, stock, price, supid, mtype)):
+                        messagebox.showinfo("Added","Medicine added"); dlg.destroy(); self.load_medicines()
+            self._check_refs([("suppliers", supid, "Supplier")], add)
         ttk.Button(dlg, text="Add", command=submit).grid(row=len(labels), column=0, columnspan=2, pady=8)
 
     def update_medicine_dialog(self):
@@ -763,40 +3548,102 @@ class PharmacyApp(tk.Tk):
         if not sel:
             messagebox.showwarning("Select","Select medicine to update"); return
         vals = self.med_tree.item(sel[0])['values']
-        batch, drug = vals[0], vals[1]
+        batch, drug = str(vals[0]), str(vals[1])
+        # Fresh, with the RowVersion this edit is made against
+        self.db.submit(fetch_medicine, batch, drug, key="medicine:edit",
+                       callback=lambda base: self._medicine_edit_form(batch, drug, base))
+
+    def _medicine_edit_form(self, batch, drug, base):
+        if base is None:
+            messagebox.showwarning("Update", f"{drug} ({batch}) no longer exists"); self.load_medicines(); return
         dlg = tk.Toplevel(self); dlg.title(f"Update Medicine {drug} ({batch})")
         labels = ["ExpiryDate (YYYY-MM-DD)","Stock_quantity","Price","SupID","Type"]
+        columns = dict(zip(labels, ("ExpiryDate", "Stock_quantity", "Price", "SupID", "Type")))
         entries={}
-        current = {"Expiry": vals[2], "Stock": vals[3], "Price": vals[4], "SupID": vals[5], "Type": vals[6]}
         for i,l in enumerate(labels):
             ttk.Label(dlg, text=l).grid(row=i, column=0, sticky="w", padx=6, pady=4)
             e = ttk.Entry(dlg)
-            if l.startswith("Expiry") and current["Expiry"]:
-                e.insert(0, current["Expiry"])
-            elif l.startswith("Stock"):
-                e.insert(0, current["Stock"] or "")
-            elif l.startswith("Price"):
-                e.insert(0, current["Price"] or "")
-            elif l=="SupID":
-                e.insert(0, current["SupID"] or "")
-            elif l=="Type":
-                e.insert(0, current["Type"] or "")
             e.grid(row=i, column=1, padx=6, pady=4)
             entries[l]=e
-        def submit():
+        note = ttk.Label(dlg, text="", foreground="gray")
+        note.grid(row=len(labels), column=0, columnspan=2, padx=6)
+
+        def fill(row):
+            base.update(row)
+            for l, e in entries.items():
+                v = row[columns[l]]
+                e.delete(0, "end")
+                e.insert(0, "" if v is None else str(v))
+            note.config(text=f"Stock changes are applied relative to {row['Stock_quantity'] or 0}; "
+                             "sales made meanwhile are kept")
+        fill(base)
+
+        def read_form():
             exp = entries["ExpiryDate (YYYY-MM-DD)"].get().strip() or None
             try:
+                exp = datetime.strptime(exp, "%Y-%m-%d").date() if exp else None
                 stock = int(entries["Stock_quantity"].get().strip() or 0)
-                price = float(entries["Price"].get().strip() or 0.0)
-            except:
-                messagebox.showwarning("Input","Stock int, price numeric"); return
-            supid = entries["SupID"].get().strip() or None
-            mtype = entries["Type"].get().strip() or None
-            q = """UPDATE MEDICINE SET ExpiryDate=%s, Stock_quantity=%s, Price=%s, SupID=%s, Type=%s
-                   WHERE BatchNo=%s AND DrugName=%s"""
-            if run_query(q, (exp, stock, price, supid, mtype, batch, drug)):
-                messagebox.showinfo("Updated","Medicine updated"); dlg.destroy(); self.load_medicines()
-        ttk.Button(dlg, text="Update", command=submit).grid(row=len(labels), column=0, columnspan=2, pady=8)
+                price_s = entries["Price"].get().strip()
+                price = Decimal(price_s).quantize(Decimal("0.01")) if price_s else None
+            except (ValueError, InvalidOperation):
+                messagebox.showwarning("Input","Expiry YYYY-MM-DD, stock int, price numeric", parent=dlg); return None
+            return {"ExpiryDate": exp, "Stock_quantity": stock, "Price": price,
+                    "SupID": entries["SupID"].get().strip() or None,
+                    "Type": entries["Type"].get().strip() or None}
+
+        def describe(old, new):
+            return "\n".join(f"  {c}: {old[c]} -> {new[c]}" for c in ("Stock_quantity",) + MEDICINE_EDIT_FIELDS
+                             if old[c] != new[c]) or "  (nothing)"
+
+        def submit(form=None):
+            form = form or read_form()
+            if form is None:
+                return
+            # Only what the user changed is written, and stock as a delta
+            changes = {c: form[c] for c in MEDICINE_EDIT_FIELDS if form[c] != base[c]}
+            delta = form["Stock_quantity"] - (base["Stock_quantity"] or 0)
+            if not changes and not delta:
+                dlg.destroy(); return
+            update_btn.config(state="disabled")
+            self.db.submit(update_medicine, batch, drug, base["RowVersion"], changes, delta,
+                           callback=lambda res: done(res, form, changes, delta))
+
+        def done(res, form, changes, delta):
+            update_btn.config(state="normal")
+            if res is None:
+                return
+            status, current = res
+            if status == "ok":
+                self.append_log(f"Medicine {drug} ({batch}) updated"
+                                + (f", stock {delta:+d} -> {current['Stock_quantity']}" if delta else ""))
+                messagebox.showinfo("Updated","Medicine updated", parent=dlg); dlg.destroy(); self.load_medicines()
+            elif status == "missing":
+                messagebox.showerror("Update", f"{drug} ({batch}) was deleted by another user", parent=dlg)
+                dlg.destroy(); self.load_medicines()
+            elif status == "negative":
+                messagebox.showerror("Not Enough Stock",
+                                     f"Stock is now {current['Stock_quantity']} after sales at other tills; "
+                                     f"a change of {delta:+d} would take it below zero.\n"
+                                     "The form now shows the current values.", parent=dlg)
+                fill(current)
+            else:
+                theirs = describe(base, current)
+                if messagebox.askyesno("Edit Conflict",
+                                       f"Another user changed {drug} ({batch}) while you were editing:\n{theirs}\n\n"
+                                       f"Your changes:\n{describe(base, form)}\n\n"
+                                       "Apply your changes on top of theirs?\n"
+                                       "(No shows the current values so you can edit again.)", parent=dlg):
+                    # Keep the user's edits and stock delta, re-based on the newer version
+                    retry = dict(current)
+                    retry.update(changes)
+                    retry["Stock_quantity"] = (current["Stock_quantity"] or 0) + delta
+                    base.update(current)
+                    submit(retry)
+                else:
+                    fill(current)
+
+        update_btn = ttk.Button(dlg, text="Update", command=submit)
+        update_btn.grid(row=len(labels) + 1, column=0, columnspan=2, pady=8)
 
     def delete_medicine_selected(self):
         if not self.check_permission("delete"):
@@ -813,37 +3660,29 @@ class PharmacyApp(tk.Tk):
                 messagebox.showinfo("Deleted","Medicine deleted"); self.load_medicines()
 
     # ---------------- Customer ----------------
-    def create_customer_tab(self):
-        frame = ttk.Frame(self.nb)
-        self.nb.add(frame, text="Customers")
+    def create_customer_tab(self, frame):
         top = ttk.Frame(frame); top.pack(fill="x", padx=8, pady=6)
         ttk.Button(top, text="Reload", command=self.load_customers).pack(side="left", padx=4)
         
         if self.check_permission("add"):
             ttk.Button(top, text="Add Customer", command=self.add_customer_dialog).pack(side="left", padx=4)
+            ttk.Button(top, text="Import CSV", command=lambda: self.import_csv_dialog(("CUSTOMER",))).pack(side="left", padx=4)
         if self.check_permission("delete"):
             ttk.Button(top, text="Delete Selected", command=self.delete_customer_selected).pack(side="left", padx=4)
         if self.check_permission("edit"):
             ttk.Button(top, text="Update Selected", command=self.update_customer_dialog).pack(side="left", padx=4)
         
+        self._add_search_box(frame, CUSTOMER_INDEX, "Search name / phone:",
+                             lambda cid: self.cust_pager.set_filter("Cid = %s", (cid,)),
+                             lambda: self.cust_pager.set_filter())
         cols = ("Cid","Cname","DOB","InsuranceID","Street","DNO","City","Phone")
-        self.cust_tree = ttk.Treeview(frame, columns=cols, show="headings", height=14)
-        for c in cols:
-            self.cust_tree.heading(c, text=c)
-            self.cust_tree.column(c, width=120)
-        self.cust_tree.pack(fill="both", expand=True, padx=8, pady=6)
+        self.cust_pager = PagedTable(frame, self.db, "CUSTOMER", cols, ("Cid",), date_cols=("DOB",))
+        self.cust_tree = self.cust_pager.tree
+        self.cust_pager.frame.pack(fill="both", expand=True, padx=8, pady=6)
 
     def load_customers(self):
-        rows = run_select("SELECT Cid, Cname, DOB, InsuranceID, Street, DNO, City, Phone FROM CUSTOMER")
-        self.cust_tree.delete(*self.cust_tree.get_children())
-        for r in rows:
-            row=list(r)
-            if row[2]:
-                try:
-                    row[2] = row[2].strftime("%Y-%m-%d")
-                except:
-                    pass
-            self.cust_tree.insert("", "end", values=tuple(row))
+        self.db.submit(CUSTOMER_INDEX.refresh, key="index:customers")
+        return self.cust_pager.reload()
 
     def add_customer_dialog(self):
         if not self.check_permission("add"):
@@ -861,10 +3700,12 @@ class PharmacyApp(tk.Tk):
             vals = tuple(entries[l].get().strip() or None for l in labels)
             if not vals[0] or not vals[1]:
                 messagebox.showwarning("Input","Cid & Cname required"); return
-            q = """INSERT INTO CUSTOMER (Cid, Cname, DOB, InsuranceID, Street, DNO, City, Phone)
-                   VALUES (%s,%s,%s,%s,%s,%s,%s,%s)"""
-            if run_query(q, vals):
-                messagebox.showinfo("Added","Customer added"); dlg.destroy(); self.load_customers()
+            def add():
+                q = """INSERT INTO CUSTOMER (Cid, Cname, DOB, InsuranceID, Street, DNO, City, Phone)
+                       VALUES (%s,%s,%s,%s,%s,%s,%s,%s)"""
+                if run_query(q, vals):
+                    messagebox.showinfo("Added","Customer added"); dlg.destroy(); self.load_customers()
+            self._check_refs([("insurance", vals[3], "InsuranceID")], add)
         ttk.Button(dlg, text="Add", command=submit).grid(row=len(labels), column=0, columnspan=2, pady=8)
 
     def update_customer_dialog(self):
@@ -915,35 +3756,24 @@ class PharmacyApp(tk.Tk):
                 messagebox.showinfo("Deleted","Customer deleted"); self.load_customers()
 
     # ---------------- Order ----------------
-    def create_order_tab(self):
-        frame = ttk.Frame(self.nb)
-        self.nb.add(frame, text="Orders")
+    def create_order_tab(self, frame):
         top = ttk.Frame(frame); top.pack(fill="x", padx=8, pady=6)
         ttk.Button(top, text="Reload", command=self.load_orders).pack(side="left", padx=4)
         
         if self.check_permission("add"):
             ttk.Button(top, text="Add Order", command=self.add_order_dialog).pack(side="left", padx=4)
+            ttk.Button(top, text="Checkout (multi-line)", command=self.checkout_dialog).pack(side="left", padx=4)
         if self.check_permission("delete"):
             ttk.Button(top, text="Delete Selected", command=self.delete_order_selected).pack(side="left", padx=4)
         
         cols = ("OrderID","Cid","EmpID","OrderDate")
-        self.order_tree = ttk.Treeview(frame, columns=cols, show="headings", height=12)
-        for c in cols:
-            self.order_tree.heading(c, text=c)
-            self.order_tree.column(c, width=120)
-        self.order_tree.pack(fill="both", expand=True, padx=8, pady=6)
+        self.order_pager = PagedTable(frame, self.db, "ORDER", cols, ("OrderID",),
+                                      date_cols=("OrderDate",), height=12)
+        self.order_tree = self.order_pager.tree
+        self.order_pager.frame.pack(fill="both", expand=True, padx=8, pady=6)
 
     def load_orders(self):
-        rows = run_select("SELECT OrderID, Cid, EmpID, OrderDate FROM `ORDER`")
-        self.order_tree.delete(*self.order_tree.get_children())
-        for r in rows:
-            row = list(r)
-            if row[3]:
-                try:
-                    row[3] = row[3].strftime("%Y-%m-%d")
-                except:
-                    pass
-            self.order_tree.insert("", "end", values=tuple(row))
+        return self.order_pager.reload()
 
     def add_order_dialog(self):
         if not self.check_permission("add"):
@@ -951,28 +3781,145 @@ class PharmacyApp(tk.Tk):
             return
         
         dlg = tk.Toplevel(self); dlg.title("Add Order")
-        labels = ["OrderID","Cid","EmpID","OrderDate (YYYY-MM-DD)"]
+        labels = ["OrderID (blank = auto)","Cid","EmpID","OrderDate (YYYY-MM-DD)"]
         entries = {}
         for i,l in enumerate(labels):
             ttk.Label(dlg, text=l).grid(row=i, column=0, sticky="w", padx=6, pady=4)
             e = ttk.Entry(dlg); e.grid(row=i, column=1, padx=6, pady=4)
             entries[l] = e
         def submit():
-            oid = entries["OrderID"].get().strip()
+            oid = entries["OrderID (blank = auto)"].get().strip()
             cid = entries["Cid"].get().strip() or None
             emp = entries["EmpID"].get().strip() or None
             od = entries["OrderDate (YYYY-MM-DD)"].get().strip() or None
-            if not oid or not cid:
-                messagebox.showwarning("Input","OrderID and Cid required"); return
-            ok = call_procedure('CreateOrder', (oid, cid, emp, od))
-            if ok:
-                messagebox.showinfo("Added","Order created via procedure"); dlg.destroy(); self.load_orders()
-            else:
-                q = "INSERT INTO `ORDER` (OrderID, Cid, EmpID, OrderDate) VALUES (%s,%s,%s,%s)"
-                if run_query(q, (oid, cid, emp, od)):
+            if not cid:
+                messagebox.showwarning("Input","Cid required"); return
+            def add(oid=oid):
+                oid = oid or self.backend.next_id("ORDER")
+                if not oid:
+                    return
+                if self.backend.create_order(oid, cid, emp, od):
                     messagebox.showinfo("Added","Order added"); dlg.destroy(); self.load_orders()
+            self._check_refs([("customers", cid, "Customer"), ("employees", emp, "Employee")], add)
         ttk.Button(dlg, text="Add", command=submit).grid(row=len(labels), column=0, columnspan=2, pady=8)
 
+    def checkout_dialog(self):
+        if not self.check_permission("add"):
+            messagebox.showwarning("Permission Denied", "You don't have permission to add orders")
+            return
+        
+        dlg = tk.Toplevel(self); dlg.title("Checkout")
+        head = ttk.Frame(dlg); head.pack(fill="x", padx=8, pady=6)
+        labels = ["OrderID (blank = auto)","Cid","EmpID","OrderDate (YYYY-MM-DD)","BillID (blank = auto)"]
+        defaults = {"EmpID": "" if self.current_user == "ADMIN" else self.current_user,
+                    "OrderDate (YYYY-MM-DD)": date.today().strftime("%Y-%m-%d")}
+        entries = {}
+        for i,l in enumerate(labels):
+            ttk.Label(head, text=l).grid(row=i, column=0, sticky="w", padx=6, pady=3)
+            e = ttk.Entry(head); e.grid(row=i, column=1, padx=6, pady=3)
+            e.insert(0, defaults.get(l, ""))
+            entries[l] = e
+
+        line_frame = ttk.LabelFrame(dlg, text="Add line"); line_frame.pack(fill="x", padx=8, pady=6)
+        line_labels = ["DrugName","BatchNo","Qty","Price"]
+        ttk.Label(line_frame, text="Leave BatchNo blank to pick batches first-expiry-first-out; blank Price uses the batch price.",
+                  foreground="gray").grid(row=1, column=0, columnspan=9, sticky="w", padx=4)
+        line_entries = {}
+        for i,l in enumerate(line_labels):
+            ttk.Label(line_frame, text=l).grid(row=0, column=2*i, padx=4, pady=4)
+            e = ttk.Entry(line_frame, width=14); e.grid(row=0, column=2*i+1, padx=4, pady=4)
+            line_entries[l] = e
+
+        cols = ("DrugName","BatchNo","Qty","Price","LineTotal")
+        basket = ttk.Treeview(dlg, columns=cols, show="headings", height=8)
+        for c in cols:
+            basket.heading(c, text=c)
+            basket.column(c, width=110)
+        basket.pack(fill="both", expand=True, padx=8, pady=6)
+        total_label = ttk.Label(dlg, text="Total: 0.00", font=("Segoe UI", 11, "bold"))
+        total_label.pack(anchor="e", padx=12)
+        lines = {}   # (drug, batch) -> [qty, price]
+
+        def repaint():
+            basket.delete(*basket.get_children())
+            for (drug, batch), (qty, price) in lines.items():
+                basket.insert("", "end", iid=f"{drug}\x00{batch}",
+                              values=(drug, batch or "(FEFO)", qty, "" if price is None else price,
+                                      "" if price is None else f"{qty * price:.2f}"))
+            priced = sum(q * p for q, p in lines.values() if p is not None)
+            unpriced = any(p is None for _, p in lines.values())
+            total_label.config(text=f"Total: {priced:.2f}" + (" + batch-priced lines" if unpriced else ""))
+
+        def add_line():
+            drug = line_entries["DrugName"].get().strip()
+            batch = line_entries["BatchNo"].get().strip()
+            try:
+                qty = int(line_entries["Qty"].get().strip() or 0)
+                price_s = line_entries["Price"].get().strip()
+                price = float(price_s) if price_s else None
+            except:
+                messagebox.showwarning("Input","Quantity int, price numeric", parent=dlg); return
+            if not drug or qty <= 0:
+                messagebox.showwarning("Input","DrugName and a positive Qty required", parent=dlg); return
+            def add():
+                # Same batch twice would violate the ORDERED_DRUG key, so merge it
+                if (drug, batch) in lines:
+                    lines[(drug, batch)][0] += qty
+                    if lines[(drug, batch)][1] is None:
+                        lines[(drug, batch)][1] = price
+                else:
+                    lines[(drug, batch)] = [qty, price]
+                for e in line_entries.values():
+                    e.delete(0, "end")
+                line_entries["DrugName"].focus()
+                repaint()
+            self._check_refs([("medicines", drug, "Drug")], add, dlg)
+
+        def remove_line():
+            for iid in basket.selection():
+                lines.pop(tuple(iid.split("\x00", 1)), None)
+            repaint()
+
+        btns = ttk.Frame(dlg); btns.pack(fill="x", padx=8, pady=6)
+        ttk.Button(line_frame, text="Add Line", command=add_line).grid(row=0, column=8, padx=6)
+        ttk.Button(btns, text="Remove Selected Line", command=remove_line).pack(side="left", padx=4)
+
+        def submit():
+            oid = entries["OrderID (blank = auto)"].get().strip()
+            cid = entries["Cid"].get().strip() or None
+            emp = entries["EmpID"].get().strip() or None
+            od = entries["OrderDate (YYYY-MM-DD)"].get().strip() or None
+            bid = entries["BillID (blank = auto)"].get().strip()
+            try:
+                bid = int(bid) if bid else None
+            except:
+                messagebox.showwarning("Input","BillID must be integer", parent=dlg); return
+            if not cid:
+                messagebox.showwarning("Input","Cid required", parent=dlg); return
+            if not lines:
+                messagebox.showwarning("Input","Add at least one line", parent=dlg); return
+            def checkout(oid=oid, bid=bid):
+                oid = oid or self.backend.next_id("ORDER")
+                bid = bid or self.backend.next_id("BILL")
+                if not oid or not bid:
+                    checkout_btn.config(state="normal"); return
+                basket_lines = [(drug, batch, qty, price) for (drug, batch), (qty, price) in lines.items()]
+                def done(total):
+                    if total is None:
+                        checkout_btn.config(state="normal"); return
+                    messagebox.showinfo("Checkout", f"Order {oid} billed (BillID {bid}), {len(basket_lines)} lines, total {total:.2f}")
+                    self.append_log(f"Checkout {oid}: {len(basket_lines)} lines, bill {bid}, total {total:.2f}")
+                    dlg.destroy()
+                    self.load_orders()
+                    for tab in ("Ordered Drugs", "Bills", "Medicines"):
+                        self.reload_tab(tab)
+                self.db.submit(self.backend.checkout_order, oid, cid, emp, od, basket_lines, bid, callback=done)
+            checkout_btn.config(state="disabled")
+            self._check_refs([("customers", cid, "Customer"), ("employees", emp, "Employee")], checkout, dlg,
+                             on_fail=lambda: checkout_btn.config(state="normal"))
+        checkout_btn = ttk.Button(btns, text="Checkout", command=submit)
+        checkout_btn.pack(side="right", padx=4)
+
     def delete_order_selected(self):
         if not self.check_permission("delete"):
             messagebox.showwarning("Permission Denied", "You don't have permission to delete orders")
@@ -987,9 +3934,7 @@ class PharmacyApp(tk.Tk):
                 messagebox.showinfo("Deleted","Order deleted"); self.load_orders()
 
     # ---------------- Ordered Drug ----------------
-    def create_ordered_drug_tab(self):
-        frame = ttk.Frame(self.nb)
-        self.nb.add(frame, text="Ordered Drugs")
+    def create_ordered_drug_tab(self, frame):
         top = ttk.Frame(frame); top.pack(fill="x", padx=8, pady=6)
         ttk.Button(top, text="Reload", command=self.load_ordered_drugs).pack(side="left", padx=4)
         
@@ -999,17 +3944,12 @@ class PharmacyApp(tk.Tk):
             ttk.Button(top, text="Delete Selected", command=self.delete_ordered_drug_selected).pack(side="left", padx=4)
         
         cols = ("DrugName","OrderID","BatchNo","Ordered_quantity","Price")
-        self.od_tree = ttk.Treeview(frame, columns=cols, show="headings", height=14)
-        for c in cols:
-            self.od_tree.heading(c, text=c)
-            self.od_tree.column(c, width=120)
-        self.od_tree.pack(fill="both", expand=True, padx=8, pady=6)
+        self.od_pager = PagedTable(frame, self.db, "ORDERED_DRUG", cols, ("DrugName","OrderID","BatchNo"))
+        self.od_tree = self.od_pager.tree
+        self.od_pager.frame.pack(fill="both", expand=True, padx=8, pady=6)
 
     def load_ordered_drugs(self):
-        rows = run_select("SELECT DrugName, OrderID, BatchNo, Ordered_quantity, Price FROM ORDERED_DRUG")
-        self.od_tree.delete(*self.od_tree.get_children())
-        for r in rows:
-            self.od_tree.insert("", "end", values=r)
+        return self.od_pager.reload()
 
     def add_ordered_drug_dialog(self):
         if not self.check_permission("add"):
@@ -1017,7 +3957,7 @@ class PharmacyApp(tk.Tk):
             return
         
         dlg = tk.Toplevel(self); dlg.title("Add Ordered Drug")
-        labels = ["DrugName","OrderID","BatchNo","Ordered_quantity","Price"]
+        labels = ["DrugName","OrderID","BatchNo (blank = FEFO)","Ordered_quantity","Price (blank = batch price)"]
         entries = {}
         for i,l in enumerate(labels):
             ttk.Label(dlg, text=l).grid(row=i, column=0, sticky="w", padx=6, pady=4)
@@ -1026,18 +3966,27 @@ class PharmacyApp(tk.Tk):
         def submit():
             drug = entries["DrugName"].get().strip()
             oid = entries["OrderID"].get().strip()
-            batch = entries["BatchNo"].get().strip()
+            batch = entries["BatchNo (blank = FEFO)"].get().strip()
             try:
                 qty = int(entries["Ordered_quantity"].get().strip() or 0)
-                price = float(entries["Price"].get().strip() or 0.0)
+                price_s = entries["Price (blank = batch price)"].get().strip()
+                price = float(price_s) if price_s else None
             except:
                 messagebox.showwarning("Input","Quantity int, price numeric"); return
-            if not drug or not oid or not batch:
-                messagebox.showwarning("Input","DrugName, OrderID and BatchNo required"); return
-            ok = run_query("INSERT INTO ORDERED_DRUG (DrugName, OrderID, BatchNo, Ordered_quantity, Price) VALUES (%s,%s,%s,%s,%s)",
-                           (drug, oid, batch, qty, price))
-            if ok:
-                messagebox.showinfo("Added","Ordered drug added (triggers updated stock if ok)"); dlg.destroy(); self.load_ordered_drugs(); self.load_medicines()
+            if not drug or not oid:
+                messagebox.showwarning("Input","DrugName and OrderID required"); return
+            def done(rows):
+                if rows is None:
+                    return
+                if batch:
+                    messagebox.showinfo("Added","Ordered drug added (triggers updated stock if ok)"); dlg.destroy(); self.load_ordered_drugs(); self.reload_tab("Medicines")
+                    return
+                picked = ", ".join(f"{r[2]} x{r[3]}" for r in rows)
+                messagebox.showinfo("Added", f"Sold {qty} {drug} from: {picked}")
+                self.append_log(f"FEFO sale on {oid}: {drug} -> {picked}")
+                dlg.destroy(); self.load_ordered_drugs(); self.reload_tab("Medicines")
+            self._check_refs([("medicines", drug, "Drug"), ("orders", oid, "OrderID")],
+                             lambda: self.db.submit(self.backend.add_ordered_drug, drug, oid, batch, qty, price, callback=done))
         ttk.Button(dlg, text="Add", command=submit).grid(row=len(labels), column=0, columnspan=2, pady=8)
 
     def delete_ordered_drug_selected(self):
@@ -1052,32 +4001,26 @@ class PharmacyApp(tk.Tk):
         drug, oid, batch = vals[0], vals[1], vals[2]
         if messagebox.askyesno("Confirm", f"Delete ordered drug {drug} in order {oid}?"):
             if run_query("DELETE FROM ORDERED_DRUG WHERE DrugName=%s AND OrderID=%s AND BatchNo=%s", (drug, oid, batch)):
-                messagebox.showinfo("Deleted","Ordered drug deleted"); self.load_ordered_drugs(); self.load_medicines()
+                messagebox.showinfo("Deleted","Ordered drug deleted"); self.load_ordered_drugs(); self.reload_tab("Medicines")
 
     # ---------------- Bill ----------------
-    def create_bill_tab(self):
-        frame = ttk.Frame(self.nb)
-        self.nb.add(frame, text="Bills")
+    def create_bill_tab(self, frame):
         top = ttk.Frame(frame); top.pack(fill="x", padx=8, pady=6)
         ttk.Button(top, text="Reload", command=self.load_bills).pack(side="left", padx=4)
         
         if self.check_permission("add"):
             ttk.Button(top, text="Generate Bill (call proc)", command=self.generate_bill_dialog).pack(side="left", padx=4)
+            ttk.Button(top, text="Bill All Unbilled Orders", command=self.bill_all_unbilled).pack(side="left", padx=4)
         if self.check_permission("delete"):
             ttk.Button(top, text="Delete Selected", command=self.delete_bill_selected).pack(side="left", padx=4)
         
         cols = ("BillID","Cid","OrderID","Total_amt","Custpay","Inspay")
-        self.bill_tree = ttk.Treeview(frame, columns=cols, show="headings", height=14)
-        for c in cols:
-            self.bill_tree.heading(c, text=c)
-            self.bill_tree.column(c, width=110)
-        self.bill_tree.pack(fill="both", expand=True, padx=8, pady=6)
+        self.bill_pager = PagedTable(frame, self.db, "BILL", cols, ("BillID",), col_width=110)
+        self.bill_tree = self.bill_pager.tree
+        self.bill_pager.frame.pack(fill="both", expand=True, padx=8, pady=6)
 
     def load_bills(self):
-        rows = run_select("SELECT BillID, Cid, OrderID, Total_amt, Custpay, Inspay FROM BILL")
-        self.bill_tree.delete(*self.bill_tree.get_children())
-        for r in rows:
-            self.bill_tree.insert("", "end", values=r)
+        return self.bill_pager.reload()
 
     def generate_bill_dialog(self):
         if not self.check_permission("add"):
@@ -1085,26 +4028,46 @@ class PharmacyApp(tk.Tk):
             return
         
         dlg = tk.Toplevel(self); dlg.title("Generate Bill")
-        labels = ["BillID (int)","Cid","OrderID"]
+        labels = ["BillID (blank = auto)","Cid","OrderID"]
         entries={}
         for i,l in enumerate(labels):
             ttk.Label(dlg, text=l).grid(row=i, column=0, sticky="w", padx=6, pady=4)
             e=ttk.Entry(dlg); e.grid(row=i, column=1, padx=6, pady=4)
             entries[l]=e
         def submit():
+            bid = entries["BillID (blank = auto)"].get().strip()
             try:
-                bid = int(entries["BillID (int)"].get().strip())
+                bid = int(bid) if bid else None
             except:
                 messagebox.showwarning("Input","BillID must be integer"); return
             cid = entries["Cid"].get().strip() or None
             oid = entries["OrderID"].get().strip() or None
             if not cid or not oid:
                 messagebox.showwarning("Input","Cid and OrderID required"); return
-            ok = call_procedure('GenerateBill', (bid, cid, oid))
-            if ok:
-                messagebox.showinfo("Bill Generated","Bill generated via procedure"); dlg.destroy(); self.load_bills()
+            def generate(bid=bid):
+                bid = bid or self.backend.next_id("BILL")
+                if not bid:
+                    return
+                if self.backend.generate_bill(bid, cid, oid):
+                    messagebox.showinfo("Bill Generated","Bill generated via procedure"); dlg.destroy(); self.load_bills()
+            self._check_refs([("customers", cid, "Customer"), ("orders", oid, "OrderID")], generate)
         ttk.Button(dlg, text="Generate", command=submit).grid(row=len(labels), column=0, columnspan=2, pady=8)
 
+    def bill_all_unbilled(self):
+        if not self.check_permission("add"):
+            messagebox.showwarning("Permission Denied", "You don't have permission to generate bills")
+            return
+        if not messagebox.askyesno("Bill All", "Generate bills for every order that has items but no bill yet?"):
+            return
+        def done(res):
+            if res is None:
+                return
+            bills, total = res
+            messagebox.showinfo("Bulk Billing", f"Bills generated: {bills}\nTotal billed: {total}")
+            self.append_log(f"Bulk billing: {bills} bills, total {total}")
+            self.load_bills()
+        self.db.submit(self.backend.bill_unbilled_orders, key="bulk_billing", callback=done)
+
     def delete_bill_selected(self):
         if not self.check_permission("delete"):
             messagebox.showwarning("Permission Denied", "You don't have permission to delete bills")
@@ -1119,9 +4082,7 @@ class PharmacyApp(tk.Tk):
                 messagebox.showinfo("Deleted","Bill deleted"); self.load_bills()
 
     # ---------------- Disposal ----------------
-    def create_disposal_tab(self):
-        frame = ttk.Frame(self.nb)
-        self.nb.add(frame, text="Disposals")
+    def create_disposal_tab(self, frame):
         top = ttk.Frame(frame); top.pack(fill="x", padx=8, pady=6)
         ttk.Button(top, text="Reload", command=self.load_disposals).pack(side="left", padx=4)
         
@@ -1131,17 +4092,12 @@ class PharmacyApp(tk.Tk):
             ttk.Button(top, text="Delete Selected", command=self.delete_disposal_selected).pack(side="left", padx=4)
         
         cols = ("BatchNo","DrugName","Dis_Qty","Company","Emp_ID","Expired","Damaged","Trial_Batch","Contaminated")
-        self.disp_tree = ttk.Treeview(frame, columns=cols, show="headings", height=14)
-        for c in cols:
-            self.disp_tree.heading(c, text=c)
-            self.disp_tree.column(c, width=110)
-        self.disp_tree.pack(fill="both", expand=True, padx=8, pady=6)
+        self.disp_pager = PagedTable(frame, self.db, "DISPOSAL", cols, ("BatchNo","DrugName"), col_width=110)
+        self.disp_tree = self.disp_pager.tree
+        self.disp_pager.frame.pack(fill="both", expand=True, padx=8, pady=6)
 
     def load_disposals(self):
-        rows = run_select("SELECT BatchNo, DrugName, Dis_Qty, Company, Emp_ID, Expired, Damaged, Trial_Batch, Contaminated FROM DISPOSAL")
-        self.disp_tree.delete(*self.disp_tree.get_children())
-        for r in rows:
-            self.disp_tree.insert("", "end", values=r)
+        return self.disp_pager.reload()
 
     def add_disposal_dialog(self):
         if not self.check_permission("add"):
@@ -1173,10 +4129,12 @@ class PharmacyApp(tk.Tk):
                 messagebox.showwarning("Input","Flags must be 0 or 1"); return
             if not batch or not drug:
                 messagebox.showwarning("Input","BatchNo & DrugName required"); return
-            q = """INSERT INTO DISPOSAL (BatchNo, DrugName, Dis_Qty, Company, Emp_ID, Expired, Damaged, Trial_Batch, Contaminated)
-                   VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)"""
-            if run_query(q, (batch, drug, qty, comp, emp, expired, damaged, trial, cont)):
-                messagebox.showinfo("Added","Disposal recorded"); dlg.destroy(); self.load_disposals()
+            def add():
+                q = """INSERT INTO DISPOSAL (BatchNo, DrugName, Dis_Qty, Company, Emp_ID, Expired, Damaged, Trial_Batch, Contaminated)
+                       VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)"""
+                if run_query(q, (batch, drug, qty, comp, emp, expired, damaged, trial, cont)):
+                    messagebox.showinfo("Added","Disposal recorded"); dlg.destroy(); self.load_disposals()
+            self._check_refs([("employees", emp, "Employee")], add)
         ttk.Button(dlg, text="Add", command=submit).grid(row=len(labels), column=0, columnspan=2, pady=8)
 
     def delete_disposal_selected(self):
@@ -1193,9 +4151,7 @@ class PharmacyApp(tk.Tk):
                 messagebox.showinfo("Deleted","Disposal deleted"); self.load_disposals()
 
     # ---------------- Prescription ----------------
-    def create_prescription_tab(self):
-        frame = ttk.Frame(self.nb)
-        self.nb.add(frame, text="Prescriptions")
+    def create_prescription_tab(self, frame):
 
         top = ttk.Frame(frame); top.pack(fill="x", padx=8, pady=6)
         ttk.Button(top, text="Reload", command=self.load_prescriptions).pack(side="left", padx=4)
@@ -1208,11 +4164,10 @@ class PharmacyApp(tk.Tk):
             ttk.Button(top, text="Add Drug to Prescription", command=self.add_prescribed_drug_dialog).pack(side="left", padx=4)
 
         cols = ("PresID","Cid","DocID","PresDate","OrderID")
-        self.pres_tree = ttk.Treeview(frame, columns=cols, show="headings", height=10)
-        for c in cols:
-            self.pres_tree.heading(c, text=c)
-            self.pres_tree.column(c, width=120)
-        self.pres_tree.pack(fill="both", expand=True, padx=8, pady=6)
+        self.pres_pager = PagedTable(frame, self.db, "PRESCRIPTION", cols, ("PresID",),
+                                     date_cols=("PresDate",), height=10)
+        self.pres_tree = self.pres_pager.tree
+        self.pres_pager.frame.pack(fill="both", expand=True, padx=8, pady=6)
 
         ttk.Label(frame, text="Drugs in Selected Prescription:").pack(pady=(10,2))
         cols2 = ("DrugID","PresID","Quantity")
@@ -1223,32 +4178,17 @@ class PharmacyApp(tk.Tk):
         self.pd_tree.pack(fill="both", expand=True, padx=8, pady=6)
 
         self.pres_tree.bind("<<TreeviewSelect>>", self.load_prescribed_drugs_for_selected)
-        self.load_prescriptions()
 
     def load_prescriptions(self):
-        rows = run_select("SELECT PresID, Cid, DocID, PresDate, OrderID FROM PRESCRIPTION")
-        self.pres_tree.delete(*self.pres_tree.get_children())
-        for r in rows:
-            row = list(r)
-            if row[3]:
-                try:
-                    if isinstance(row[3], datetime):
-                        row[3] = row[3].strftime("%Y-%m-%d")
-                    elif isinstance(row[3], date):
-                        row[3] = row[3].strftime("%Y-%m-%d")
-                except:
-                    pass
-            self.pres_tree.insert("", "end", values=tuple(row))
+        return self.pres_pager.reload()
 
     def load_prescribed_drugs_for_selected(self, event=None):
         sel = self.pres_tree.selection()
         if not sel:
             return
         pres_id = self.pres_tree.item(sel[0])['values'][0]
-        rows = run_select("SELECT DrugID, PresID, Quantity FROM PRESCRIBED_DRUG WHERE PresID=%s", (pres_id,))
-        self.pd_tree.delete(*self.pd_tree.get_children())
-        for r in rows:
-            self.pd_tree.insert("", "end", values=r)
+        return self.load_tree_async("prescribed_drugs", self.pd_tree,
+                                    "SELECT DrugID, PresID, Quantity FROM PRESCRIBED_DRUG WHERE PresID=%s", (pres_id,))
 
     def add_prescription_dialog(self):
         if not self.check_permission("add"):
@@ -1258,19 +4198,12 @@ class PharmacyApp(tk.Tk):
         dlg = tk.Toplevel(self); dlg.title("Add Prescription")
         dlg.geometry("500x300")
         
-        cust_rows = run_select("SELECT Cid, Cname FROM CUSTOMER")
-        available_customers = [f"{row[0]} - {row[1]}" for row in cust_rows]
-        customer_ids = [str(row[0]) for row in cust_rows]
-        
-        order_rows = run_select("SELECT OrderID FROM `ORDER`")
-        available_orders = [str(row[0]) for row in order_rows]
-        
-        ttk.Label(dlg, text="PresID").grid(row=0, column=0, sticky="w", padx=6, pady=4)
+        ttk.Label(dlg, text="PresID (blank = auto)").grid(row=0, column=0, sticky="w", padx=6, pady=4)
         presid_entry = ttk.Entry(dlg)
         presid_entry.grid(row=0, column=1, padx=6, pady=4, sticky="ew")
         
         ttk.Label(dlg, text="Customer (Cid) *required").grid(row=1, column=0, sticky="w", padx=6, pady=4)
-        cid_combo = ttk.Combobox(dlg, values=available_customers, state="readonly", width=30)
+        cid_combo = ttk.Combobox(dlg, values=[], state="readonly", width=30)
         cid_combo.grid(row=1, column=1, padx=6, pady=4, sticky="ew")
         
         ttk.Label(dlg, text="DocID (optional)").grid(row=2, column=0, sticky="w", padx=6, pady=4)
@@ -1282,10 +4215,17 @@ class PharmacyApp(tk.Tk):
         presdate_entry.grid(row=3, column=1, padx=6, pady=4, sticky="ew")
         
         ttk.Label(dlg, text="OrderID (optional)").grid(row=4, column=0, sticky="w", padx=6, pady=4)
-        order_combo = ttk.Combobox(dlg, values=[""] + available_orders, state="normal")
+        order_combo = ttk.Combobox(dlg, values=[""], state="normal")
         order_combo.grid(row=4, column=1, padx=6, pady=4, sticky="ew")
         
         dlg.columnconfigure(1, weight=1)
+
+        # Fill the dropdowns in the background so the dialog opens immediately
+        self.db.submit(REF_CACHE.get, "customers", key="pres_dlg_customers",
+                       callback=lambda rows: cid_combo.config(values=[f"{row[0]} - {row[1]}" for row in rows]))
+        self.db.submit(run_select, "SELECT OrderID FROM `ORDER` ORDER BY OrderDate DESC, OrderID DESC LIMIT 200",
+                       key="pres_dlg_orders",
+                       callback=lambda rows: order_combo.config(values=[""] + [str(row[0]) for row in rows]))
         
         def submit():
             pid = presid_entry.get().strip()
@@ -1296,30 +4236,22 @@ class PharmacyApp(tk.Tk):
             doc = docid_entry.get().strip() or None
             pdate = presdate_entry.get().strip() or None
             oid = order_combo.get().strip() or None
-            if not pid or not cid:
-                messagebox.showwarning("Input","PresID and Cid required"); return
-            check_cust = run_select("SELECT 1 FROM CUSTOMER WHERE Cid=%s", (cid,))
-            if not check_cust:
-                messagebox.showerror("Invalid Customer", f"Customer ID '{cid}' does not exist in CUSTOMER table.\nPlease select a valid customer.")
-                return
-            if oid:
-                check_order = run_select("SELECT 1 FROM `ORDER` WHERE OrderID=%s", (oid,))
-                if not check_order:
-                    messagebox.showerror("Invalid Order", f"OrderID '{oid}' does not exist in ORDER table.\nPlease select a valid OrderID or leave empty.")
+            if not cid:
+                messagebox.showwarning("Input","Cid required"); return
+            def add(pid=pid):
+                pid = pid or self.backend.next_id("PRESCRIPTION")
+                if not pid:
                     return
-            q = "INSERT INTO PRESCRIPTION (PresID, Cid, DocID, PresDate, OrderID) VALUES (%s,%s,%s,%s,%s)"
-            if run_query(q,(pid,cid,doc,pdate,oid)):
-                try:
-                    nid = get_next_nid()
-                    msg = f"New prescription {pid} for customer {cid}"
-                    run_query("INSERT INTO NOTIFICATION (NID, Type, Message) VALUES (%s,%s,%s)",
-                              (nid, "Prescription", msg))
-                    self.append_log(f"Notification created for prescription {pid} (NID {nid})")
-                except Exception as e:
-                    self.append_log(f"Failed to create notification for prescription {pid}: {e}")
-                messagebox.showinfo("Added","Prescription added"); dlg.destroy(); self.load_prescriptions()
-                if hasattr(self, "notif_tree"):
-                    self.load_notifications()
+                nid = self.backend.add_prescription(pid, cid, doc, pdate, oid)
+                if nid is not None:
+                    if nid:
+                        self.append_log(f"Notification created for prescription {pid} (NID {nid})")
+                    else:
+                        self.append_log(f"Failed to create notification for prescription {pid}")
+                    messagebox.showinfo("Added","Prescription added"); dlg.destroy(); self.load_prescriptions()
+                    if nid:
+                        self.poll_notifications_now()
+            self._check_refs([("customers", cid, "Customer"), ("orders", oid, "OrderID")], add)
         
         ttk.Button(dlg,text="Add Prescription",command=submit).grid(row=5,column=0,columnspan=2,pady=15)
 
@@ -1352,7 +4284,7 @@ class PharmacyApp(tk.Tk):
                 messagebox.showwarning("Duplicate Entry", f"Drug {did} is already in prescription {pid}")
                 return
     
-            if run_query("INSERT INTO PRESCRIBED_DRUG (DrugID, PresID, Quantity) VALUES (%s,%s,%s)",(did,pid,qty)):
+            if self.backend.add_prescribed_drug(did, pid, qty):
                 messagebox.showinfo("Added","Drug added to prescription"); dlg.destroy()
             # Force reload by simulating selection
             if self.pres_tree.selection():
@@ -1379,11 +4311,10 @@ class PharmacyApp(tk.Tk):
             self.pd_tree.delete(*self.pd_tree.get_children())
 
     # ---------------- Notifications ----------------
-    def create_notifications_tab(self):
-        frame = ttk.Frame(self.nb)
-        self.nb.add(frame, text="Notifications")
+    def create_notifications_tab(self, frame):
         top = ttk.Frame(frame); top.pack(fill="x", padx=8, pady=6)
         ttk.Button(top, text="Reload", command=self.load_notifications).pack(side="left", padx=4)
+        ttk.Button(top, text="Export...", command=lambda: export_dialog(self, self.db, self.NOTIFICATION_QUERY, name="notification")).pack(side="left", padx=4)
         
         if self.check_permission("add"):
             ttk.Button(top, text="Add Notification", command=self.add_notification_dialog).pack(side="left", padx=4)
@@ -1403,17 +4334,110 @@ class PharmacyApp(tk.Tk):
         self.mark_emp_entry = ttk.Entry(bottom, width=10)
         self.mark_emp_entry.pack(side="left")
         ttk.Button(bottom, text="Mark Selected Seen", command=self.mark_selected_notification_seen_dialog).pack(side="left", padx=6)
-
-        self.load_notifications()
+        if self.current_user != "ADMIN":
+            self.mark_emp_entry.insert(0, self.current_user)
+            ttk.Button(bottom, text="Mark All Seen", command=self.mark_all_notifications_seen).pack(side="left", padx=6)
 
     def load_notifications(self):
         if not hasattr(self, 'notif_tree'):
             return
-        rows = run_select("SELECT NID, Type, Message FROM NOTIFICATION ORDER BY NID DESC")
-        self.notif_tree.delete(*self.notif_tree.get_children())
-        for r in rows:
-            self.notif_tree.insert("", "end", values=r)
-        self.append_log(f"Loaded {len(rows)} notifications")
+
+        def loaded(rows):
+            self._notif_nids = {r[0] for r in rows}
+            self.append_log(f"Loaded {len(rows)} notifications")
+        return self.load_tree_async("notifications", self.notif_tree, self.NOTIFICATION_QUERY, on_loaded=loaded)
+
+    def start_notification_feed(self):
+        """Poll NOTIFICATION for rows after the last Seq seen, backing off while nothing arrives."""
+        self.notif_feed = None
+        self._feed_after = None
+        if "Notifications" not in self._tab_frames:
+            return
+        cfg = NOTIFICATION_FEED_CONFIG
+        self.notif_feed = NotificationFeed(cfg["batch"], cfg["gap_wait_s"])
+        self._feed_delay = cfg["poll_ms"]
+        self._feed_busy = False
+        self._feed_again = False
+        self._feed_failing = False
+        self._notif_nids = set()
+        self.poll_notifications()
+
+    def poll_notifications(self):
+        self._feed_after = None
+        if not self.notif_feed:
+            return
+        if self._feed_busy:
+            self._feed_again = True
+            return
+        self._feed_busy = True
+        feed = self.notif_feed
+        if feed.last is None:
+            self.db.submit(feed.start, callback=self._feed_started, errback=self._feed_failed)
+        else:
+            self.db.submit(feed.fetch, feed.last, callback=self._feed_fetched, errback=self._feed_failed)
+
+    def poll_notifications_now(self):
+        """Poll right away at the fastest interval, e.g. after this till added a notification."""
+        if not self.notif_feed:
+            return
+        if self._feed_after:
+            self.after_cancel(self._feed_after)
+        self._feed_delay = NOTIFICATION_FEED_CONFIG["poll_ms"]
+        self.poll_notifications()
+
+    def _schedule_feed(self, found):
+        cfg = NOTIFICATION_FEED_CONFIG
+        self._feed_busy = False
+        if found:
+            self._feed_delay = cfg["poll_ms"]
+        else:
+            self._feed_delay = min(int(self._feed_delay * cfg["backoff"]), cfg["max_poll_ms"])
+        delay = 0 if self._feed_again else self._feed_delay
+        self._feed_again = False
+        self._feed_after = self.after(delay, self.poll_notifications)
+
+    def _feed_failed(self, e):
+        # Skip this tick and back off; log once per outage instead of a popup every poll
+        if not self._feed_failing:
+            self._feed_failing = True
+            self.append_log(f"Notification feed paused, retrying in the background: {e}")
+        self._schedule_feed(False)
+
+    def _feed_recovered(self):
+        if self._feed_failing:
+            self._feed_failing = False
+            self.append_log("Notification feed resumed.")
+
+    def _feed_started(self, last):
+        self._feed_recovered()
+        if last is None:
+            # e.g. migrations/0005 not applied: fall back to reloading the tab on Refresh
+            self.notif_feed = None
+            self.append_log("Notification feed unavailable; use Reload / Refresh for new notifications.")
+            return
+        self.notif_feed.reset(last)
+        self._schedule_feed(False)
+
+    def _feed_fetched(self, rows):
+        self._feed_recovered()
+        new = self.notif_feed.accept(rows)
+        if new:
+            self._show_new_notifications(new)
+        self._schedule_feed(bool(new))
+
+    def _show_new_notifications(self, rows):
+        if hasattr(self, 'notif_tree') and "Notifications" in self._loaded_tabs:
+            for _, nid, ntype, msg in rows:
+                if nid not in self._notif_nids:
+                    self._notif_nids.add(nid)
+                    self.notif_tree.insert("", 0, values=(nid, ntype, msg))
+        if len(rows) > 5:
+            self.append_log(f"{len(rows)} new notifications, latest 5:")
+        for _, nid, ntype, msg in rows[-5:]:
+            self.append_log(f"New notification {nid} [{ntype or '-'}]: {msg}")
+        # Re-read rather than add len(rows): a count read after these rows were
+        # committed (e.g. on Refresh) already includes them
+        self.refresh_unread_badge()
 
     def add_notification_dialog(self):
         if not self.check_permission("add"):
@@ -1433,11 +4457,14 @@ class PharmacyApp(tk.Tk):
             msg = entries["Message"].get().strip() or None
             if not msg:
                 messagebox.showwarning("Input","Message required"); return
-            nid = get_next_nid()
+            nid = ID_ALLOCATOR.next_id("NOTIFICATION")
+            if not nid:
+                return
             q = "INSERT INTO NOTIFICATION (NID, Type, Message) VALUES (%s,%s,%s)"
             if run_query(q, (nid, ntype, msg)):
-                messagebox.showinfo("Added","Notification added"); dlg.destroy(); self.load_notifications()
+                messagebox.showinfo("Added","Notification added"); dlg.destroy()
                 self.append_log(f"Notification {nid} created")
+                self.poll_notifications_now()
         ttk.Button(dlg, text="Add", command=submit).grid(row=len(labels), column=0, columnspan=2, pady=8)
 
     def delete_notification_selected(self):
@@ -1452,6 +4479,8 @@ class PharmacyApp(tk.Tk):
         if messagebox.askyesno("Confirm", f"Delete notification {nid}?"):
             if run_query("DELETE FROM NOTIFICATION WHERE NID=%s", (nid,)):
                 messagebox.showinfo("Deleted","Notification deleted"); self.load_notifications()
+                # IS_NOTIFIED rows block the delete, so nobody had seen it
+                self.bump_unread(-1)
 
     def mark_selected_notification_seen_dialog(self):
         sel = self.notif_tree.selection()
@@ -1471,126 +4500,254 @@ class PharmacyApp(tk.Tk):
         if ok:
             messagebox.showinfo("Marked", f"Notification {nid} marked seen by {empid}")
             self.append_log(f"Notification {nid} seen by EmpID {empid}")
+            if empid == self.current_user:
+                self.bump_unread(-1)
+
+    def mark_all_notifications_seen(self):
+        if not messagebox.askyesno("Confirm", f"Mark all notifications seen by {self.current_user}?"):
+            return
+
+        def done(marked):
+            if marked is None:
+                return
+            self.set_unread_badge(0)
+            self.append_log(f"Marked {marked} notifications seen by EmpID {self.current_user}")
+        self.db.submit(mark_all_seen, self.current_user, key="mark_all_seen", callback=done)
 
     # ---------------- Queries ----------------
-    def create_queries_tab(self):
-        frame = ttk.Frame(self.nb)
-        self.nb.add(frame, text="Queries")
+    def create_queries_tab(self, frame):
         top = ttk.Frame(frame); top.pack(fill="x", padx=8, pady=6)
         ttk.Label(top, text="Pre-built queries:").pack(side="left", padx=6)
-        self.query_combo = ttk.Combobox(top, values=[
-            "All medicines expiring within WARN_DAYS",
-            "Join: Orders with Customer & Total",
-            "Aggregate: Stock per Supplier",
-            "Nested: Customers with insurance active (nested subquery)",
-            "Function: TotalStockValue()",
-            "Function: IsExpired(batch, name) (example B002, Amoxicillin)",
-            "IS_NOTIFIED: Who has seen which notifications",  
-            "Insurance: All active insurances with customer details"  
-        ], state="readonly", width=50)
+        self.query_combo = ttk.Combobox(top, values=list(PREBUILT_REPORTS), state="readonly", width=50)
         self.query_combo.pack(side="left", padx=6)
         ttk.Button(top, text="Run", command=self.run_selected_query).pack(side="left", padx=6)
+        ttk.Button(top, text="Explain", command=self.explain_selected_query).pack(side="left", padx=6)
         ttk.Button(top, text="Run Custom SQL", command=self.run_custom_query_dialog).pack(side="left", padx=6)
+        self.query_cancel_btn = ttk.Button(top, text="Cancel", command=self.cancel_query, state="disabled")
+        self.query_cancel_btn.pack(side="left", padx=6)
+        ttk.Button(top, text="Export Result...", command=self.export_query_result).pack(side="left", padx=6)
 
-        self.query_res_tree = None
-        self.query_text = tk.Text(frame, height=12, state="disabled")
-        self.query_text.pack(fill="both", expand=True, padx=8, pady=8)
+        self.query_stream = None
+        self.query_on_done = None
+        self.query_last = None      # (SQL, params, title, export time limit ms) of the result in the grid
+        self.query_status = ttk.Label(frame, text="", foreground="gray")
+        self.query_status.pack(anchor="w", padx=8)
+        grid = ttk.Frame(frame); grid.pack(fill="both", expand=True, padx=8, pady=8)
+        self.query_res_tree = ttk.Treeview(grid, show="headings")
+        vsb = ttk.Scrollbar(grid, orient="vertical", command=self.query_res_tree.yview)
+        hsb = ttk.Scrollbar(grid, orient="horizontal", command=self.query_res_tree.xview)
+        self.query_res_tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
+        self.query_res_tree.grid(row=0, column=0, sticky="nsew")
+        vsb.grid(row=0, column=1, sticky="ns")
+        hsb.grid(row=1, column=0, sticky="ew")
+        grid.rowconfigure(0, weight=1); grid.columnconfigure(0, weight=1)
 
     def run_selected_query(self):
         qname = self.query_combo.get()
         if not qname:
             messagebox.showwarning("Select", "Select a query"); return
-        self.query_text.config(state="normal"); self.query_text.delete("1.0", "end")
-        if qname == "All medicines expiring within WARN_DAYS":
-            q = "SELECT BatchNo, DrugName, ExpiryDate, Stock_quantity FROM MEDICINE WHERE ExpiryDate <= %s"
-            warn_until = (date.today() + timedelta(days=self.WARN_DAYS)).strftime("%Y-%m-%d")
-            cols, rows = run_select_with_cols(q, (warn_until,))
-            self._display_query_results(cols, rows)
-        elif qname == "Join: Orders with Customer & Total":
-            q = """SELECT o.OrderID, o.OrderDate, c.Cname,
-                          IFNULL(SUM(od.Ordered_quantity * od.Price),0) AS OrderTotal
-                   FROM `ORDER` o
-                   LEFT JOIN CUSTOMER c ON o.Cid = c.Cid
-                   LEFT JOIN ORDERED_DRUG od ON o.OrderID = od.OrderID
-                   GROUP BY o.OrderID, o.OrderDate, c.Cname"""
-            cols, rows = run_select_with_cols(q)
-            self._display_query_results(cols, rows)
-        elif qname == "Aggregate: Stock per Supplier":
-            q = """SELECT s.SupID, s.SupName, IFNULL(SUM(m.Stock_quantity),0) AS TotalStock
-                   FROM SUPPLIER s
-                   LEFT JOIN MEDICINE m ON s.SupID = m.SupID
-                   GROUP BY s.SupID, s.SupName"""
-            cols, rows = run_select_with_cols(q)
-            self._display_query_results(cols, rows)
-        elif qname == "Nested: Customers with insurance active (nested subquery)":
-            q = """SELECT Cid, Cname FROM CUSTOMER
-                   WHERE InsuranceID IN (
-                        SELECT InsuranceID FROM INSURANCE WHERE EndDate >= CURDATE()
-                   )"""
-            cols, rows = run_select_with_cols(q)
-            self._display_query_results(cols, rows)
-        elif qname == "Function: TotalStockValue()":
-            cols, rows = run_select_with_cols("SELECT TotalStockValue() AS TotalStockValue")
-            self._display_query_results(cols, rows)
-        elif qname.startswith("Function: IsExpired"):
-            rows = run_select("SELECT IsExpired(%s,%s) AS IsExpired", ("B002","Amoxicillin"))
-            self.query_text.insert("end", "IsExpired Result (0=Not Expired, 1=Expired)\n")
-            self.query_text.insert("end", "-" * 40 + "\n")
-            if rows:
-                result = rows[0][0]
-                status = "EXPIRED" if result == 1 else "NOT EXPIRED"
-                self.query_text.insert("end", f"Medicine B002-Amoxicillin: {status} (Value: {result})\n")
-            else:
-                self.query_text.insert("end", "No result returned\n")
-        elif qname == "IS_NOTIFIED: Who has seen which notifications":
-            q = """SELECT i.EmpID, e.Ename, i.NID, n.Type, n.Message
-               FROM IS_NOTIFIED i
-               LEFT JOIN EMPLOYEE e ON i.EmpID = e.EmpID
-               LEFT JOIN NOTIFICATION n ON i.NID = n.NID
-               ORDER BY i.NID DESC"""
-            cols, rows = run_select_with_cols(q)
-            self._display_query_results(cols, rows)
-        elif qname == "Insurance: All active insurances with customer details":
-            q = """SELECT i.InsuranceID, i.StartDate, i.EndDate,
-                  COUNT(c.Cid) AS CustomerCount,
-                  GROUP_CONCAT(c.Cname SEPARATOR ', ') AS Customers
-                FROM INSURANCE i
-                LEFT JOIN CUSTOMER c ON i.InsuranceID = c.InsuranceID
-                GROUP BY i.InsuranceID, i.StartDate, i.EndDate
-                ORDER BY i.EndDate DESC"""
-            cols, rows = run_select_with_cols(q)
-            self._display_query_results(cols, rows)
+        selected = self._prebuilt_query(qname)
+        if selected is None:
+            self._set_query_text("Unknown query selected.")
+            return
+        q, params, display, tables = selected
+        if display is not None:
+            self._set_query_text(f"Running: {qname} ...")
+            self.db.submit(run_select_with_cols, with_time_limit(q, QUERY_TIMEOUT_MS), params, key="query",
+                           callback=lambda res: display(*res))
+        elif self.backend.remote:
+            self._set_query_text(f"Running: {qname} (service) ...")
+            self.db.submit(self.backend.fetch_report, qname, self.WARN_DAYS, key="query",
+                           callback=lambda res: self._show_service_report(qname, q, params, res))
+        else:
+            self._set_query_text(f"Checking: {qname} ...")
+            self.db.submit(fetch_table_versions, key="query",
+                           callback=lambda versions: self._run_report(qname, q, params, tables, versions))
+
+    def _show_service_report(self, qname, q, params, res):
+        if res is None:
+            self._set_query_text(f"{qname}: failed")
+            return
+        if self.query_stream:
+            self.query_stream.cancel()
+            self.query_stream = None
+            self.query_cancel_btn.config(state="disabled")
+        cols, rows, capped = res
+        self.query_last = (q, params, qname, 0)
+        self._set_query_columns(cols)
+        self._append_query_rows(rows)
+        self._set_query_text(f"{qname}: {len(rows)} rows" + (f" (first {QUERY_MAX_ROWS} only)" if capped else ""))
+
+    def _run_report(self, qname, q, params, tables, versions):
+        """Serve a pre-built report from REPORT_CACHE, or stream it and cache the result."""
+        key = REPORT_CACHE.key(q, params)
+        seen = REPORT_CACHE.versions_of(tables, versions)
+        hit = REPORT_CACHE.get(key, seen)
+        if hit is not None:
+            if self.query_stream:
+                self.query_stream.cancel()
+                self.query_stream = None
+                self.query_cancel_btn.config(state="disabled")
+            cols, rows = hit
+            self.query_last = (q, params, qname, 0)
+            self._set_query_columns(cols)
+            self._append_query_rows(rows)
+            self._set_query_text(f"{qname}: {len(rows)} rows (cached; {', '.join(tables)} unchanged)")
+            return
+        def on_done(stream):
+            if stream.finished:
+                REPORT_CACHE.put(key, seen, stream.columns, stream.kept)
+        self.start_query_stream(q, params, qname, on_done=on_done)
+
+    def explain_selected_query(self):
+        qname = self.query_combo.get()
+        selected = self._prebuilt_query(qname) if qname else None
+        if selected is None:
+            messagebox.showwarning("Select", "Select a query"); return
+        self.show_query_plan(selected[0], selected[1])
+
+    def _prebuilt_query(self, qname):
+        """(SQL, params, custom display or None, tables read) for a pre-built query name, or None."""
+        selected = report_query(qname, self.WARN_DAYS)
+        if selected is None:
+            return None
+        q, params, tables = selected
+        display = self._display_is_expired if qname.startswith("Function: IsExpired") else None
+        return q, params, display, tables
+
+    def show_query_plan(self, q, params=()):
+        """Show EXPLAIN FORMAT=JSON for a query in its own window, fetched in the background."""
+        def show(res):
+            if res is None:
+                return
+            lines, raw = res
+            win = tk.Toplevel(self); win.title("Query Plan")
+            txt = tk.Text(win, width=100, height=30)
+            txt.pack(fill="both", expand=True, padx=6, pady=6)
+            txt.insert("end", "\n".join(lines) + "\n\n--- EXPLAIN FORMAT=JSON ---\n" + raw)
+            txt.config(state="disabled")
+        self.db.submit(explain_query, q, params, key="explain", callback=show)
+
+    def _set_query_text(self, text):
+        self.query_status.config(text=text)
+
+    def _set_query_columns(self, cols):
+        tree = self.query_res_tree
+        tree.delete(*tree.get_children())
+        tree.configure(columns=cols)
+        for c in cols:
+            tree.heading(c, text=c)
+            tree.column(c, width=120, stretch=False)
+
+    def _display_is_expired(self, cols, rows):
+        self._set_query_columns(("Medicine", "Status", "IsExpired"))
+        if rows:
+            result = rows[0][0]
+            status = "EXPIRED" if result == 1 else "NOT EXPIRED"
+            self.query_res_tree.insert("", "end", values=("B002-Amoxicillin", status, result))
+            self._set_query_text("IsExpired result (0=Not Expired, 1=Expired)")
         else:
-            self.query_text.insert("end", "Unknown query selected.")
-        self.query_text.config(state="disabled")
+            self._set_query_text("No result returned")
+
+    def start_query_stream(self, q, params=(), title="custom query", timeout_ms=QUERY_TIMEOUT_MS, on_done=None,
+                           export_timeout_ms=0):
+        """Stream a SELECT into the result grid, replacing (and cancelling) any running one.
+
+        on_done(stream) runs once the stream ends; the rows read are kept on
+        stream.kept when it is given. export_timeout_ms is the time limit
+        "Export Result..." re-runs the query with (0 = none, for reports).
+        """
+        if self.query_stream:
+            self.query_stream.cancel()
+        self._set_query_columns(())
+        stream = QueryStream(self.db, q, params, timeout_ms=timeout_ms, keep_rows=on_done is not None,
+                             on_columns=lambda cols: stream is self.query_stream and self._set_query_columns(cols),
+                             on_rows=lambda rows: stream is self.query_stream and self._append_query_rows(rows))
+        self.query_stream = stream
+        self.query_title = title
+        self.query_last = (q, params, title, export_timeout_ms)
+        self.query_cancel_btn.config(state="normal")
+        self.query_on_done = on_done
+        self.db.submit(stream.run, callback=lambda res: self._query_stream_done(stream, res),
+                       errback=lambda e: (self._query_stream_done(stream, (stream.rows, False, False)),
+                                          messagebox.showerror("Query Error", str(e))))
+        self._tick_query_status()
+
+    def _append_query_rows(self, rows):
+        tree = self.query_res_tree
+        for r in rows:
+            tree.insert("", "end", values=tuple("NULL" if v is None else v for v in r))
+
+    def _tick_query_status(self):
+        stream = self.query_stream
+        if stream is None:
+            return
+        self._set_query_text(f"Running: {self.query_title} ... {stream.rows} rows, {stream.elapsed():.1f}s")
+        self.after(200, lambda: stream is self.query_stream and self._tick_query_status())
+
+    def _query_stream_done(self, stream, res):
+        if stream is not self.query_stream:
+            return
+        self.query_stream = None
+        self.query_cancel_btn.config(state="disabled")
+        rows, capped, cancelled = res
+        note = " (cancelled)" if cancelled else f" (stopped at the {QUERY_MAX_ROWS}-row cap)" if capped else ""
+        self._set_query_text(f"{self.query_title}: {rows} rows in {stream.elapsed():.2f}s{note}")
+        if self.query_on_done:
+            self.query_on_done(stream)
+
+    def export_query_result(self):
+        """Re-run the last Queries-tab SELECT straight into a file, without the row cap."""
+        if not self.query_last:
+            messagebox.showwarning("Export", "Run a query first"); return
+        q, params, title, timeout_ms = self.query_last
+        name = re.sub(r"\W+", "_", title).strip("_").lower() or "query"
+        export_dialog(self, self.db, q, params, name, timeout_ms=timeout_ms)
+
+    def cancel_query(self):
+        if self.query_stream:
+            self.query_stream.cancel()
+            self._set_query_text(f"Cancelling: {self.query_title} ...")
 
     def run_custom_query_dialog(self):
         dlg = tk.Toplevel(self); dlg.title("Run Custom SQL (SELECT only)")
         ttk.Label(dlg, text="Enter a SELECT query:").grid(row=0, column=0, sticky="w", padx=6, pady=6)
         txt = tk.Text(dlg, height=8, width=80)
         txt.grid(row=1, column=0, padx=6, pady=6)
-        def runit():
+        opts = ttk.Frame(dlg); opts.grid(row=2, column=0, sticky="w", padx=6)
+        cap = f", max {QUERY_TIMEOUT_MS / 1000:g}" if QUERY_TIMEOUT_MS else ""
+        ttk.Label(opts, text=f"Time limit (s{cap}):").pack(side="left")
+        limit_entry = ttk.Entry(opts, width=8)
+        limit_entry.insert(0, f"{QUERY_TIMEOUT_MS / 1000:g}")
+        limit_entry.pack(side="left", padx=4)
+
+        def get_query():
             q = txt.get("1.0", "end").strip()
             if not q.lower().startswith("select"):
-                messagebox.showwarning("Only SELECT", "Only SELECT queries are allowed here."); return
-            cols, rows = run_select_with_cols(q)
-            self._display_query_results(cols, rows)
+                messagebox.showwarning("Only SELECT", "Only SELECT queries are allowed here.", parent=dlg); return None
+            return q
+        def explain():
+            q = get_query()
+            if q:
+                self.show_query_plan(q)
+        def runit():
+            q = get_query()
+            if not q:
+                return
+            try:
+                timeout_ms = int(float(limit_entry.get().strip()) * 1000)
+            except ValueError:
+                timeout_ms = 0
+            if timeout_ms < 1:
+                messagebox.showwarning("Input", "Time limit must be a positive number of seconds", parent=dlg); return
+            # Users may shorten the configured limit but never lift it
+            if QUERY_TIMEOUT_MS:
+                timeout_ms = min(timeout_ms, QUERY_TIMEOUT_MS)
+            self.start_query_stream(q, timeout_ms=timeout_ms, export_timeout_ms=timeout_ms)
             dlg.destroy()
-        ttk.Button(dlg, text="Run", command=runit).grid(row=2, column=0, pady=6)
-
-    def _display_query_results(self, cols, rows):
-        self.query_text.config(state="normal")
-        self.query_text.delete("1.0", "end")
-        if not cols:
-            self.query_text.insert("end", "No columns/rows returned or error.\n")
-            return
-        header = " | ".join(cols)
-        self.query_text.insert("end", header + "\n")
-        self.query_text.insert("end", "-" * len(header) + "\n")
-        for r in rows:
-            row_s = " | ".join(str(item) for item in r)
-            self.query_text.insert("end", row_s + "\n")
-        self.query_text.config(state="disabled")
+        btns = ttk.Frame(dlg); btns.grid(row=3, column=0, pady=6)
+        ttk.Button(btns, text="Explain", command=explain).pack(side="left", padx=4)
+        ttk.Button(btns, text="Run", command=runit).pack(side="left", padx=4)
 
 # ---------- MAIN ENTRY POINT ----------
 if __name__ == "__main__":
@@ -0,0 +1,20 @@
+-- 0001: secondary indexes for the order and billing paths.
+--
+-- InnoDB already gave ORDER.Cid, ORDERED_DRUG.OrderID and BILL.OrderID an
+-- implicit index for their foreign keys. idx_order_customer,
+-- idx_ordered_drug_order and idx_bill_order replace those (InnoDB drops an
+-- implicit FK index once another index can serve the constraint) and widen
+-- them where a query benefits, so an insert maintains no more indexes than
+-- before; the widened ones are larger and are also rewritten when their
+-- extra columns change. idx_order_date is new and costs one more index
+-- entry per order written.
+--   idx_order_date          date-range order lookups (ORDER.OrderDate had no index)
+--   idx_order_customer      a customer's orders, newest first
+--   idx_ordered_drug_order  covers SUM(Ordered_quantity * Price) per order, used by
+--                           the orders report, GenerateBill and BillUnbilledOrders
+--   idx_bill_order          the "has this order been billed" probe in BillUnbilledOrders
+
+CREATE INDEX idx_order_date ON `ORDER` (OrderDate);
+CREATE INDEX idx_order_customer ON `ORDER` (Cid, OrderDate);
+CREATE INDEX idx_ordered_drug_order ON ORDERED_DRUG (OrderID, Ordered_quantity, Price);
+CREATE INDEX idx_bill_order ON BILL (OrderID);
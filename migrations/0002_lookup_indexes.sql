@@ -0,0 +1,14 @@
+-- 0002: secondary indexes for stock, prescription and notification lookups.
+--
+-- MEDICINE.ExpiryDate is already covered by idx_medicine_expiry. As in 0001,
+-- these replace the implicit foreign-key indexes on the same leading column.
+-- idx_medicine_supplier stays on SupID alone: every sale updates
+-- Stock_quantity (trg_sell_stock), and an index including it would be
+-- rewritten on that hot path just to cover the cached stock report.
+--   idx_medicine_supplier      a supplier's batches
+--   idx_prescription_customer  a customer's prescriptions by date
+--   idx_is_notified_nid        "has anyone seen NID x" probes (unseen count, IS_NOTIFIED report)
+
+CREATE INDEX idx_medicine_supplier ON MEDICINE (SupID);
+CREATE INDEX idx_prescription_customer ON PRESCRIPTION (Cid, PresDate);
+CREATE INDEX idx_is_notified_nid ON IS_NOTIFIED (NID, EmpID);
@@ -0,0 +1,24 @@
+-- 0003: optimistic concurrency for MEDICINE edits.
+--
+-- RowVersion counts changes to a batch's descriptive columns (ExpiryDate,
+-- Price, SupID, Type), whoever makes them. The Medicines "Update Selected"
+-- dialog writes only if the version it showed is still current, so two edits
+-- of the same batch cannot silently overwrite each other. Stock is not
+-- versioned: the dialog writes it as a delta (Stock_quantity = Stock_quantity
+-- + n), so a sale made meanwhile by trg_sell_stock is kept, not undone.
+
+ALTER TABLE MEDICINE ADD COLUMN RowVersion INT NOT NULL DEFAULT 0;
+
+DELIMITER $$
+
+CREATE TRIGGER trg_medicine_row_version
+BEFORE UPDATE ON MEDICINE
+FOR EACH ROW
+BEGIN
+    IF NOT (NEW.ExpiryDate <=> OLD.ExpiryDate AND NEW.Price <=> OLD.Price
+            AND NEW.SupID <=> OLD.SupID AND NEW.Type <=> OLD.Type) THEN
+        SET NEW.RowVersion = OLD.RowVersion + 1;
+    END IF;
+END $$
+
+DELIMITER ;
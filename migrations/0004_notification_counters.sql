@@ -0,0 +1,55 @@
+-- 0004: per-employee unread notification counts without the NOT EXISTS scan.
+--
+-- NOTIFICATION_COUNTER holds one row per employee with the number of
+-- notifications they have marked seen, plus a '*' row with the number of
+-- notifications in total, so an employee's unread count is two primary-key
+-- reads: '*' minus their own row. Triggers keep both current on NOTIFICATION
+-- and IS_NOTIFIED changes. Storing unread per employee directly would cost one
+-- row update per employee for every new notification.
+
+CREATE TABLE NOTIFICATION_COUNTER (
+    EmpID VARCHAR(5) PRIMARY KEY,      -- '*' = all notifications
+    Notifications INT NOT NULL DEFAULT 0
+);
+
+DELIMITER $$
+
+CREATE TRIGGER trg_notif_count_ins AFTER INSERT ON NOTIFICATION
+FOR EACH ROW
+    INSERT INTO NOTIFICATION_COUNTER (EmpID, Notifications) VALUES ('*', 1)
+    ON DUPLICATE KEY UPDATE Notifications = Notifications + 1 $$
+
+CREATE TRIGGER trg_notif_count_del AFTER DELETE ON NOTIFICATION
+FOR EACH ROW
+    UPDATE NOTIFICATION_COUNTER SET Notifications = Notifications - 1 WHERE EmpID = '*' $$
+
+CREATE TRIGGER trg_seen_count_ins AFTER INSERT ON IS_NOTIFIED
+FOR EACH ROW
+    INSERT INTO NOTIFICATION_COUNTER (EmpID, Notifications) VALUES (NEW.EmpID, 1)
+    ON DUPLICATE KEY UPDATE Notifications = Notifications + 1 $$
+
+CREATE TRIGGER trg_seen_count_upd AFTER UPDATE ON IS_NOTIFIED
+FOR EACH ROW
+BEGIN
+    IF NOT (OLD.EmpID <=> NEW.EmpID) THEN
+        UPDATE NOTIFICATION_COUNTER SET Notifications = Notifications - 1 WHERE EmpID = OLD.EmpID;
+        INSERT INTO NOTIFICATION_COUNTER (EmpID, Notifications) VALUES (NEW.EmpID, 1)
+        ON DUPLICATE KEY UPDATE Notifications = Notifications + 1;
+    END IF;
+END $$
+
+CREATE TRIGGER trg_seen_count_del AFTER DELETE ON IS_NOTIFIED
+FOR EACH ROW
+    UPDATE NOTIFICATION_COUNTER SET Notifications = Notifications - 1 WHERE EmpID = OLD.EmpID $$
+
+DELIMITER ;
+
+-- Count what is already there (after the triggers exist, so nothing is missed;
+-- re-running recounts)
+INSERT INTO NOTIFICATION_COUNTER (EmpID, Notifications)
+SELECT '*', COUNT(*) FROM NOTIFICATION
+ON DUPLICATE KEY UPDATE Notifications = VALUES(Notifications);
+
+INSERT INTO NOTIFICATION_COUNTER (EmpID, Notifications)
+SELECT EmpID, COUNT(*) FROM IS_NOTIFIED GROUP BY EmpID
+ON DUPLICATE KEY UPDATE Notifications = VALUES(Notifications);
@@ -0,0 +1,10 @@
+-- 0005: append-only change feed over NOTIFICATION.
+--
+-- Seq numbers notifications in insert order, so a till can poll for
+-- "WHERE Seq > last seen" on uq_notification_seq instead of reloading the
+-- whole table (NIDs are strings and do not sort by age). Existing rows are
+-- numbered when the column is added.
+
+ALTER TABLE NOTIFICATION
+    ADD COLUMN Seq BIGINT NOT NULL AUTO_INCREMENT,
+    ADD UNIQUE KEY uq_notification_seq (Seq);
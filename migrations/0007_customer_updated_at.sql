@@ -0,0 +1,21 @@
+-- 0007: change stamp on CUSTOMER for the customer search index.
+--
+-- The Customers typeahead re-reads only customers stamped since its last
+-- refresh. UpdatedAt is set on insert and whenever the row changes; the
+-- CUSTOMER_PHONE triggers touch it as well, because a customer's extra
+-- phone numbers are part of what the search matches.
+
+ALTER TABLE CUSTOMER
+    ADD COLUMN UpdatedAt TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+CREATE INDEX idx_customer_updated ON CUSTOMER (UpdatedAt);
+
+DELIMITER $$
+
+CREATE TRIGGER trg_customer_phone_touch_ins AFTER INSERT ON CUSTOMER_PHONE
+FOR EACH ROW UPDATE CUSTOMER SET UpdatedAt = CURRENT_TIMESTAMP(6) WHERE Cid = NEW.Cid $$
+CREATE TRIGGER trg_customer_phone_touch_upd AFTER UPDATE ON CUSTOMER_PHONE
+FOR EACH ROW UPDATE CUSTOMER SET UpdatedAt = CURRENT_TIMESTAMP(6) WHERE Cid IN (OLD.Cid, NEW.Cid) $$
+CREATE TRIGGER trg_customer_phone_touch_del AFTER DELETE ON CUSTOMER_PHONE
+FOR EACH ROW UPDATE CUSTOMER SET UpdatedAt = CURRENT_TIMESTAMP(6) WHERE Cid = OLD.Cid $$
+
+DELIMITER ;
@@ -0,0 +1,177 @@
+# migrate.py
+# Applies the numbered NNNN_name.sql files in this directory, in order, to the
+# database in DB_CONFIG and records each one in SCHEMA_VERSION.
+#
+# Safe to re-run: applied versions are skipped, and statements whose effect is
+# already present (index/column/table exists, or is already gone) are skipped
+# too, so a migration interrupted half way (MySQL DDL cannot be rolled back)
+# completes on the next run. A named lock keeps two runners from overlapping.
+#
+#   python migrations/migrate.py            # apply everything pending
+#   python migrations/migrate.py --status   # list applied / pending versions
+#   python migrations/migrate.py --to 1 --dry-run
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+
+import mysql.connector
+from mysql.connector import Error
+
+MIGRATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(MIGRATIONS_DIR, ".."))
+from frontend_pharmacy import DB_CONFIG
+
+FILE_RE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+LOCK_NAME = "pharmacy_schema_migrate"
+
+# "Already done" errors: duplicate table / column / key name, can't drop missing key/column,
+# trigger already exists
+ALREADY_APPLIED = {1050, 1060, 1061, 1091, 1359}
+
+VERSION_TABLE = """CREATE TABLE IF NOT EXISTS SCHEMA_VERSION (
+    Version INT PRIMARY KEY,
+    Name VARCHAR(100) NOT NULL,
+    Checksum CHAR(64) NULL,
+    AppliedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)"""
+
+
+def discover(directory=MIGRATIONS_DIR):
+    """Return [(version, name, path)] for every migration file, in version order."""
+    found = []
+    for fname in os.listdir(directory):
+        m = FILE_RE.match(fname)
+        if m:
+            found.append((int(m.group(1)), m.group(2), os.path.join(directory, fname)))
+    found.sort()
+    versions = [v for v, _, _ in found]
+    if len(versions) != len(set(versions)):
+        raise SystemExit(f"duplicate migration version in {directory}")
+    return found
+
+
+def split_statements(sql):
+    """Split a script into statements, honouring DELIMITER lines and -- comments."""
+    statements, buf, delim = [], [], ";"
+    for line in sql.splitlines():
+        stripped = line.strip()
+        if stripped.upper().startswith("DELIMITER "):
+            delim = stripped.split(None, 1)[1]
+            continue
+        if not buf and (not stripped or stripped.startswith("--")):
+            continue
+        buf.append(line)
+        if stripped.endswith(delim):
+            stmt = "\n".join(buf).rstrip()[:-len(delim)].strip()
+            if stmt:
+                statements.append(stmt)
+            buf = []
+    tail = "\n".join(buf).strip()
+    if tail:
+        statements.append(tail)
+    return statements
+
+
+def checksum(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def applied_versions(cur):
+    cur.execute(VERSION_TABLE)
+    cur.execute("SELECT Version, Name, Checksum FROM SCHEMA_VERSION ORDER BY Version")
+    return {v: (name, chk) for v, name, chk in cur.fetchall()}
+
+
+def migrate(conn, target=None, dry_run=False, log=print):
+    """Apply pending migrations up to `target` (all when None); returns the versions applied."""
+    cur = conn.cursor()
+    cur.execute("SELECT GET_LOCK(%s, 30)", (LOCK_NAME,))
+    if cur.fetchone()[0] != 1:
+        raise SystemExit("another migration run holds the lock")
+    done = []
+    try:
+        applied = applied_versions(cur)
+        for version, name, path in discover():
+            if target is not None and version > target:
+                break
+            chk = checksum(path)
+            if version in applied:
+                old = applied[version][1]
+                if old and old != chk:
+                    log(f"WARNING: {version:04d}_{name}.sql changed after it was applied")
+                continue
+            with open(path, encoding="utf-8") as f:
+                statements = split_statements(f.read())
+            log(f"{'would apply' if dry_run else 'applying'} {version:04d}_{name} ({len(statements)} statements)")
+            if dry_run:
+                for stmt in statements:
+                    log("  " + stmt.splitlines()[0])
+                continue
+            for stmt in statements:
+                try:
+                    cur.execute(stmt)
+                    if cur.with_rows:
+                        cur.fetchall()
+                except Error as e:
+                    if e.errno in ALREADY_APPLIED:
+                        log(f"  already present, skipped: {stmt.splitlines()[0]}")
+                    else:
+                        raise
+            cur.execute("INSERT INTO SCHEMA_VERSION (Version, Name, Checksum) VALUES (%s,%s,%s)",
+                        (version, name, chk))
+            conn.commit()
+            done.append(version)
+    finally:
+        cur.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+        cur.fetchall()
+        cur.close()
+    return done
+
+
+def status(conn):
+    cur = conn.cursor()
+    applied = applied_versions(cur)
+    cur.close()
+    files = {v: (name, path) for v, name, path in discover()}
+    for version in sorted(set(applied) | set(files)):
+        if version in applied:
+            name, chk = applied[version]
+            note = "" if version in files else "  (file missing)"
+            if version in files and chk and chk != checksum(files[version][1]):
+                note = "  (file changed since applied)"
+            if not chk:
+                note += "  (baseline from PHARMACY_DATABASE.sql)"
+            print(f"{version:04d}  applied  {name}{note}")
+        else:
+            print(f"{version:04d}  pending  {files[version][0]}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Apply numbered schema migrations to the pharmacy database")
+    ap.add_argument("--status", action="store_true", help="list applied and pending versions and exit")
+    ap.add_argument("--to", type=int, dest="target", help="stop after this version")
+    ap.add_argument("--dry-run", action="store_true", help="print what would run without changing anything")
+    ap.add_argument("--database", help="override DB_CONFIG['database']")
+    args = ap.parse_args()
+
+    cfg = dict(DB_CONFIG)
+    if args.database:
+        cfg["database"] = args.database
+    conn = mysql.connector.connect(**cfg)
+    try:
+        if args.status:
+            status(conn)
+        else:
+            done = migrate(conn, args.target, args.dry_run)
+            if not args.dry_run:
+                print(f"applied {len(done)} migration(s)" if done else "schema is up to date")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,552 @@
+# pharmacy_service.py
+# Headless HTTP/JSON service for the pharmacy's data operations, so every till
+# shares one connection pool instead of each opening its own.
+#
+# The operations are the module-level helpers from frontend_pharmacy
+# (create_order, add_ordered_drug, checkout_order, generate_bill,
+# bill_unbilled_orders, add_prescription, expiry_counts, fetch_report, ...);
+# a till uses this service when SERVICE_CONFIG["url"] is set (see
+# ServiceClient there). An asyncio server parses requests and keeps client
+# connections alive; each DB call runs on a thread pool one smaller than the
+# DB pool (a checkout holds its transaction's connection while the FEFO index
+# syncs on a second), so 20 counters multiplex onto --pool connections and
+# queue for a worker instead of opening more.
+#
+#   python pharmacy_service.py --port 8765 --pool 8
+#   curl -s localhost:8765/health
+#
+# Every endpoint but /health and /login needs a session: POST /login with the
+# same EmpID / AuthKey (or admin credentials) as the login window, then send
+# "Authorization: Bearer <token>". Each endpoint checks the session's role
+# against PRIVILEGES as the GUI does (ROUTES), and sales are recorded under
+# the session's EmpID unless the role may act for others. Tokens travel in
+# clear text, so off localhost run it on a trusted network or behind TLS.
+#
+# Endpoints (JSON bodies; ids left out are allocated by the service):
+#   GET  /health                          pool, cache and request counters
+#   POST /login                           {emp_id, auth_key} -> {token, emp_id, role}
+#   POST /logout
+#   GET  /metrics                         per-statement latency (QUERY_METRICS)
+#   POST /ids/<ORDER|BILL|PRESCRIPTION|NOTIFICATION>
+#   POST /orders                          {order_id, cid, emp_id, order_date}
+#   POST /orders/checkout                 {... , lines: [[drug, batch, qty, price]], bill_id}
+#   POST /orders/<order_id>/drugs         {drug, batch (blank = FEFO), qty, price}
+#   POST /bills                           {bill_id, cid, order_id}
+#   POST /bills/unbilled
+#   POST /prescriptions                   {pres_id, cid, doc_id, pres_date, order_id}
+#   POST /prescriptions/<pres_id>/drugs   {drug_id, qty}
+#   GET  /expiry?days=7
+#   GET  /reports                         pre-built report names
+#   GET  /reports/<name>?days=7&max_rows=10000
+#   GET  /lookup/<customers|suppliers|employees|medicines|insurance>
+
+import argparse
+import asyncio
+import hmac
+import json
+import re
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import frontend_pharmacy as fp
+from frontend_pharmacy import (ADMIN_CREDENTIALS, ID_ALLOCATOR, ID_FORMATS, POOL_CONFIG, PREBUILT_REPORTS,
+                               PRIVILEGES, QUERY_MAX_ROWS, QUERY_METRICS, REF_CACHE, REF_DATASETS, REPORT_CACHE,
+                               add_ordered_drug, add_prescribed_drug, add_prescription, bill_unbilled_orders,
+                               checkout_order, create_order, expiry_counts, fetch_report, fetch_table_versions,
+                               generate_bill, report_query, run_select)
+
+SERVICE_DEFAULTS = {
+    "host": "127.0.0.1",
+    "port": 8765,
+    "pool": 8,               # DB connections shared by every till (DB worker threads = pool - 1)
+    "idle_timeout": 60,      # seconds an idle keep-alive client connection is held open
+    "max_body": 1_000_000,   # bytes accepted in a request body
+    "session_ttl": 12 * 3600 # seconds a login session lasts without being used
+}
+WARN_DAYS = 7                # default /expiry and report window, as PharmacyApp.WARN_DAYS
+ACT_FOR_OTHERS = ("Admin", "Supervisor", "Manager")   # roles that may record a sale under another EmpID
+# /lookup dataset -> tabs, any of which lets a role read it
+LOOKUP_TABS = {
+    "customers": ("Customers", "Orders", "Bills"),
+    "suppliers": ("Suppliers", "Medicines"),
+    "employees": ("Employees",),
+    "medicines": ("Medicines", "Ordered Drugs"),
+    "insurance": ("Customers",),
+}
+
+
+class ServiceError(Exception):
+    """A request the service answers with an error status instead of a result."""
+    def __init__(self, status, error, detail=""):
+        super().__init__(detail or error)
+        self.status = status
+        self.error = error
+        self.detail = detail
+
+
+# ---------- ERROR CAPTURE ----------
+# frontend_pharmacy reports DB errors through show_db_error and returns None /
+# False; here each worker thread collects them so the request can answer with
+# the message instead of a popup.
+_errors = threading.local()
+
+
+def collect_error(title, msg):
+    pending = getattr(_errors, "pending", None)
+    if pending is None:
+        print(f"{title}: {msg}")
+    else:
+        pending.append((title, msg))
+
+
+def run_captured(fn, *args):
+    """fn(*args) on a DB worker; returns (result, [(title, message), ...])."""
+    _errors.pending = []
+    try:
+        return fn(*args), _errors.pending
+    finally:
+        _errors.pending = None
+
+
+def failure(errors):
+    if not errors:
+        return ServiceError(500, "Service Error", "operation failed without an error message")
+    title, msg = errors[0]
+    # No pooled connection / DB unreachable is the service's problem, not the request's
+    return ServiceError(503 if title == "DB Connection Error" else 422, title, msg)
+
+
+# ---------- SESSIONS ----------
+class Session:
+    def __init__(self, emp_id, role):
+        self.emp_id = emp_id            # "ADMIN" for the hardcoded admin, as in the GUI
+        self.role = role
+        self.privileges = PRIVILEGES[role]
+        self.last_used = time.monotonic()
+
+    def allows(self, need):
+        """need: "add" / "edit" / "delete" for a can_* privilege, anything else names a tab."""
+        if need in ("add", "edit", "delete"):
+            return self.privileges[f"can_{need}"]
+        return need in self.privileges["tabs"]
+
+
+class SessionStore:
+    """Bearer tokens handed out by /login, dropped after `ttl` seconds unused."""
+
+    def __init__(self, ttl=SERVICE_DEFAULTS["session_ttl"]):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def create(self, emp_id, role):
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            self._sessions[token] = Session(emp_id, role)
+        return token
+
+    def get(self, token):
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None:
+                return None
+            if now - session.last_used > self.ttl:
+                del self._sessions[token]
+                return None
+            session.last_used = now
+            return session
+
+    def drop(self, token):
+        with self._lock:
+            self._sessions.pop(token, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+SESSIONS = SessionStore()
+
+
+def authenticate(emp_id, auth_key):
+    """(EmpID, role) for valid credentials, else None; the login window's check."""
+    if (hmac.compare_digest(emp_id.encode(), ADMIN_CREDENTIALS["username"].encode())
+            and hmac.compare_digest(auth_key.encode(), ADMIN_CREDENTIALS["password"].encode())):
+        return "ADMIN", "Admin"
+    rows = call(run_select, "SELECT EmpID, Role FROM EMPLOYEE WHERE EmpID=%s AND AuthKey=%s", (emp_id, auth_key))
+    if rows and rows[0][1] in PRIVILEGES:
+        return rows[0][0], rows[0][1]
+    return None
+
+
+# ---------- REQUEST VALIDATION ----------
+def sale_emp(session, body):
+    """The EmpID a sale is recorded under: the session's own unless its role may name another."""
+    emp = field(body, "emp_id", required=False)
+    own = None if session.emp_id == "ADMIN" else session.emp_id
+    if emp is None or emp == own:
+        return own
+    if session.role not in ACT_FOR_OTHERS:
+        raise ServiceError(403, "Forbidden", f"role {session.role} may not record sales for {emp}")
+    return emp
+
+
+def field(body, name, kind=str, required=True):
+    value = body.get(name)
+    if value in (None, ""):
+        if required:
+            raise ServiceError(400, "Bad Request", f"'{name}' is required")
+        return None
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        raise ServiceError(400, "Bad Request", f"'{name}' must be {kind.__name__}") from None
+
+
+def query_int(query, name, default):
+    try:
+        return int(query.get(name, [default])[0])
+    except ValueError:
+        raise ServiceError(400, "Bad Request", f"'{name}' must be int") from None
+
+
+def json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, timedelta)):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8", "replace")
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+# ---------- OPERATIONS ----------
+# Each runs on a DB worker thread and returns the JSON reply, raising
+# ServiceError when the helper it wraps reports a failure.
+def call(fn, *args):
+    result, errors = run_captured(fn, *args)
+    # run_select-style helpers return an empty result on error, so errors decide those
+    if result is None or result is False or (errors and not result):
+        raise failure(errors)
+    return result
+
+
+def allocate(name, given):
+    return given or call(ID_ALLOCATOR.next_id, name)
+
+
+def op_login(_, body):
+    who = authenticate(field(body, "emp_id"), field(body, "auth_key"))
+    if who is None:
+        raise ServiceError(401, "Unauthorized", "invalid EmpID or AuthKey")
+    emp_id, role = who
+    return {"token": SESSIONS.create(emp_id, role), "emp_id": emp_id, "role": role}
+
+
+def op_next_id(_, __, name):
+    if name not in ID_FORMATS:
+        raise ServiceError(404, "Not Found", f"no ID sequence {name}")
+    return {"id": call(ID_ALLOCATOR.next_id, name)}
+
+
+def op_create_order(session, body):
+    cid = field(body, "cid")
+    emp = sale_emp(session, body)
+    oid = allocate("ORDER", field(body, "order_id", required=False))
+    call(create_order, oid, cid, emp, field(body, "order_date", required=False))
+    return {"order_id": oid}
+
+
+def op_checkout(session, body):
+    cid = field(body, "cid")
+    emp = sale_emp(session, body)
+    raw = body.get("lines")
+    if not isinstance(raw, list) or not raw:
+        raise ServiceError(400, "Bad Request", "'lines' must be a non-empty list")
+    lines = []
+    for line in raw:
+        try:
+            drug, batch, qty, price = line
+            lines.append((str(drug), batch or None, int(qty), None if price in (None, "") else float(price)))
+        except (TypeError, ValueError):
+            raise ServiceError(400, "Bad Request", f"bad line {line!r}: expected [drug, batch, qty, price]") from None
+    oid = allocate("ORDER", field(body, "order_id", required=False))
+    bid = allocate("BILL", field(body, "bill_id", int, required=False))
+    total = call(checkout_order, oid, cid, emp, field(body, "order_date", required=False), lines, bid)
+    return {"order_id": oid, "bill_id": bid, "total": total}
+
+
+def op_add_ordered_drug(_, body, order_id):
+    rows = call(add_ordered_drug, field(body, "drug"), order_id, field(body, "batch", required=False),
+                field(body, "qty", int), field(body, "price", float, required=False))
+    return {"rows": rows}
+
+
+def op_generate_bill(_, body):
+    bid = allocate("BILL", field(body, "bill_id", int, required=False))
+    call(generate_bill, bid, field(body, "cid"), field(body, "order_id"))
+    return {"bill_id": bid}
+
+
+def op_bill_unbilled(_, __):
+    bills, total = call(bill_unbilled_orders)
+    return {"bills": bills, "total": total}
+
+
+def op_add_prescription(_, body):
+    cid = field(body, "cid")
+    pid = allocate("PRESCRIPTION", field(body, "pres_id", required=False))
+    nid = call(add_prescription, pid, cid, field(body, "doc_id", required=False),
+               field(body, "pres_date", required=False), field(body, "order_id", required=False))
+    return {"pres_id": pid, "nid": nid}
+
+
+def op_add_prescribed_drug(_, body, pres_id):
+    call(add_prescribed_drug, field(body, "drug_id"), pres_id, field(body, "qty", int))
+    return {"pres_id": pres_id}
+
+
+def op_expiry(_, query):
+    expired, expiring = call(expiry_counts, query_int(query, "days", WARN_DAYS))
+    return {"expired": expired, "expiring": expiring}
+
+
+_report_lock = threading.Lock()   # REPORT_CACHE is not thread-safe by itself
+
+
+def op_report(_, query, name):
+    if name not in PREBUILT_REPORTS:
+        raise ServiceError(404, "Not Found", f"no report named {name!r}")
+    days = query_int(query, "days", WARN_DAYS)
+    max_rows = query_int(query, "max_rows", QUERY_MAX_ROWS)
+    q, params, tables = report_query(name, days)
+    # Shared across tills: served from cache until a table it reads changes
+    versions = call(fetch_table_versions)
+    key = REPORT_CACHE.key(q, params)
+    seen = REPORT_CACHE.versions_of(tables, versions)
+    with _report_lock:
+        hit = REPORT_CACHE.get(key, seen)
+    if hit is not None:
+        cols, rows = hit
+        return {"columns": list(cols), "rows": rows[:max_rows], "capped": len(rows) > max_rows, "cached": True}
+    cols, rows, capped = call(fetch_report, name, days, max_rows)
+    if not capped:
+        with _report_lock:
+            REPORT_CACHE.put(key, seen, cols, rows)
+    return {"columns": cols, "rows": rows, "capped": capped, "cached": False}
+
+
+def op_lookup(session, _, dataset):
+    if dataset not in REF_DATASETS:
+        raise ServiceError(404, "Not Found", f"no dataset {dataset!r}")
+    if not any(session.allows(tab) for tab in LOOKUP_TABS[dataset]):
+        raise ServiceError(403, "Forbidden", f"role {session.role} may not read {dataset}")
+    return {"rows": call(REF_CACHE.get, dataset)}
+
+
+# (method, path pattern, handler, handler input, privileges needed as in
+# Session.allows); handlers get the session, the body / query, then the groups
+# in the pattern. The privileges mirror the GUI's tab and can_* checks.
+ROUTES = [
+    ("POST", r"/ids/(\w+)", op_next_id, "body", ("add",)),
+    ("POST", r"/orders", op_create_order, "body", ("Orders", "add")),
+    ("POST", r"/orders/checkout", op_checkout, "body", ("Orders", "add")),
+    ("POST", r"/orders/([^/]+)/drugs", op_add_ordered_drug, "body", ("Ordered Drugs", "add")),
+    ("POST", r"/bills", op_generate_bill, "body", ("Bills", "add")),
+    ("POST", r"/bills/unbilled", op_bill_unbilled, "body", ("Bills", "add")),
+    ("POST", r"/prescriptions", op_add_prescription, "body", ("Prescriptions", "add")),
+    ("POST", r"/prescriptions/([^/]+)/drugs", op_add_prescribed_drug, "body", ("Prescriptions", "add")),
+    ("GET", r"/expiry", op_expiry, "query", ("Dashboard",)),
+    ("GET", r"/reports/([^/]+)", op_report, "query", ("Queries",)),
+    ("GET", r"/lookup/(\w+)", op_lookup, "query", ()),
+]
+ROUTES = [(method, re.compile(pattern + r"/?$"), handler, source, needs)
+          for method, pattern, handler, source, needs in ROUTES]
+LOGIN_ROUTE = re.compile(r"/login/?$")
+
+
+# ---------- SERVER ----------
+class PharmacyService:
+    """Minimal HTTP/1.1 server: asyncio for sockets, a thread pool for the DB."""
+
+    def __init__(self, pool_size=SERVICE_DEFAULTS["pool"], idle_timeout=SERVICE_DEFAULTS["idle_timeout"],
+                 max_body=SERVICE_DEFAULTS["max_body"]):
+        self.idle_timeout = idle_timeout
+        self.max_body = max_body
+        self.executor = ThreadPoolExecutor(max_workers=max(1, pool_size - 1), thread_name_prefix="db")
+        self.started = time.time()
+        self.clients = 0
+        self.in_flight = 0
+        self.requests = {}   # "METHOD /pattern" -> {"count", "errors", "ms"}
+
+    async def handle_client(self, reader, writer):
+        self.clients += 1
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    break
+                if not line.strip():
+                    break
+                try:
+                    method, target, version = line.decode("latin-1").split()
+                except ValueError:
+                    await self.respond(writer, 400, {"error": "Bad Request", "detail": "malformed request line"}, False)
+                    break
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = h.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if not 0 <= length <= self.max_body:
+                    await self.respond(writer, 413, {"error": "Payload Too Large",
+                                                     "detail": f"body limit is {self.max_body} bytes"}, False)
+                    break
+                raw = await reader.readexactly(length) if length else b""
+                status, payload = await self.dispatch(method, target, raw, headers)
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    async def respond(self, writer, status, payload, keep_alive):
+        data = json.dumps(payload, default=json_default).encode()
+        head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + data)
+        await writer.drain()
+
+    async def dispatch(self, method, target, raw, headers):
+        parts = urlsplit(target)
+        path = parts.path
+        query = parse_qs(parts.query)
+        if method == "GET" and path == "/health":
+            return 200, self.health()
+        if method == "POST" and LOGIN_ROUTE.match(path):
+            routes = [(method, LOGIN_ROUTE, op_login, "body", ())]
+            session = None
+        else:
+            scheme, _, token = headers.get("authorization", "").partition(" ")
+            session = SESSIONS.get(token.strip()) if scheme.lower() == "bearer" else None
+            if session is None:
+                return 401, {"error": "Unauthorized", "detail": "log in via POST /login and send the bearer token"}
+            if method == "POST" and path.rstrip("/") == "/logout":
+                SESSIONS.drop(token.strip())
+                return 200, {}
+            if method == "GET" and path in ("/metrics", "/reports"):
+                if not session.allows("Dashboard" if path == "/metrics" else "Queries"):
+                    return 403, {"error": "Forbidden", "detail": f"role {session.role} may not read {path}"}
+                return 200, QUERY_METRICS.snapshot() if path == "/metrics" else sorted(PREBUILT_REPORTS)
+            routes = ROUTES
+        for route_method, pattern, handler, source, needs in routes:
+            m = pattern.match(path)
+            if not m or route_method != method:
+                continue
+            label = f"{method} {pattern.pattern[:-3]}"
+            started = time.perf_counter()
+            status = 200
+            try:
+                missing = [n for n in needs if not session.allows(n)]
+                if missing:
+                    raise ServiceError(403, "Forbidden", f"role {session.role} lacks {', '.join(missing)}")
+                if source == "body":
+                    try:
+                        arg = json.loads(raw) if raw else {}
+                    except ValueError:
+                        raise ServiceError(400, "Bad Request", "body is not valid JSON") from None
+                    if not isinstance(arg, dict):
+                        raise ServiceError(400, "Bad Request", "body must be a JSON object")
+                else:
+                    arg = query
+                args = (session, arg) + tuple(unquote(g) for g in m.groups())
+                self.in_flight += 1
+                try:
+                    payload = await asyncio.get_running_loop().run_in_executor(self.executor, handler, *args)
+                finally:
+                    self.in_flight -= 1
+            except ServiceError as e:
+                status, payload = e.status, {"error": e.error, "detail": e.detail}
+            except Exception as e:   # a bug must not take the service down for every till
+                status, payload = 500, {"error": "Service Error", "detail": f"{type(e).__name__}: {e}"}
+            self.count(label, status, started)
+            return status, payload
+        return 404, {"error": "Not Found", "detail": f"{method} {path}"}
+
+    def count(self, label, status, started):
+        st = self.requests.setdefault(label, {"count": 0, "errors": 0, "ms": 0.0})
+        st["count"] += 1
+        st["errors"] += status >= 400
+        st["ms"] += (time.perf_counter() - started) * 1000
+
+    def health(self):
+        requests = {label: dict(st, avg_ms=round(st["ms"] / st["count"], 3))
+                    for label, st in self.requests.items()}
+        return {"status": "ok", "uptime_s": round(time.time() - self.started), "clients": self.clients,
+                "sessions": len(SESSIONS),
+                "in_flight": self.in_flight, "pool": fp.DB_POOL.snapshot(), "ref_cache": REF_CACHE.snapshot(),
+                "report_cache": REPORT_CACHE.snapshot(), "requests": requests}
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        fp.DB_POOL.close_all()
+        QUERY_METRICS.close()
+
+
+def configure(pool_size, database=None):
+    """Point frontend_pharmacy's helpers at one shared pool and route their errors here."""
+    if database:
+        fp.DB_CONFIG["database"] = database
+    fp.DB_POOL = fp.ConnectionPool(**dict(POOL_CONFIG, size=pool_size))
+    fp._error_sink = collect_error
+
+
+async def serve(host, port, service):
+    server = await asyncio.start_server(service.handle_client, host, port)
+    addrs = ", ".join(str(s.getsockname()[:2]) for s in server.sockets)
+    print(f"pharmacy service on {addrs} (DB pool {fp.DB_POOL.size})")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="HTTP/JSON service for the pharmacy's sales, billing and reports")
+    ap.add_argument("--host", default=SERVICE_DEFAULTS["host"])
+    ap.add_argument("--port", type=int, default=SERVICE_DEFAULTS["port"])
+    ap.add_argument("--pool", type=int, default=SERVICE_DEFAULTS["pool"],
+                    help="DB connections shared by all tills (one more than the DB worker threads)")
+    ap.add_argument("--database", help="override DB_CONFIG['database']")
+    args = ap.parse_args()
+
+    configure(args.pool, args.database)
+    service = PharmacyService(args.pool)
+    try:
+        asyncio.run(serve(args.host, args.port, service))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()